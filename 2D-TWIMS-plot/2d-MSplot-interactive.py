@@ -2,12 +2,13 @@
 import pathlib
 import subprocess
 import sys
-import csv
 import os
 import numpy as np
 import pandas as pd
 import altair as alt
 
+from samm import stream
+
 """
 2d-MSplot-interactive.py
 Dr. Eric Janusson
@@ -20,41 +21,27 @@ workingFile = pathlib.Path(
     'D:/2-SAMM/SAMM - Data Workup Folder/Data Workup(300919)/SAMM3D Extracts/EJ3-27-APEXHD Output/EJ3-27-12-Sample6_Apex3DIons.csv')
 print(workingFile)
 
-
-def read_data_csv(csv_file, delimitchar=',', headers=True):
-    """[Reads and passes on data from input csv file]
-    Arguments:
-        csv_file {str} -- [full str path to .csv file]
-    Keyword Arguments:
-        delimitchar {str} -- [delimiter for csv] (default: {','})
-    Returns:
-        data_list {list} -- [list of csv data by row]
-    """
-    data_list = []  # create new list
-
-    with open(csv_file) as f:
-        # open comma-delimited csv
-        csvreader = csv.reader(f, delimiter=delimitchar)
-        for row, columns in enumerate(csvreader):
-            if (headers and row > 0) or not headers:
-                data_list.append([columns[i] for i in range(0, len(columns))])
-
-    return data_list
-
-
-data = read_data_csv(workingFile)
-
-"""
-
-plotting with altair
-
-
-points = alt.Chart(cars).mark_point().encode(
-    x='Horsepower',
-    y='Miles_per_Gallon',
-    color=alt.condition(interval, 'Origin', alt.value('lightgray'))
+# summed area on a 1 m/z x 1 bin (m/z, drift time) grid, accumulated chunk by chunk
+# (high-density files are too large to hold in memory whole)
+mz_edges = np.arange(50, 3001, 1.0)
+dt_edges = np.arange(0, 201, 1.0)
+area_map = stream.bin_ions(stream.iter_apex3d_chunks(workingFile, columns=['m_z', 'mobility', 'area']),
+                           mz_edges, dt_edges)
+
+# plotting with altair: one point per occupied cell, brush to highlight a region
+mz_bin, dt_bin = np.nonzero(area_map)
+cells = pd.DataFrame({'m/z': mz_edges[mz_bin], 'Drift Time (bins)': dt_edges[dt_bin],
+                      'Area': area_map[mz_bin, dt_bin]})
+alt.data_transformers.disable_max_rows()
+interval = alt.selection_interval()
+points = alt.Chart(cells).mark_square(size=4).encode(
+    x='m/z',
+    y='Drift Time (bins)',
+    color=alt.condition(interval, alt.Color('Area', scale=alt.Scale(type='log')), alt.value('lightgray')),
+    tooltip=['m/z', 'Drift Time (bins)', 'Area']
+).add_selection(
+    interval
 ).properties(
-    selection=interval
+    width=800, height=400
 )
-
-"""
+points.save(str(workingFile.with_name(workingFile.stem + '-2d-map.html')))
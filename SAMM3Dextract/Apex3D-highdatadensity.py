@@ -7,20 +7,20 @@
 import os
 import csv
 import sys
-import subprocess
 from pathlib import Path
 
+from samm import extract
+
 apexPath = r"C:\DriftScope\lib\Apex3D64.exe"
 apexLogPath = r"C:\DriftScope\log\_Apex3DLog.txt"
 
-#       Check DriftScope directory for required files 
+#       Check DriftScope directory for required files
 def checkFiles():
-        if (os.path.isfile(apexPath) and os.path.isfile(apexLogPath)):
-                pass
-        else:
-                input("Log and Apex3D files not present. Check DriftScope installation is present at C:\DriftScope. Press Enter to Exit")
+        try:
+                extract.check_apex(apexPath, apexLogPath)
+        except FileNotFoundError:
+                input(r"Log and Apex3D files not present. Check DriftScope installation is present at C:\DriftScope. Press Enter to Exit")
                 sys.exit("Exiting...")
-checkFiles()
 
 #       Ask user for Data Directory path:
 def findDataDir():
@@ -28,43 +28,35 @@ def findDataDir():
         dataDir = os.path.expanduser(input())
         # dataDir = os.path.abspath(r'S:\APEX Test')
         return dataDir
-dataDir = findDataDir()
-
-#       Return names of experiments then full paths for Apex
-def getFilenames(directory):
-        return [name for name in os.listdir(dataDir) if os.path.isdir(os.path.join(dataDir, name))]
-expList = getFilenames(dataDir)
 
 #       Generate list of full system paths for all experiment files in data folder
-def getDataPaths(directory):
-        return [os.path.join(dataDir, name) for name in expList if os.path.isdir(os.path.join(dataDir, name)) and name.lower().endswith((".raw"))]
-pathList = getDataPaths(dataDir)
+def getDataPaths(dataDir):
+        return extract.find_raw_dirs(dataDir)
 
 #       Find output folder if not there, then create one
-def makeOutputDir():
-        if os.path.isdir(os.path.join(dataDir, "APEX Output")):
-                print('Writing to existing Apex Output directory. Old files will be overwritten.')
-                outputDir =  os.path.join(dataDir, "APEX Output")
-                return outputDir
+def makeOutputDir(dataDir):
+        outputDir = os.path.join(dataDir, "APEX Output")
+        if os.path.isdir(outputDir):
+                print('Writing to existing Apex Output directory. Unchanged acquisitions are skipped.')
         else:
-                os.mkdir(os.path.join(dataDir, "APEX Output"))
-                outputDir = os.path.join(dataDir, "APEX Output")
-                return outputDir
-                # outputDir = os.mkdir(os.path.join(dataDir, "APEX Output"))
-                # outputDir = os.path.join(dataDir, "APEX Output")
-outputDir = makeOutputDir()
+                os.mkdir(outputDir)
+        return outputDir
 
-#       Define batch strings and arguments for Apex3D
-def apexGo():
-        for i in pathList:
-                #The parameters -leThresholdCounts 10 -heThresholdCounts 10 below may be modified to adjust the minimum detectable peak threshold
-                apexGoPath = '{} -pRawDirName "{}" -outputDirName "{}" -outputUserDirName "{}" -leThresholdCounts 10 -msOnly 0 -heThresholdCounts 10 -lockMassZ1 556.2771 -bCSVOutput 1'.format(apexPath, i, outputDir, outputDir)
-                apexGo = subprocess.Popen(apexGoPath, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-                out, err = apexGo.communicate() #Error reporting available, if needed
-                print('Export Complete for ' + i + '\n')
+#       Run Apex3D for every .raw (thresholds may be modified to adjust the minimum detectable peak threshold)
+def apexGo(pathList, outputDir):
+        jobs, skipped = extract.extract_changed(pathList, outputDir, apex_path=apexPath,
+                                                le_threshold=10, he_threshold=10, lock_mass=556.2771)
         print("All Exports Complete")
+        return jobs
+
+#       Interactive use only. Scripted runs: python -m samm.extract <data_dir> "<data_dir>\APEX Output"
+def main():
+        checkFiles()
+        dataDir = findDataDir()
+        apexGo(getDataPaths(dataDir), makeOutputDir(dataDir))
 
-apexGo()
+if __name__ == '__main__':
+        main()
 
 
 # #TWIMExtract Notes
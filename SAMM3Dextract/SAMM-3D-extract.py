@@ -8,22 +8,29 @@
 import os
 import csv
 import sys
-import subprocess
+import time
 from pathlib import Path
 
+from samm import extract
+
 #   Define Driftscope paths for APEX subprocess: 
 # NOTE Waters DriftScope software must be installed in the default directory.
 apexPath = r"C:\DriftScope\lib\Apex3D64.exe"
 apexLogPath = r"C:\DriftScope\log\_Apex3DLog.txt"
 
+# number of Apex3D processes run at once (default: one per CPU core)
+workers = os.cpu_count()
+
+# seconds before a hung Apex3D process is killed, and retries for failed or hung extractions
+timeout, retries = 3600, 2
+
 # Check DS install dirs for required files
 def checkFiles():
-        if (os.path.isfile(apexPath) and os.path.isfile(apexLogPath)):
-                pass
-        else:
+        try:
+                extract.check_apex(apexPath, apexLogPath)
+        except FileNotFoundError:
                 print(r"Log and Apex3D files not present. Check DriftScope installation is present at C:\DriftScope.")
                 sys.exit()
-checkFiles() # ensure DS/APEX installed
 
 def getDataDir():
         # print("Enter DATA directory with Waters .RAW experiment files below:")
@@ -33,27 +40,20 @@ def getDataDir():
         else:
                 print(r'ERROR: Path cannot be found. Exiting.')
                 sys.exit()
-dataDir = getDataDir() # Make output Directory in Data folder 
-
-#       Return names of experiments then full paths for Apex
-def getFilenames(directory):
-        return [name for name in os.listdir(dataDir) if os.path.isdir(os.path.join(dataDir, name))]
-expList = getFilenames(dataDir)
 
 #       Produce list of dirs for all experiment files in data folder
-def getDataPaths(directory):
-        return [os.path.join(dataDir, name) for name in expList if os.path.isdir(os.path.join(dataDir, name)) and name.lower().endswith((".raw"))]
-pathList = getDataPaths(dataDir)
+def getDataPaths(dataDir):
+        return extract.find_raw_dirs(dataDir)
 
 #       Find output folder or create one
-def makeOutputDir():
+def makeOutputDir(dataDir):
 
     # ask for data directory or use current
     print('Enter output directory path. Press Enter to create output folder here: ' + dataDir)
     userOutPath = input('Enter output directory path: ')
 
     if os.path.isdir(os.path.join(dataDir, "3D-data-extraction")): # if the data directory is a path 
-            print('- - - > Writing to existing /"3D-data-extraction/" directory. Old files will be overwritten.')
+            print('- - - > Writing to existing /"3D-data-extraction/" directory. Unchanged acquisitions (see apex3d-manifest.json) are skipped.')
             input('3D-data-extraction Data Export to...')
             outputDir =  os.path.join(dataDir, "3D-data-extraction")
             return outputDir
@@ -66,28 +66,26 @@ def makeOutputDir():
             os.mkdir(os.path.join(dataDir, "3D-data-extraction"))
             outputDir = os.path.join(dataDir, "3D-data-extraction")
             return outputDir
-            # outputDir = os.mkdir(os.path.join(dataDir, "3D-data-extraction"))
-            # outputDir = os.path.join(dataDir, "3D-data-extraction")
-
-outputDir = makeOutputDir()
 
-### chexk makeoutput dir function ^^^
-
-
-
-
-
-#       Define batch strings and arguments for Apex3D
-def apexGo():
-        for i in pathList:
-                #The parameters -leThresholdCounts 10 -heThresholdCounts 10 below may be modified to adjust the minimum detectable peak threshold
-                apexGoPath = '{} -pRawDirName "{}" -outputDirName "{}" -outputUserDirName "{}" -leThresholdCounts 10 -msOnly 0 -heThresholdCounts 10 -lockMassZ1 556.2771 -bCSVOutput 1'.format(apexPath, i, outputDir, outputDir)
-                apexGo = subprocess.Popen(apexGoPath, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
-                out, err = apexGo.communicate() #Error reporting available, if needed
-                print('Export Complete for ' + i + '\n')
+#       Run Apex3D for every .raw in a bounded worker pool
+def apexGo(pathList, outputDir):
+        #The parameters le_threshold/he_threshold may be modified to adjust the minimum detectable peak threshold
+        start = time.time()
+        jobs, skipped = extract.extract_changed(pathList, outputDir, workers=workers, apex_path=apexPath,
+                                                le_threshold=10, he_threshold=10, lock_mass=556.2771,
+                                                timeout=timeout, retries=retries)
+        extract.summarize(jobs, time.time() - start)
         print("All Exports Complete")
 
-apexGo()
+#       Interactive use only. Scripted runs: python -m samm.extract <data_dir> [output_dir]
+def main():
+        checkFiles() # ensure DS/APEX installed
+        dataDir = getDataDir()
+        outputDir = makeOutputDir(dataDir)
+        apexGo(getDataPaths(dataDir), outputDir)
+
+if __name__ == '__main__':
+        main()
 
 
 # Notes on APEX3D:
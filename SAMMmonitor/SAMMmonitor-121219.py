@@ -11,6 +11,7 @@ Notes: Script modified for EJ3-16 APEXOUT Export
 import os
 import csv
 import sys
+from samm import screen, sinks
 
 #system path of Apex3d Data
 data_folder = r'D:\2-SAMM\SAMM-Self-Assembly-Mobility-Mapping - Paper Folder\Programming\S-SAMM Programs\SAMM\SAMMmonitor\SAMMmonitor Data\3-72-Example Data\APEX Output'
@@ -124,25 +125,9 @@ def screen_hits_for_single_csv(data_csv, target_dict, mz_tolerance, mob_toleranc
     Returns:
         hits_dict = [A dictionary of targets returning True from check_hit]
     """
-    hits_dict = {}
-    hits_list = []
-    data_list = read_data_csv(data_csv)
-    
-    for target, target_data in target_dict.items():
-        hits_list = []
-        for data in data_list:
-            # obs_mz, obs_mobility = float(data[2]), float(data[4]) #for older DriftScope v 2.2 APEX exports
-            obs_mz, obs_mobility = float(data[2]), float(data[8])   #change to row 8 for new APEX output
-            
-            if check_hit(obs_mz, obs_mobility, target_data, mz_tolerance, mob_tolerance, mz_units):
-                # relevant_data = [item for item in data[1:6]]
-                relevant_data = [item for item in data[1:9]]    #change to row 9 to stop - includes up to row 8 which is mobility in new APEX data
-                print(f'csv = {data_csv}')
-                hits_list.append(relevant_data)
-
-        hits_dict[target] = hits_list
-    
-    return hits_dict
+    # All targets at once: binary search on m/z, then a vectorized mobility check
+    hits = screen.screen_file(data_csv, target_dict, mz_tolerance, mob_tolerance, mz_units)
+    return screen.hits_dict(hits, target_dict)
 
 def get_output_csv_path(input_csv, output_folder=None, out_string='hits'):
     #Find output folder path if it exists (otherwise make it)
@@ -156,21 +141,6 @@ def get_output_csv_path(input_csv, output_folder=None, out_string='hits'):
 
     return os.path.join(output_folder, f'{input_csv_name}-{out_string}.csv')
 
-def write_output_csv(output_csv, headers=['target_molecule', 'id','obs_mz','Rt', 'obs_mobility', 'intensity'],
-                    delimitchar=','):
-
-        with open (output_csv, 'w') as write_file:
-            
-            write = csv.writer(write_file, delimiter=delimitchar)
-            write.writerow(headers)
-
-def append_output_csv(output_csv, write_list, delimitchar=','):
-
-    print(f'for {output_csv}, write list = {write_list}')
-    with open(output_csv, 'a') as ofile:
-            writer = csv.writer(ofile, delimiter=delimitchar)
-            writer.writerow(write_list)
-
 def write_hits_for_single_csv(data_csv, target_dict, mz_tolerance, mob_tolerance, 
                                 out_folder=None, headers=['Target Formula','Index', 
                                 'Observed m/z','m/z No Cal', 'RT', 'Intensity', 'Area', 'Counts', 'Mobility']):
@@ -178,19 +148,10 @@ def write_hits_for_single_csv(data_csv, target_dict, mz_tolerance, mob_tolerance
                             #             'obs_mobility', 'intensity']):
 
     print(f'target_dict = {target_dict}')
-    hits_dict = screen_hits_for_single_csv(data_csv, target_dict, 
-                                        mz_tolerance, mob_tolerance)
-
-    output_csv = get_output_csv_path(data_csv)
-    write_output_csv(output_csv, headers)
-
-    for target_molecule, hits_lists in hits_dict.items():
-
-        for hit in hits_lists:
-            if len(hit) > 0: 
-                write_list = [target_molecule]
-                write_list.extend(hit)
-                append_output_csv(output_csv, write_list)
+    # One open and one bulk write per output file (samm/sinks.py)
+    hits = screen.screen_file(data_csv, target_dict, mz_tolerance, mob_tolerance)
+    with sinks.open_sink(get_output_csv_path(data_csv), headers) as sink:
+        sink.write_frame(hits)
 
 def write_hits_multiple_csvs(target_dict, csv_folder, 
                             mz_tolerance, mob_tolerance,
@@ -10,6 +10,7 @@ Notes: Script modified for EJ3-16 APEXOUT Export
 import os
 import csv
 import sys
+from samm import sinks
 
 #system path of Apex3d Data
 data_folder = r'D:\Programming\SAMM\SAMMmonitor\SAMMmonitor Data\3-72-Example Data\APEX Output'
@@ -155,21 +156,6 @@ def get_output_csv_path(input_csv, output_folder=None, out_string='hits'):
 
     return os.path.join(output_folder, f'{input_csv_name}-{out_string}.csv')
 
-def write_output_csv(output_csv, headers=['target_molecule', 'id','obs_mz','Rt', 'obs_mobility', 'intensity'],
-                    delimitchar=','):
-
-        with open (output_csv, 'w') as write_file:
-            
-            write = csv.writer(write_file, delimiter=delimitchar)
-            write.writerow(headers)
-
-def append_output_csv(output_csv, write_list, delimitchar=','):
-
-    print(f'for {output_csv}, write list = {write_list}')
-    with open(output_csv, 'a') as ofile:
-            writer = csv.writer(ofile, delimiter=delimitchar)
-            writer.writerow(write_list)
-
 def write_hits_for_single_csv(data_csv, target_dict, mz_tolerance, mob_tolerance, out_folder=None,
                             headers=['target_molecule','id', 'obs_mz','Rt',
                                         'obs_mobility', 'intensity']):
@@ -178,16 +164,10 @@ def write_hits_for_single_csv(data_csv, target_dict, mz_tolerance, mob_tolerance
     hits_dict = screen_hits_for_single_csv(data_csv, target_dict, 
                                         mz_tolerance, mob_tolerance)
 
-    output_csv = get_output_csv_path(data_csv)
-    write_output_csv(output_csv, headers)
-
-    for target_molecule, hits_lists in hits_dict.items():
-
-        for hit in hits_lists:
-            if len(hit) > 0: 
-                write_list = [target_molecule]
-                write_list.extend(hit)
-                append_output_csv(output_csv, write_list)
+    # One open and one bulk write per output file (samm/sinks.py)
+    with sinks.open_sink(get_output_csv_path(data_csv), headers) as sink:
+        for target_molecule, hits_lists in hits_dict.items():
+            sink.write([target_molecule] + list(hit) for hit in hits_lists if len(hit) > 0)
 
 def write_hits_multiple_csvs(target_dict, csv_folder, 
                             mz_tolerance, mob_tolerance,
@@ -10,11 +10,10 @@ Input: Data folder containing .csv APEX3D data (ex: from 3D-TWIMS-extract.py)
 Summary output .csv is exported to data directory.
 '''
 
-import sys, os, csv
+import os, csv
 from pathlib import Path
-from datetime import datetime, date, time, timezone
-import pandas as pd
-from pandas.core.frame import DataFrame
+from datetime import datetime
+from samm import iontable, monitor, screen, sinks
 
 # time functions
 print('program start at: ' + str(datetime.now()) + '\n---===---\n')
@@ -36,8 +35,14 @@ targets_csv = Path(
 # target mobility error tolerance (as percentage. default: 0.05 m/z)
 mz_tol, mob_tol = 1.0, 0.05
 
+# incremental: only screen files added or changed since the last run, keeping
+# state and a cumulative results table in one output folder (samm/monitor.py)
+incremental = True
+state_directory = os.path.join(monitorDir, 'SAMMmonitor Output')
+
+# Apex3D ion tables only (the folder also holds columnar copies, logs and manifests)
 csv_files = [os.path.join(data_directory, csv_f)
-             for csv_f in os.listdir(data_directory)]
+             for csv_f in os.listdir(data_directory) if csv_f.endswith('_Apex3DIons.csv')]
 
 ### Main Functions
 
@@ -111,89 +116,29 @@ def importSAMM3D(csv_path):
     '''
     path = str(csv_path)
 
-    apexDF = pd.read_csv(path)
-    x, y, z, = (
-        list(apexDF['m_z']),
-        list(apexDF['mobility']),
-        list(apexDF['area']),
-    )
-    xError, yError, zError = (
-        list(apexDF['errMzPPM']),
-        list(apexDF['errMobility']),
-        list(apexDF['errArea']),
-    )
-    newApexDF = pd.DataFrame(
-        zip(x, y, z, xError, yError, zError),
-        columns=['m/z', 'DT', 'Area', 'm/z Error', 'DT Error', 'Area Error']
-        )
-
-    return newApexDF
+    return iontable.import_apex3d(path)
 
-# set tolerance range for target ions
-def set_tolerance(ion):
+# main: every file read once, all targets screened against it (samm/monitor.py)
+def mainPC(workers=None):
     '''
-    Sets tolerance per-ion. Based on analyte dictionary.
-    Args:
-        ion (string): name of ion.
+    Summed area of every target ion in every injection of data_directory,
+    written once to SAMMmonitor Output - <time>.csv in the monitor directory.
+    In incremental mode only new or changed files are screened; the matrix
+    covers all files screened so far and is written to state_directory.
     Returns:
-        floats: upper and lower m/z and DT ranges.
+        pd.DataFrame: ion x injection area matrix.
     '''
-    # set tolerance range for ion (from: ref_dic)
-    target_mz = float(ref_dic[ion]['mz'])
-    target_dt = float(ref_dic[ion]['mobility'])
-    upperMZ, lowerMZ = float(target_mz+mz_tol), float(target_mz-mz_tol)
-    upperDT, lowerDT = target_dt*mob_tol, target_dt*(-mob_tol)
-    # print(f'Checking {ion} with mass range: {lowerMZ}-{upperMZ}')
-    return float(upperMZ), float(lowerMZ), float(upperDT), float(lowerDT)
-
-# find areas within m/z+DT range and sum
-def find_match(raw_data, upperMZ, lowerMZ, upperDT, lowerDT): 
-    # raw_data = importSAMM3D(csv_files[0])
-    # upperMZ, lowerMZ, upperDT, lowerDT = set_tolerance('[HMo4O13]-')
-    print('Converting reference data to bins for DT comparison.')
-    # TODO fixing drift time range...
-        # constant C = *1.4105
-        # need mass and charge!? # Above - 
-    raw_data['m/z']
-    raw_data['charge']
-        t_c = t_d - c(m_ion/z_ion)^0.5
-        tc*=td-C*np.sqrt(mion/zion)
-        ### FIXME Here!
-    m_range = (raw_data['m/z'] >= lowerMZ) & (raw_data['m/z'] <= upperMZ)
-    d_range = (raw_data['DT'] >= lowerDT) & (raw_data['DT'] <= upperDT)
-    matches = raw_data[['m/z', 'DT', 'Area']].loc[(m_range & d_range), 'Area']
-    # then sum areas:
-        # areaDF.sum()
-    # return print(raw_data['Area'].loc(filt))
-    return print(matches)
-
-# run single analyte test:
-raw_data = importSAMM3D(csv_files[0])
-for ion in ref_dic.keys():
-    upperMZ, lowerMZ, upperDT, lowerDT = set_tolerance(ion)
-    find_match(raw_data, upperMZ, lowerMZ, upperDT, lowerDT)
-# example_mass, example_dt = 879.50, 4.84
-print('test done!') ### https://stackoverflow.com/questions/28236305/how-do-i-sum-values-in-a-column-that-match-a-given-condition-using-pandas
-
-# main psuedocode:
-def mainPC(): # FIXME
-    for ion in ref_dic.keys():
-        formula = str(ion)
-        analyte_mz = ref_dic.get(ion).get('mz')
-        analyte_dt = ref_dic.get(ion).get('mobility')
-
-        # for each ion of interest, grab all files
-        for dataDir in csv_files:
-            raw_data = importSAMM3D(dataDir)
-            upperMZ, lowerMZ, upperDT, lowerDT = set_tolerance(ion)
-            # find_match(raw_data, upperMZ, lowerMZ, upperDT, lowerDT)
-            m_range = (raw_data['m/z'] >= lowerMZ) & (raw_data['m/z'] <= upperMZ)
-            d_range = (raw_data['DT'] >= lowerDT) & (raw_data['DT'] <= upperDT)
-            matches = [raw_data[['m/z', 'DT', 'Area']].loc[m_range & d_range, 'Area']]
-            # TODO write find_match: matches both m/z and mobility (line 131)
-                # get area of match entry
-                # get csv filename
-                # append entry to an ('ion','filename'.area) dataframe and write to file 
+    if incremental:
+        run = monitor.update(data_directory, ref_dic, mz_tol, mob_tol, state_directory, workers=workers)
+        print(f"{len(run['screened'])} new or changed files screened, {len(run['unchanged'])} unchanged")
+        areas = monitor.load_results(state_directory)
+        output_csv = os.path.join(state_directory, 'SAMMmonitor-areas.csv')
+    else:
+        areas = monitor.area_matrix(csv_files, ref_dic, mz_tol, mob_tol, workers=workers)
+        output_csv = os.path.join(monitorDir, f'SAMMmonitor Output - {hmmss}.csv')
+    monitor.write_matrix(areas, output_csv)
+    print(f'{len(areas)} ions x {len(areas.columns)} injections written to {output_csv}')
+    return areas
 
 ### End Program
 # sys.exit('\n- = - Complete - = -\n')
@@ -228,35 +173,13 @@ def get_output_csv_path(input_csv):
 
     return os.path.join(output_folder, f'{input_csv_name}-monitor.csv')
 
-def write_output_csv(output_csv, headers=['target_molecule', 'id', 'obs_mz', 'RT', 'obs_mobility', 'intensity'],
-                     delimitchar=','):
-    with open(output_csv, 'w') as write_file:
-
-        write = csv.writer(write_file, delimiter=delimitchar)
-        write.writerow(headers)
-
-def append_output_csv(output_csv, write_list, delimitchar=','):
-    # print(f'for {output_csv}, write list = {write_list}')
-    with open(output_csv, 'a') as opened_file:
-        writer = csv.writer(opened_file, delimiter=delimitchar)
-        writer.writerow(write_list)
-
 def write_hits_for_single_csv(data_csv, target_dict, mz_tolerance, mob_tolerance,
                               out_folder=None, headers=['Target Formula', 'Index',
                                                         'Observed m/z', 'm/z No Cal', 'RT', 'Intensity', 'Area', 'Counts', 'Mobility']):
-    targ_dict = screen_hits_for_single_csv(
-        data_csv, target_dict, mz_tolerance, mob_tolerance
-    )
-    output_csv = get_output_csv_path(data_csv)
-    write_output_csv(output_csv, headers)
-
-    for target_molecule, hits_lists in targ_dict.items():
-
-        for hit in hits_lists:
-            if len(hit) > 0:
-                write_list = [target_molecule]
-                write_list.extend(hit)
-                append_output_csv(output_csv, write_list)
+    # One open and one bulk write per output file (samm/sinks.py)
+    hits = screen.screen_file(data_csv, target_dict, mz_tolerance, mob_tolerance)
+    with sinks.open_sink(get_output_csv_path(data_csv), headers) as sink:
+        sink.write_frame(hits)
 
 def write_hits_multiple_csvs(target_dict, csv_folder,
                              mz_tolerance, mob_tolerance,
@@ -269,7 +192,7 @@ def write_hits_multiple_csvs(target_dict, csv_folder,
 
 # module initiation
 def main():
-    pass
+    mainPC()
 if __name__ == '__main__':
     main()
     print('\n---===--- \nprogram end at: ' + str(datetime.now()))
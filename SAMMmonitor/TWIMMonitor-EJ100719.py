@@ -7,6 +7,7 @@ Script modified for EJ3-16 APEXOUT Export
 import os
 import csv
 import sys
+from samm import screen, sinks
 
 def read_data_csv(csv_file, delimitchar=',', headers=True):
     """[Reads and passes on data from input csv file]
@@ -85,26 +86,9 @@ def screen_hits_for_single_csv(data_csv, target_dict,
                                 mob_tolerance,
                                 mz_units='abs'):
 
-    hits_dict = {}
-    hits_list = []
-    data_list = read_data_csv(data_csv)
-    
-    for target, target_data in target_dict.items():
-        hits_list = []
-        for data in data_list:
-            # obs_mz, obs_mobility = float(data[2]), float(data[4])
-            obs_mz, obs_mobility = float(data[2]), float(data[8])   #change to row 8 for new APEX output
-            
-            if check_hit(obs_mz, obs_mobility, target_data, 
-                        mz_tolerance, mob_tolerance, mz_units):
-                # relevant_data = [item for item in data[1:6]]
-                relevant_data = [item for item in data[1:9]]    #change to row 9 to stop - includes up to row 8 which is mobility in new APEX data
-                print(f'csv = {data_csv}')
-                hits_list.append(relevant_data)
-
-        hits_dict[target] = hits_list
-    
-    return hits_dict
+    # All targets at once: binary search on m/z, then a vectorized mobility check
+    hits = screen.screen_file(data_csv, target_dict, mz_tolerance, mob_tolerance, mz_units)
+    return screen.hits_dict(hits, target_dict)
 
 def get_output_csv_path(input_csv, output_folder=None,
                         out_string='hits'):
@@ -119,22 +103,6 @@ def get_output_csv_path(input_csv, output_folder=None,
 
     return os.path.join(output_folder, f'{input_csv_name}-{out_string}.csv')
 
-def write_output_csv(output_csv, headers=['target_molecule', 'id','obs_mz','Rt', 'obs_mobility', 'intensity'],
-                    delimitchar=','):
-
-        with open (output_csv, 'w') as write_file:
-            
-            write = csv.writer(write_file, delimiter=delimitchar)
-            write.writerow(headers)
-
-def append_output_csv(output_csv, write_list, delimitchar=','):
-
-    print(f'for {output_csv}, write list = {write_list}')
-    with open(output_csv, 'a') as ofile:
-            writer = csv.writer(ofile, delimiter=delimitchar)
-            writer.writerow(write_list)
-
-
 def write_hits_for_single_csv(data_csv, target_dict,
                             mz_tolerance,
                             mob_tolerance,
@@ -143,19 +111,10 @@ def write_hits_for_single_csv(data_csv, target_dict,
                                         'obs_mobility', 'intensity']):
 
     print(f'target_dict = {target_dict}')
-    hits_dict = screen_hits_for_single_csv(data_csv, target_dict, 
-                                        mz_tolerance, mob_tolerance)
-
-    output_csv = get_output_csv_path(data_csv)
-    write_output_csv(output_csv, headers)
-
-    for target_molecule, hits_lists in hits_dict.items():
-
-        for hit in hits_lists:
-            if len(hit) > 0: 
-                write_list = [target_molecule]
-                write_list.extend(hit)
-                append_output_csv(output_csv, write_list)
+    # One open and one bulk write per output file (samm/sinks.py)
+    hits = screen.screen_file(data_csv, target_dict, mz_tolerance, mob_tolerance)
+    with sinks.open_sink(get_output_csv_path(data_csv), headers) as sink:
+        sink.write_frame(hits)
 
 def write_hits_multiple_csvs(target_dict, csv_folder, 
                             mz_tolerance, mob_tolerance,
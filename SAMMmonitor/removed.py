@@ -1,4 +1,5 @@
 bin
+from samm import screen
 
 
 
@@ -44,22 +45,8 @@ def screen_hits_for_single_csv(data_csv, target_dict, mz_tolerance, mob_toleranc
         targ_dict = [A dictionary of targets returning True from check_hit]
         Incompatible with DriftScope v 2.2 (ex: APEX exports use col 4 of .csv file)
     '''
+    hits = screen.screen_file(data_csv, target_dict, mz_tolerance, mob_tolerance)
     targ_dict = {}
-    hits_list = []
-    data_list = read_data_csv(data_csv)
-
-    for target, target_data in target_dict.items():
-        hits_list = []
-        for data in data_list:
-            # obs_mz, obs_mobility = float(data[2]), float(data[4]) 
-            # for older DriftScope v 2.2 APEX exports
-            obs_mz, obs_mobility = float(data[2]), float(data[8])
-
-            if check_hit(obs_mz, obs_mobility, target_data, mz_tolerance, mob_tolerance):
-                relevant_data = [item for item in data[1:9]]
-                # print(f'csv = {data_csv}')
-                hits_list.extend(relevant_data) # append to extend
-                print(f'Hit: + {relevant_data}')
-        targ_dict[target] = hits_list
-
+    for target, hits_list in screen.hits_dict(hits, target_dict).items():
+        targ_dict[target] = [item for hit in hits_list for item in hit]  # flattened, as before
     return targ_dict
@@ -9,6 +9,7 @@ import mpl_scatter_density
 from matplotlib import rcParams
 import os
 import pandas as pd
+from samm import catalog, iontable
 import numpy as np
 from cycler import cycler
 
@@ -54,31 +55,7 @@ def importSAMM2D(file2D):
     userInput = str(file2D)
     # CSV file path
     basePath = r'D:\2-SAMM\SAMM - Data Workup Folder\Data Workup (300919)\Experimental Data\3-57-SAMM2\2DExtract(3-57-2)'
-    frMS = str(basePath + r'\Full Range\MS\EJ3-' + userInput + r'-Sampling-2\MZ_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#FullRange-POMSolv-Rangefile.txt_raw.csv')
-    frDT = str(basePath + r'\Full Range\DT\EJ3-' + userInput + r'-Sampling-2\DT_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#FullRange-POMSolv-Rangefile.txt_raw.csv')
-    z1MS = str(basePath + r'\Z1\MS\EJ3-' + userInput + r'-Sampling-2\MZ_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#POMSolv-Z1-RuleFile.rul_raw.csv')
-    z1DT = str(basePath + r'\Z1\DT\EJ3-' + userInput + r'-Sampling-2\DT_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#POMSolv-Z1-RuleFile.rul_raw.csv')
-    z2MS = str(basePath + r'\Z2\MS\EJ3-' + userInput + r'-Sampling-2\MZ_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#POMSolv-Z2-RuleFile.rul_raw.csv')
-    z2DT = str(basePath + r'\Z2\DT\EJ3-' + userInput + r'-Sampling-2\DT_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#POMSolv-Z2-RuleFile.rul_raw.csv')
-    paths = [frMS, frDT, z1MS, z1DT, z2MS, z2DT]
-    frScatter = ([pd.read_csv(i, skiprows=1)
-                  for i in paths if os.path.lexists(i) and i[104:106] == r'Fu'])
-    frScatter = pd.concat([frScatter[0], frScatter[1]], axis=1)
-    frScatter.columns = ['m/z', 'Counts', 'Drift Time', 'Intensity']
-    z1Scatter = ([pd.read_csv(i, skiprows=1)
-                  for i in paths if os.path.lexists(i) and i[104:106] == r'Z1'])
-    z1Scatter = pd.concat([z1Scatter[0], z1Scatter[1]], axis=1)
-    z1Scatter.columns = ['m/z', 'Counts', 'Drift Time', 'Intensity']
-    z2Scatter = ([pd.read_csv(i, skiprows=1)
-                  for i in paths if os.path.lexists(i) and i[104:106] == r'Z2'])
-    z2Scatter = pd.concat([z2Scatter[0], z2Scatter[1]], axis=1)
-    z2Scatter.columns = ['m/z', 'Counts', 'Drift Time', 'Intensity']
+    frScatter, z1Scatter, z2Scatter = catalog.import_samm2d(basePath, userInput, replicate=2)
     return frScatter, z1Scatter, z2Scatter, userInput
 
 
@@ -93,21 +70,8 @@ def importSAMM3D(file3D):
                  r'-Sampling-2\MZ_EJ3-' + r'-Sampling-2_Apex3DIons.csv')
     apexMS = str('D:\\2-SAMM\SAMM - Data Workup Folder\Data Workup (300919)\SAMM3D Extracts\APEX Output(3-57)\EJ3-' +
                  userInputApex + '-Sampling-2_Apex3DIons.csv')
-    apexDF = pd.read_csv(apexMS)
-    x, y, z, = (
-        list(apexDF['m_z']),
-        list(apexDF['mobility']),
-        list(apexDF['area']),
-    )
-    xError, yError, zError = (
-        list(apexDF['errMzPPM']),
-        list(apexDF['errMobility']),
-        list(apexDF['errArea']),
-    )
-    newApexDF = pd.DataFrame(
-        zip(x, y, z, xError, yError, zError),
-        columns=['m/z', 'DT', 'Area', 'm/z Error', 'DT Error', 'Area Error'])
-    return newApexDF
+    # Only ions inside the plot window are read; the filter below stays exact
+    return iontable.import_apex3d(apexMS, mz=msRange, dt=dtRange, area=(areaMin, None))
 
 
 # Create Dataframes
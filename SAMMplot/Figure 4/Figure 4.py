@@ -4,7 +4,7 @@
 # 310320
 import os
 import pandas as pd
-import re
+from samm import metadata
 
 # SAMMtrend Solvent Experiment Data Import
 experiment = 'EJ3-57'
@@ -13,26 +13,10 @@ data = pd.read_csv(pathName, delimiter=',', header='infer')
 data.reset_index()
 
 def getSolventsFromID():
-    # Organize data by experiment type (solvent used and corresponding solvent)
-    pos = list(r'RA, RB, RC, RD, BA, BB, BC, BD, GA, GB, GC, GD'.split(', '))
-    solv = list(
-        r"H2O MeOH EtOH MeCN D2O_40 D2O_20 D2O_10 D2O_40D D2O_40G MeCNG THFG H2OG".split(' '))
-    posSolv = dict(zip(pos, solv))
-    exptSolv = []
-    exptCond = []
-    exptRegex = re.compile(r'-\D\D\d-')
-    for i in range(len(data['ID'])):  # For the length of the list of experiments
-        # Create regex search for vial position in experiment file titles
-        mo = re.search(exptRegex, data['ID'][i])
-        vialPos = list(mo.group()[1:3])  # Put positions into list
-        # vialPos = vialPos[1:3]
-        vialPos = ''.join(vialPos)
-        solvent = posSolv[vialPos]  # Conversion to solvents
-        exptSolv.append(solvent)
-
-        condNum = int(mo.group()[3])
-        exptCond.append(condNum)
-    return exptSolv, exptCond
+    # Solvent and condition number from the vial position in each experiment ID
+    # (mapping in samm/vial-solvents.csv)
+    annotated = metadata.annotate(data, id_column='ID')
+    return annotated['Solvent'], annotated['Condition']
 
 print(f'Adding {experiment} Information...\n')
 data['Solvent'], data['Condition'] = getSolventsFromID()
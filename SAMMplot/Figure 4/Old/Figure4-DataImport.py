@@ -4,8 +4,8 @@
 # 310320
 import os
 import pandas as pd
+from samm import metadata
 import numpy as np
-import re
 import matplotlib as mpl
 from cycler import cycler
 import colorcet as cc
@@ -41,26 +41,10 @@ data = pd.read_csv(
 data.reset_index()
 
 def getSolventsFromID():
-    # Organize data by experiment type (solvent used and corresponding solvent)
-    pos = list(r'RA, RB, RC, RD, BA, BB, BC, BD, GA, GB, GC, GD'.split(', '))
-    solv = list(
-        r"H2O MeOH EtOH MeCN D2O_40 D2O_20 D2O_10 D2O_40D D2O_40G MeCNG THFG H2OG".split(' '))
-    posSolv = dict(zip(pos, solv))
-    exptSolv = []
-    exptCond = []
-    exptRegex = re.compile(r'-\D\D\d-')
-    for i in range(len(data['ID'])):  # For the length of the list of experiments
-        # Create regex search for vial position in experiment file titles
-        mo = re.search(exptRegex, data['ID'][i])
-        vialPos = list(mo.group()[1:3])  # Put positions into list
-        # vialPos = vialPos[1:3]
-        vialPos = ''.join(vialPos)
-        solvent = posSolv[vialPos]  # Conversion to solvents
-        exptSolv.append(solvent)
-
-        condNum = int(mo.group()[3])
-        exptCond.append(condNum)
-    return exptSolv, exptCond
+    # Solvent and condition number from the vial position in each experiment ID
+    # (mapping in samm/vial-solvents.csv)
+    annotated = metadata.annotate(data, id_column='ID')
+    return annotated['Solvent'], annotated['Condition']
 
 # Add reaction information to dataframe
 data['Solvent'], data['Condition'] = getSolventsFromID()
@@ -0,0 +1,120 @@
+r'''
+bench_2d_loader.py
+Python Version: 3.9
+Purpose: Compares the sequential importSAMM2D loop (two read_csv calls and
+a column-wise concat per selection, one experiment after another) against
+the threaded batch loader in samm/twim.py.
+
+A synthetic series in the TWIMExtract folder layout is written unless an
+existing 2DExtract data root is given. The parse cache is bypassed so both
+loaders parse every file. Local disks hide the per-file round trip of the
+network share that the thread pool overlaps; --latency adds it back as a
+fixed delay per file opened.
+
+Usage: python benchmarks/bench_2d_loader.py --experiments 500
+       python benchmarks/bench_2d_loader.py --experiments 500 --latency 20
+       python benchmarks/bench_2d_loader.py --root "D:\2-SAMM\2DExtract(3-57-2)" --workers 16
+'''
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from samm import catalog, twim
+
+SELECTION_FOLDERS = {'FR': ('Full Range', '#FullRange-POMSolv-Rangefile.txt'),
+                     'Z1': ('Z1', '#POMSolv-Z1-RuleFile.rul'),
+                     'Z2': ('Z2', '#POMSolv-Z2-RuleFile.rul')}
+
+
+def write_series(root, experiments, mz_points=4000, dt_points=200, seed=1):
+    ''' Writes FR/Z1/Z2 x MS/DT exports for `experiments` synthetic acquisitions. Returns their IDs. '''
+    rng = np.random.default_rng(seed)
+    mz = np.linspace(200, 2000, mz_points)
+    dt = np.linspace(0.07, 14.0, dt_points)
+    vials = [f'{row}{col}' for row in ('RA', 'BC', 'GD') for col in range(1, 6)]
+    ids = []
+    for i in range(experiments):
+        experiment = f'EJ3-57-{i + 1:03d}-{vials[i % len(vials)]}-Sampling-2'
+        ids.append(experiment)
+        for selection, (folder, selfile) in SELECTION_FOLDERS.items():
+            for prefix, dimension, x in (('MZ', 'MS', mz), ('DT', 'DT', dt)):
+                out = Path(root) / folder / dimension / experiment
+                out.mkdir(parents=True, exist_ok=True)
+                y = rng.gamma(1.5, 200, len(x)).round()
+                with open(out / f'{prefix}_{experiment}_fn-1_{selfile}_raw.csv', 'w') as f:
+                    f.write(f'#{selfile}\n')
+                    f.write('m/z,Counts\n' if prefix == 'MZ' else 'Drift Time,Intensity\n')
+                    np.savetxt(f, np.column_stack([x, y]), fmt='%.4f,%.0f')
+    return ids
+
+
+def with_latency(read_csv, seconds):
+    ''' read_csv delayed by a fixed per-file round trip (emulates the network share). '''
+    def read(*args, **kwargs):
+        time.sleep(seconds)
+        return read_csv(*args, **kwargs)
+    return read
+
+
+def load_sequential(root, ids):
+    ''' The importSAMM2D pattern, for every experiment in turn. '''
+    cat = catalog.open_catalog(root)
+    spectra = {}
+    for experiment in ids:
+        files = cat.lookup(experiment)['files']
+        for s in catalog.SELECTIONS:
+            scatter = pd.concat([pd.read_csv(files[f'{s}-MS'], skiprows=1),
+                                 pd.read_csv(files[f'{s}-DT'], skiprows=1)], axis=1)
+            scatter.columns = catalog.TWIM_2D_COLUMNS
+            spectra[experiment, s] = scatter
+    return spectra
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batched 2D spectrum loader benchmark')
+    parser.add_argument('--root', default=None, help='existing TWIMExtract data root to use')
+    parser.add_argument('--experiments', type=int, default=500, help='synthetic series size')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0, help='ms added to every file read')
+    args = parser.parse_args(argv)
+
+    tmp = None
+    try:
+        if args.root:
+            root = args.root
+            ids = sorted(catalog.open_catalog(root).experiments)
+        else:
+            tmp = tempfile.mkdtemp(prefix='bench-2d-')
+            root = tmp
+            start = time.perf_counter()
+            ids = write_series(root, args.experiments)
+            print(f'wrote {len(ids)} experiments in {time.perf_counter() - start:.1f} s')
+        catalog.open_catalog(root)
+        print(f'{len(ids)} experiments, {6 * len(ids)} files, {args.latency:g} ms per file')
+        if args.latency:
+            pd.read_csv = with_latency(pd.read_csv, args.latency / 1000)
+
+        start = time.perf_counter()
+        load_sequential(root, ids)
+        sequential = time.perf_counter() - start
+        print(f'sequential importSAMM2D loop: {sequential:7.2f} s')
+
+        start = time.perf_counter()
+        spectra = twim.load_2d_batch(root, ids, workers=args.workers, cache=False)
+        batched = time.perf_counter() - start
+        print(f'load_2d_batch ({args.workers} threads): {batched:7.2f} s '
+              f'({sequential / batched:.1f}x, {len(spectra)} rows, '
+              f'{spectra.memory_usage(deep=True).sum() / 1e6:.0f} MB)')
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
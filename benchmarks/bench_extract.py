@@ -0,0 +1,107 @@
+'''
+bench_extract.py
+Python Version: 3.9
+Purpose: Measures extraction orchestration throughput (jobs/minute) with
+the local Apex3D stand-in (samm/fakeapex.py), so it runs anywhere,
+without DriftScope.
+
+Modes:
+    serial  - one Apex3D process at a time (the original apexGo() loop)
+    pooled  - samm.extract worker pool with --workers processes
+    distributed - shared-folder work queue (samm.workqueue) drained by
+              --workers separate worker processes, as on several PCs
+
+Usage: python benchmarks/bench_extract.py --jobs 16 --mb 2 --workers 4 --mode cpu
+'''
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from samm import workqueue
+from samm.extract import BACKENDS, extract_all
+
+
+def make_raw_dirs(root, n_jobs, mb):
+    ''' Creates n_jobs synthetic .raw directories of roughly `mb` MB each. '''
+    raw_paths = []
+    for i in range(n_jobs):
+        raw = Path(root) / f'EJ3-99-{i:03d}-RA1-Sampling-2.raw'
+        raw.mkdir(parents=True)
+        (raw / '_FUNC001.DAT').write_bytes(os.urandom(int(mb * 1e6)))
+        raw_paths.append(raw)
+    return raw_paths
+
+
+# Each mode extracts raw_paths into output_dir and returns the number of failed jobs
+
+def run_serial(raw_paths, output_dir, workers):
+    jobs = extract_all(raw_paths, output_dir, workers=1, on_status=None,
+                       apex_path=BACKENDS['fake'])
+    return sum(job.status != 'done' for job in jobs)
+
+
+def run_pooled(raw_paths, output_dir, workers):
+    jobs = extract_all(raw_paths, output_dir, workers=workers, on_status=None,
+                       apex_path=BACKENDS['fake'])
+    return sum(job.status != 'done' for job in jobs)
+
+
+def run_distributed(raw_paths, output_dir, workers):
+    queue_dir = Path(output_dir).parent / f'queue-{Path(output_dir).name}'
+    workqueue.enqueue(queue_dir, raw_paths, output_dir)
+    procs = [subprocess.Popen([sys.executable, '-m', 'samm.workqueue', 'work', str(queue_dir),
+                               '--backend', 'fake'], stdout=subprocess.DEVNULL)
+             for _ in range(workers)]
+    for proc in procs:
+        proc.wait()
+    return len(raw_paths) - workqueue.queue_status(queue_dir)['done']
+
+
+MODES = {'serial': run_serial, 'pooled': run_pooled, 'distributed': run_distributed}
+
+
+def bench(mode, raw_paths, root, workers):
+    output_dir = Path(root) / f'out-{mode}'
+    output_dir.mkdir()
+    start = time.perf_counter()
+    failed = MODES[mode](raw_paths, output_dir, workers)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(raw_paths) / elapsed * 60, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Apex3D orchestration throughput.')
+    parser.add_argument('--jobs', type=int, default=16)
+    parser.add_argument('--mb', type=float, default=2, help='size of each synthetic .raw')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--mode', choices=['sleep', 'cpu'], default='cpu',
+                        help='how the stand-in spends its time')
+    parser.add_argument('--seconds-per-mb', type=float, default=0.25)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    os.environ['FAKE_APEX_MODE'] = args.mode
+    os.environ['FAKE_APEX_SECONDS_PER_MB'] = str(args.seconds_per_mb)
+    root = tempfile.mkdtemp(prefix='samm-bench-')
+    try:
+        raw_paths = make_raw_dirs(Path(root) / 'data', args.jobs, args.mb)
+        print(f'{args.jobs} jobs x {args.mb} MB, {args.workers} workers, '
+              f'{args.mode} stand-in, {os.cpu_count()} CPUs')
+        baseline = None
+        for mode in args.modes:
+            elapsed, rate, failed = bench(mode, raw_paths, root, args.workers)
+            baseline = baseline or elapsed
+            print(f'{mode:<12} {elapsed:8.2f} s  {rate:8.1f} jobs/min  '
+                  f'x{baseline / elapsed:.2f}  ({failed} failed)')
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+'''
+bench_iontable.py
+Python Version: 3.9
+Purpose: Compares load time of an Apex3D ion table parsed from CSV (as
+importSAMM3D does) against its columnar copy (samm/iontable.py), whole
+and for an m/z window read with row-group skipping.
+
+A synthetic high-density table is written with the Apex3D stand-in
+(samm/fakeapex.py) unless an existing _Apex3DIons.csv is given.
+
+Usage: python benchmarks/bench_iontable.py --ions 1000000
+       python benchmarks/bench_iontable.py --csv EJ3-57-158-BC4-Sampling-2_Apex3DIons.csv
+'''
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from samm import fakeapex, iontable
+
+
+def best_of(fn, repeat):
+    ''' Fastest of `repeat` timed calls, in seconds. '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apex3D ion table load benchmark')
+    parser.add_argument('--csv', default=None, help='existing _Apex3DIons.csv to use')
+    parser.add_argument('--ions', type=int, default=1000000, help='rows in the synthetic table')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix='bench-iontable-')
+    try:
+        if args.csv:
+            csv_path = Path(tmp) / Path(args.csv).name
+            shutil.copyfile(args.csv, csv_path)
+        else:
+            csv_path = Path(tmp) / 'EJ3-99-001-RA1-Sampling-2_Apex3DIons.csv'
+            fakeapex.write_ions(str(csv_path), args.ions, seed=1)
+        print(f'{csv_path.name}: {os.path.getsize(csv_path) / 1e6:.1f} MB CSV')
+
+        subset = ['m_z', 'mobility', 'area']
+        window = {'m_z': (780, 1100), 'area': (2, None)}  # Figure2.py's plot window
+        results = {'CSV, filtered after': best_of(
+            lambda: iontable.range_mask(pd.read_csv(csv_path), window), args.repeat)}
+        results['CSV (pd.read_csv)'] = best_of(lambda: pd.read_csv(csv_path), args.repeat)
+        for fmt in sorted(iontable.FORMATS):
+            try:
+                path = iontable.write_columnar(csv_path, fmt)
+            except ImportError:
+                print(f'{fmt}: skipped (pyarrow not installed)')
+                continue
+            print(f'{path.name}: {os.path.getsize(path) / 1e6:.1f} MB')
+            results[f'{fmt}, all columns'] = best_of(
+                lambda: iontable.load_columnar(path), args.repeat)
+            results[f'{fmt}, m/z DT area'] = best_of(
+                lambda: iontable.load_columnar(path, subset), args.repeat)
+            results[f'{fmt}, m/z 780-1100'] = best_of(
+                lambda: iontable.load_columnar(path, subset, window), args.repeat)
+            path.unlink()
+
+        baseline = results['CSV (pd.read_csv)']
+        for name, seconds in results.items():
+            print(f'{name:<22} {seconds:8.3f} s  (x{baseline / seconds:.1f})')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    main()
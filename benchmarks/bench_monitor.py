@@ -0,0 +1,116 @@
+'''
+bench_monitor.py
+Python Version: 3.9
+Purpose: Times a SAMMmonitor run over a folder of Apex3D ion tables: the
+mainPC loop of SAMMmonitor.py (for every target, re-import every file and
+mask it) against monitor.area_matrix (every file read once, all targets
+screened in one pass, files spread over worker processes).
+
+The loop is timed on --loop-targets targets and scaled to the full target
+list (it re-reads all files for each target); both are checked to give the
+same summed areas for those targets. The incremental mode (monitor.update)
+is then timed on a refresh after one new file arrives.
+
+Usage: python benchmarks/bench_monitor.py --files 12 --ions 200000 --targets 200
+'''
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from samm import fakeapex, iontable, monitor, naming
+
+
+def main_loop(csv_files, targets, mz_tol, mob_tol):
+    ''' mainPC from SAMMmonitor.py: one import and one mask per (target, file). '''
+    areas = {}
+    for target in targets.itertuples():
+        for path in csv_files:
+            raw_data = iontable.import_apex3d(path, cache=False)
+            m_range = (raw_data['m/z'] >= target.mz - mz_tol) & (raw_data['m/z'] <= target.mz + mz_tol)
+            d_range = ((raw_data['DT'] >= target.mobility * (1 - mob_tol)) &
+                       (raw_data['DT'] <= target.mobility * (1 + mob_tol)))
+            areas[target.target, path] = raw_data.loc[m_range & d_range, 'Area'].sum()
+    return areas
+
+
+def best_of(fn, repeat):
+    ''' Fastest of `repeat` timed calls, in seconds. '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Batch monitor benchmark')
+    parser.add_argument('--files', type=int, default=12)
+    parser.add_argument('--ions', type=int, default=200000, help='ions per file')
+    parser.add_argument('--targets', type=int, default=200)
+    parser.add_argument('--loop-targets', type=int, default=2, help='targets timed with the old loop')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix='bench-monitor-')
+    try:
+        csv_files = []
+        for i in range(args.files):
+            path = Path(tmp) / f'EJ3-99-{i + 1:03d}-RA{i % 5 + 1}-Sampling-2_Apex3DIons.csv'
+            fakeapex.write_ions(str(path), args.ions, seed=i)
+            csv_files.append(str(path))
+
+        ions = iontable.read_csv_typed(csv_files[0], ['m_z', 'mobility'])
+        rng = np.random.default_rng(1)
+        picks = ions.iloc[rng.integers(0, len(ions), args.targets)]
+        targets = pd.DataFrame({'target': [f'T{i:04d}' for i in range(args.targets)],
+                                'mz': picks['m_z'].to_numpy() + rng.normal(0, 0.2, args.targets),
+                                'mobility': picks['mobility'].to_numpy().astype('float64')})
+
+        few = targets.head(args.loop_targets)
+        start = time.perf_counter()
+        old = main_loop(csv_files, few, 1.0, 0.05)
+        loop = (time.perf_counter() - start) * len(targets) / len(few)
+
+        batch = best_of(lambda: monitor.area_matrix(csv_files, targets, 1.0, 0.05, workers=1), args.repeat)
+        pooled = best_of(lambda: monitor.area_matrix(csv_files, targets, 1.0, 0.05, workers=args.workers),
+                         args.repeat)
+        matrix = monitor.area_matrix(csv_files, targets, 1.0, 0.05, workers=args.workers)
+        agree = all(np.isclose(matrix.loc[name, naming.experiment_id(path)], area)
+                    for (name, path), area in old.items())
+
+        state_dir = Path(tmp) / 'SAMMmonitor Output'
+        first = best_of(lambda: monitor.update(tmp, targets, 1.0, 0.05, state_dir, workers=args.workers), 1)
+        fakeapex.write_ions(str(Path(tmp) / 'EJ3-99-999-RA1-Sampling-2_Apex3DIons.csv'), args.ions, seed=999)
+        refresh = best_of(lambda: monitor.update(tmp, targets, 1.0, 0.05, state_dir, workers=args.workers), 1)
+        unchanged = best_of(lambda: monitor.update(tmp, targets, 1.0, 0.05, state_dir, workers=args.workers),
+                            args.repeat)
+        cumulative = monitor.load_results(state_dir)
+        incremental_agree = np.allclose(cumulative[matrix.columns].loc[matrix.index], matrix)
+
+        print(f'{args.files} files x {args.ions} ions, {len(targets)} targets')
+        print(f'mainPC loop (scaled from {len(few)} targets)  {loop:9.1f} s  '
+              f'({len(targets) * len(csv_files)} file reads)')
+        print(f'area_matrix, 1 process           {batch:9.2f} s  ({len(csv_files)} file reads, x{loop / batch:,.0f})')
+        print(f'area_matrix, {args.workers} processes         {pooled:9.2f} s')
+        print(f'same areas as the loop: {agree}')
+        print(f'update, first run                {first:9.2f} s')
+        print(f'update, one new file             {refresh:9.2f} s')
+        print(f'update, nothing new              {unchanged:9.2f} s')
+        print(f'cumulative table matches area_matrix: {incremental_agree} '
+              f'({len(cumulative.columns)} injections)')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    main()
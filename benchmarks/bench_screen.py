@@ -0,0 +1,119 @@
+'''
+bench_screen.py
+Python Version: 3.9
+Purpose: Times target screening of one Apex3D ion table: the check_hit
+loop of the SAMMmonitor scripts (every target x every row, float() per
+cell) against the searchsorted engine in samm/screen.py.
+
+The loop is timed on --loop-targets targets and scaled to the full target
+list (its cost is linear in the number of targets); both are checked to
+find the same hits for those targets.
+
+Usage: python benchmarks/bench_screen.py --ions 500000 --targets 1000
+'''
+
+import argparse
+import csv
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from samm import fakeapex, iontable, screen
+
+
+def check_hit(hit_mz, hit_mobility, target_data, mz_tolerance, mob_tolerance):
+    ''' check_hit from SAMMmonitor-121219.py (absolute m/z tolerance). '''
+    t_mz, t_mobility = target_data['mz'], target_data['mobility']
+    if hit_mz >= t_mz - mz_tolerance and hit_mz <= t_mz + mz_tolerance:
+        mob_tolerance = t_mobility * mob_tolerance
+        if hit_mobility >= t_mobility - mob_tolerance and hit_mobility <= t_mobility + mob_tolerance:
+            return True
+        return False
+    return False
+
+
+def screen_loop(data_list, target_dict, mz_tolerance, mob_tolerance):
+    ''' screen_hits_for_single_csv from SAMMmonitor-121219.py, without the file read. '''
+    hits_dict = {}
+    for target, target_data in target_dict.items():
+        hits_list = []
+        for data in data_list:
+            obs_mz, obs_mobility = float(data[2]), float(data[8])
+            if check_hit(obs_mz, obs_mobility, target_data, mz_tolerance, mob_tolerance):
+                hits_list.append(data[1:9])
+        hits_dict[target] = hits_list
+    return hits_dict
+
+
+def best_of(fn, repeat):
+    ''' Fastest of `repeat` timed calls, in seconds. '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def make_targets(ions, n_targets, seed=1):
+    ''' Targets centred near randomly chosen ions, so most have hits. '''
+    rng = np.random.default_rng(seed)
+    picks = ions.iloc[rng.integers(0, len(ions), n_targets)]
+    return pd.DataFrame({'target': [f'T{i:04d}' for i in range(n_targets)],
+                         'mz': picks['m_z'].to_numpy() + rng.normal(0, 0.2, n_targets),
+                         'mobility': picks['mobility'].to_numpy().astype('float64')})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Target screening benchmark')
+    parser.add_argument('--ions', type=int, default=500000)
+    parser.add_argument('--targets', type=int, default=1000)
+    parser.add_argument('--loop-targets', type=int, default=5, help='targets timed with the old loop')
+    parser.add_argument('--mz-tolerance', type=float, default=1)
+    parser.add_argument('--mob-tolerance', type=float, default=0.05)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix='bench-screen-')
+    try:
+        csv_path = Path(tmp) / 'EJ3-99-001-RA1-Sampling-2_Apex3DIons.csv'
+        fakeapex.write_ions(str(csv_path), args.ions, seed=1)
+        ions = iontable.read_csv_typed(csv_path)
+        with open(csv_path) as f:
+            data_list = list(csv.reader(f))[1:]
+        targets = make_targets(ions, args.targets)
+        tol = (args.mz_tolerance, args.mob_tolerance)
+
+        hits = screen.screen_ions(ions, targets, *tol)
+        engine = best_of(lambda: screen.screen_ions(ions, targets, *tol), args.repeat)
+        sorted_ions = ions.sort_values('m_z', ignore_index=True)
+        presorted = best_of(lambda: screen.screen_ions(sorted_ions, targets, *tol), args.repeat)
+
+        few = targets.head(args.loop_targets)
+        target_dict = {t.target: {'mz': t.mz, 'mobility': t.mobility} for t in few.itertuples()}
+        start = time.perf_counter()
+        old = screen_loop(data_list, target_dict, *tol)
+        loop = (time.perf_counter() - start) * len(targets) / len(few)
+
+        new = screen.hits_dict(hits[hits['target'].isin(few['target'])], few)
+        agree = all([float(v) for v in a] == [float(v) for v in b]
+                    for name in target_dict for a, b in zip(old[name], new[name])) and \
+            all(len(old[name]) == len(new[name]) for name in target_dict)
+
+        print(f'{len(ions)} ions, {len(targets)} targets, {len(hits)} hits '
+              f'(m/z +/- {args.mz_tolerance}, mobility +/- {args.mob_tolerance:.0%})')
+        print(f'check_hit loop (scaled from {len(few)} targets) {loop:9.1f} s')
+        print(f'screen.screen_ions (ions unsorted)      {engine * 1000:9.1f} ms  (x{loop / engine:,.0f})')
+        print(f'screen.screen_ions (sorted columnar copy) {presorted * 1000:7.1f} ms')
+        print(f'same hits as the loop: {agree}')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    main()
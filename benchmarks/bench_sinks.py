@@ -0,0 +1,98 @@
+'''
+bench_sinks.py
+Python Version: 3.9
+Purpose: Times writing screening hits out: append_output_csv from the
+SAMMmonitor scripts (open, append one row, close, for every hit) against
+the buffered sinks in samm/sinks.py (CSV, SQLite; Parquet when pyarrow is
+installed).
+
+Usage: python benchmarks/bench_sinks.py --hits 200000
+'''
+
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from samm import screen, sinks
+
+HEADERS = ['Target Formula', 'Index', 'Observed m/z', 'm/z No Cal', 'RT', 'Intensity', 'Area', 'Counts', 'Mobility']
+
+
+def append_output_csv(output_csv, write_list, delimitchar=','):
+    ''' append_output_csv from SAMMmonitor.py. '''
+    with open(output_csv, 'a') as opened_file:
+        writer = csv.writer(opened_file, delimiter=delimitchar)
+        writer.writerow(write_list)
+
+
+def make_hits(n_hits, seed=1):
+    ''' Hit table shaped like screen.screen_ions() output. '''
+    rng = np.random.default_rng(seed)
+    hits = pd.DataFrame({
+        'target': rng.choice([f'T{i:04d}' for i in range(1000)], n_hits),
+        'index': np.arange(n_hits, dtype='int32'),
+        'm_z': rng.uniform(150, 3000, n_hits),
+        'mzNoCal': rng.uniform(150, 3000, n_hits),
+        'rt': rng.uniform(0, 2, n_hits).astype('float32'),
+        'inten': rng.integers(1, 5000, n_hits, dtype='int32'),
+        'area': rng.integers(1, 9000, n_hits, dtype='int32'),
+        'counts': rng.integers(1, 9000, n_hits, dtype='int32'),
+        'mobility': rng.uniform(10, 200, n_hits).astype('float32')})
+    return hits[['target'] + screen.HIT_COLUMNS]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hit output benchmark')
+    parser.add_argument('--hits', type=int, default=200000)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix='bench-sinks-')
+    try:
+        hits = make_hits(args.hits)
+        rows = [list(row) for row in hits.itertuples(index=False, name=None)]
+
+        def per_row():
+            path = Path(tmp) / 'per-row.csv'
+            append_output_csv(path, HEADERS)
+            for row in rows:
+                append_output_csv(path, row)
+
+        def to_sink(name):
+            with sinks.open_sink(Path(tmp) / name, HEADERS) as sink:
+                sink.write_frame(hits)
+
+        results = [('append_output_csv, one open per hit', timed(per_row), 'per-row.csv')]
+        for name in ('hits.csv', 'hits.sqlite', 'hits.parquet'):
+            try:
+                results.append((f'open_sink({name!r})', timed(lambda: to_sink(name)), name))
+            except ImportError:
+                print(f'{name}: skipped (pyarrow not installed)')
+
+        old, new = (pd.read_csv(Path(tmp) / name) for name in ('per-row.csv', 'hits.csv'))
+        numeric = HEADERS[1:]
+        same = (old.shape == new.shape and old['Target Formula'].equals(new['Target Formula']) and
+                np.allclose(old[numeric], new[numeric], rtol=1e-6))
+        print(f'{len(hits)} hits')
+        for label, seconds, name in results:
+            print(f'{label:38s} {seconds * 1000:9.1f} ms  ({os.path.getsize(Path(tmp) / name) / 1e6:.1f} MB)')
+        print(f'same rows in the CSV outputs: {same}')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    main()
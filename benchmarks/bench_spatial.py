@@ -0,0 +1,104 @@
+'''
+bench_spatial.py
+Python Version: 3.9
+Purpose: Times (m/z, drift time) window queries on one Apex3D ion table:
+a full boolean mask per window (how the monitor and rule-file selections
+scanned the table) against the grid index in samm/spatial.py, for target
+windows, a selection rule and nearest-ion look-ups.
+
+Usage: python benchmarks/bench_spatial.py --ions 1000000 --windows 1000
+'''
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from samm import fakeapex, iontable, spatial
+
+
+def best_of(fn, repeat):
+    ''' Fastest of `repeat` timed calls, in seconds. '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def mask_sums(mz, dt, area, boxes):
+    ''' Area inside each window, one boolean mask over the table per window. '''
+    return np.array([area[(mz >= a) & (mz <= b) & (dt >= c) & (dt <= d)].sum() for a, b, c, d in zip(*boxes)])
+
+
+def make_rule(n_bins=200, seed=2):
+    ''' A diagonal charge-state band like the SAMM2D rule files: one m/z range per drift bin. '''
+    rng = np.random.default_rng(seed)
+    bins = np.arange(1, n_bins + 1)
+    low = 150 + 12 * bins + rng.normal(0, 5, n_bins)
+    return pd.DataFrame({'bin': bins, 'mz_low': low, 'mz_high': low + 40})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Spatial index benchmark')
+    parser.add_argument('--ions', type=int, default=1000000)
+    parser.add_argument('--windows', type=int, default=1000)
+    parser.add_argument('--points', type=int, default=1000, help='nearest-ion look-ups')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix='bench-spatial-')
+    try:
+        csv_path = Path(tmp) / 'EJ3-99-001-RA1-Sampling-2_Apex3DIons.csv'
+        fakeapex.write_ions(str(csv_path), args.ions, seed=1)
+        ions = iontable.read_csv_typed(csv_path, ['m_z', 'mobility', 'area'])
+        mz = ions['m_z'].to_numpy()
+        dt = ions['mobility'].to_numpy().astype('float64')
+        area = ions['area'].to_numpy().astype('float64')
+
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, len(mz), max(args.windows, args.points))
+        boxes = spatial.target_boxes(mz[picks[:args.windows]] + rng.normal(0, 0.2, args.windows),
+                                     dt[picks[:args.windows]], 1.0, 0.05)
+        points = (mz[picks[:args.points]] + rng.normal(0, 2, args.points),
+                  dt[picks[:args.points]] + rng.normal(0, 2, args.points))
+        rule = make_rule()
+
+        build = best_of(lambda: spatial.IonGrid(mz, dt), args.repeat)
+        grid = spatial.IonGrid(mz, dt)
+
+        few = tuple(b[:max(1, args.windows // 20)] for b in boxes)
+        masks = best_of(lambda: mask_sums(mz, dt, area, few), 1) * args.windows / len(few[0])
+        windows = best_of(lambda: grid.sum_boxes(area, *boxes), args.repeat)
+        same = np.allclose(mask_sums(mz, dt, area, few), grid.sum_boxes(area, *few))
+
+        rule_mask = best_of(lambda: np.flatnonzero(np.logical_or.reduce(
+            [(mz >= a) & (mz <= b) & (dt >= c) & (dt <= d)
+             for a, b, c, d in zip(*spatial.rule_boxes(rule))])), 1)
+        rule_grid = best_of(lambda: grid.select_rule(rule), args.repeat)
+
+        few_points = max(1, args.points // 20)
+        brute = best_of(lambda: [np.hypot(mz - x, dt - y).argmin()
+                                 for x, y in zip(points[0][:few_points], points[1][:few_points])],
+                        1) * args.points / few_points
+        nearest = best_of(lambda: grid.nearest(*points), args.repeat)
+
+        print(f'{len(mz)} ions, grid {grid.n_mz} x {grid.n_dt} cells (built in {build * 1000:.0f} ms)')
+        print(f'{args.windows} target windows: masks {masks * 1000:9.1f} ms (scaled), '
+              f'grid {windows * 1000:7.1f} ms  (x{masks / windows:,.0f}, same sums: {same})')
+        print(f'rule file ({len(rule)} bins):   masks {rule_mask * 1000:9.1f} ms, '
+              f'grid {rule_grid * 1000:7.1f} ms  (x{rule_mask / rule_grid:,.0f})')
+        print(f'{args.points} nearest ions:    brute {brute * 1000:9.1f} ms (scaled), '
+              f'grid {nearest * 1000:7.1f} ms  (x{brute / nearest:,.0f})')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,7 @@ import matplotlib.pyplot as plt
 import mpl_scatter_density
 from matplotlib import rcParams
 import os
-import pandas as pd
+from samm import iontable
 import numpy as np
 import matplotlib as mpl
 from cycler import cycler
@@ -38,21 +38,8 @@ def importSAMM3D(file3D):
                  r'-Sampling-2\MZ_EJ3-' + r'-Sampling-2_Apex3DIons.csv')
     apexMS = str('D:\\2-SAMM\SAMM - Data Workup Folder\Data Workup (300919)\SAMM3D Extracts\APEX Output(3-57)\EJ3-' +
                  userInputApex + '-Sampling-2_Apex3DIons.csv')
-    apexDF = pd.read_csv(apexMS)
-    x, y, z, = (
-        list(apexDF['m_z']),
-        list(apexDF['mobility']),
-        list(apexDF['area']),
-    )
-    xError, yError, zError = (
-        list(apexDF['errMzPPM']),
-        list(apexDF['errMobility']),
-        list(apexDF['errArea']),
-    )
-    newApexDF = pd.DataFrame(
-        zip(x, y, z, xError, yError, zError),
-        columns=['m/z', 'DT', 'Area', 'm/z Error', 'DT Error', 'Area Error'])
-    return newApexDF
+    # Only ions inside the plot window are read; the filter below stays exact
+    return iontable.import_apex3d(apexMS, mz=msRange, dt=dtRange, area=(areaMin, None))
 
 #   Default MPL Settings
 def mplDefaults():
@@ -2,9 +2,9 @@
 # Python 3.7.4
 # Eric Janusson
 # 310320
-import os
 import pandas as pd
-import re
+from samm import catalog
+from samm import metadata
 
 # SAMMtrend Solvent Experiment Data Import
 experiment = 'EJ3-57'
@@ -20,31 +20,7 @@ def importSAMM2D(file2D):
     userInput = str(file2D)
     # CSV file path
     basePath = r'D:\2-SAMM\SAMM - Data Workup Folder\Data Workup (300919)\Experimental Data\3-57-SAMM2\2DExtract(3-57-2)'
-    frMS = str(basePath + r'\Full Range\MS\EJ3-' + userInput + r'-Sampling-2\MZ_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#FullRange-POMSolv-Rangefile.txt_raw.csv')
-    frDT = str(basePath + r'\Full Range\DT\EJ3-' + userInput + r'-Sampling-2\DT_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#FullRange-POMSolv-Rangefile.txt_raw.csv')
-    z1MS = str(basePath + r'\Z1\MS\EJ3-' + userInput + r'-Sampling-2\MZ_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#POMSolv-Z1-RuleFile.rul_raw.csv')
-    z1DT = str(basePath + r'\Z1\DT\EJ3-' + userInput + r'-Sampling-2\DT_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#POMSolv-Z1-RuleFile.rul_raw.csv')
-    z2MS = str(basePath + r'\Z2\MS\EJ3-' + userInput + r'-Sampling-2\MZ_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#POMSolv-Z2-RuleFile.rul_raw.csv')
-    z2DT = str(basePath + r'\Z2\DT\EJ3-' + userInput + r'-Sampling-2\DT_EJ3-' +
-               userInput + r'-Sampling-2_fn-1_#POMSolv-Z2-RuleFile.rul_raw.csv')
-    paths = [frMS, frDT, z1MS, z1DT, z2MS, z2DT]
-    frScatter = ([pd.read_csv(i, skiprows=1)
-                  for i in paths if os.path.lexists(i) and i[104:106] == r'Fu'])
-    frScatter = pd.concat([frScatter[0], frScatter[1]], axis=1)
-    frScatter.columns = ['m/z', 'Counts', 'Drift Time', 'Intensity']
-    z1Scatter = ([pd.read_csv(i, skiprows=1)
-                  for i in paths if os.path.lexists(i) and i[104:106] == r'Z1'])
-    z1Scatter = pd.concat([z1Scatter[0], z1Scatter[1]], axis=1)
-    z1Scatter.columns = ['m/z', 'Counts', 'Drift Time', 'Intensity']
-    z2Scatter = ([pd.read_csv(i, skiprows=1)
-                  for i in paths if os.path.lexists(i) and i[104:106] == r'Z2'])
-    z2Scatter = pd.concat([z2Scatter[0], z2Scatter[1]], axis=1)
-    z2Scatter.columns = ['m/z', 'Counts', 'Drift Time', 'Intensity']
+    frScatter, z1Scatter, z2Scatter = catalog.import_samm2d(basePath, userInput, replicate=2)
     return frScatter, z1Scatter, z2Scatter, userInput
 
 
@@ -52,26 +28,10 @@ def importSAMM2D(file2D):
 
 
 def getSolventsFromID():
-    # Organize data by experiment type (solvent used and corresponding solvent)
-    pos = list(r'RA, RB, RC, RD, BA, BB, BC, BD, GA, GB, GC, GD'.split(', '))
-    solv = list(
-        r"H2O MeOH EtOH MeCN D2O_40 D2O_20 D2O_10 D2O_40D D2O_40G MeCNG THFG H2OG".split(' '))
-    posSolv = dict(zip(pos, solv))
-    exptSolv = []
-    exptCond = []
-    exptRegex = re.compile(r'-\D\D\d-')
-    for i in range(len(data['ID'])):  # For the length of the list of experiments
-        # Create regex search for vial position in experiment file titles
-        mo = re.search(exptRegex, data['ID'][i])
-        vialPos = list(mo.group()[1:3])  # Put positions into list
-        # vialPos = vialPos[1:3]
-        vialPos = ''.join(vialPos)
-        solvent = posSolv[vialPos]  # Conversion to solvents
-        exptSolv.append(solvent)
-
-        condNum = int(mo.group()[3])
-        exptCond.append(condNum)
-    return exptSolv, exptCond
+    # Solvent and condition number from the vial position in each experiment ID
+    # (mapping in samm/vial-solvents.csv)
+    annotated = metadata.annotate(data, id_column='ID')
+    return annotated['Solvent'], annotated['Condition']
 
 print(f'Adding {experiment} Information...\n')
 data['Solvent'], data['Condition'] = getSolventsFromID()
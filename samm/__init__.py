@@ -0,0 +1,6 @@
+'''
+samm
+Python Version: 3.9
+Purpose: Importable Self-Assembly Mobility Mapping (SAMM) helpers shared by the
+extraction, monitoring and plotting scripts.
+'''
@@ -0,0 +1,224 @@
+'''
+cache.py
+Python Version: 3.9
+Purpose: Keeps parsed data files warm across figure iterations and monitor
+re-runs, so a file already parsed is served from memory or a local pickle
+instead of being parsed again.
+
+Entries are keyed by file path, size, mtime and the reader's options, so a
+re-extracted file is never served stale. Two tiers:
+    memory  least-recently-used frames up to SAMM_CACHE_MEMORY_MB (default 512)
+    disk    pickles in SAMM_CACHE_DIR (default ~/.samm-cache), least recently
+            used removed beyond SAMM_CACHE_DISK_MB (default 2048; 0 disables)
+
+Frames are returned as copies, so callers may modify them freely.
+
+    >>> from samm import cache
+    >>> table = cache.cached_load(csv_path, 'apex3d', lambda: pd.read_csv(csv_path))
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+MB = 1024 * 1024
+
+
+def frame_bytes(value):
+    ''' Approximate in-memory size of a DataFrame, array or other object. '''
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sum(frame_bytes(v) for v in value)
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def copy_value(value):
+    ''' Copy handed to callers so cached entries are never mutated. '''
+    if hasattr(value, 'copy'):
+        return value.copy()
+    if isinstance(value, (list, tuple)):
+        return type(value)(copy_value(v) for v in value)
+    return value
+
+
+class ParseCache:
+    '''
+    Two-tier (memory LRU + size-capped disk) cache of parsed files.
+    Safe to use from several threads.
+    '''
+
+    def __init__(self, memory_bytes=512 * MB, disk_dir=None, disk_bytes=2048 * MB):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir and disk_bytes else None
+        self.disk_bytes = disk_bytes
+        self.entries = OrderedDict()  # key -> (value, size), least recently used first
+        self.used = 0
+        self.lock = threading.Lock()
+        self.stats = {'memory': 0, 'disk': 0, 'parsed': 0}
+
+    def key(self, path, reader, options):
+        ''' Cache key for one file read by `reader` with `options`. '''
+        st = os.stat(path)
+        blob = json.dumps([os.path.abspath(path), st.st_size, st.st_mtime_ns, reader, options],
+                          sort_keys=True, default=str)
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+    def remember(self, key, value):
+        ''' Adds value to the memory tier, evicting least recently used entries. '''
+        size = frame_bytes(value)
+        if size > self.memory_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.used -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.used += size
+            while self.used > self.memory_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.used -= evicted
+
+    def recall(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+    def disk_path(self, key):
+        return self.disk_dir / f'{key}.pkl'
+
+    def read_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self.disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(path)  # mtime doubles as last-use time for eviction
+            return value
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def write_disk(self, key, value):
+        if self.disk_dir is None:
+            return
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        path = self.disk_path(key)
+        tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex[:8]}.part')
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        self.trim_disk()
+
+    def trim_disk(self):
+        ''' Deletes least recently used pickles until the disk tier fits its cap. '''
+        files = []
+        for path in self.disk_dir.glob('*.pkl'):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def load(self, path, reader, load, **options):
+        '''
+        Returns the parsed contents of path, calling load() only on a miss.
+
+        Args:
+            path (str): source file; its size and mtime are part of the key.
+            reader (str): name of the parser, so different readers of the
+                same file are cached separately.
+            load (callable): parses the file (no arguments).
+            **options: reader options that change the result.
+        '''
+        key = self.key(path, reader, options)
+        value = self.recall(key)
+        if value is not None:
+            self.stats['memory'] += 1
+            return copy_value(value)
+        value = self.read_disk(key)
+        if value is not None:
+            self.stats['disk'] += 1
+        else:
+            self.stats['parsed'] += 1
+            value = load()
+            self.write_disk(key, value)
+        self.remember(key, value)
+        return copy_value(value)
+
+    def clear(self):
+        ''' Empties both tiers. '''
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
+        if self.disk_dir is not None:
+            for path in self.disk_dir.glob('*.pkl'):
+                path.unlink(missing_ok=True)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    ''' Process-wide cache configured from the SAMM_CACHE_* environment settings. '''
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ParseCache(
+                memory_bytes=int(float(os.environ.get('SAMM_CACHE_MEMORY_MB', 512)) * MB),
+                disk_dir=os.environ.get('SAMM_CACHE_DIR', Path.home() / '.samm-cache'),
+                disk_bytes=int(float(os.environ.get('SAMM_CACHE_DISK_MB', 2048)) * MB))
+        return _default
+
+
+def cached_load(path, reader, load, **options):
+    ''' get_cache().load(...): parsed contents of path from the shared cache. '''
+    return get_cache().load(path, reader, load, **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Show or clear the on-disk parse cache.')
+    parser.add_argument('--clear', action='store_true', help='delete every cached file')
+    args = parser.parse_args(argv)
+
+    cache = get_cache()
+    if cache.disk_dir is None:
+        print('Disk cache disabled (SAMM_CACHE_DISK_MB=0)')
+        return 0
+    if args.clear:
+        cache.clear()
+    files = list(cache.disk_dir.glob('*.pkl')) if cache.disk_dir.is_dir() else []
+    size = sum(path.stat().st_size for path in files)
+    print(f'{cache.disk_dir}: {len(files)} entries, {size / MB:.1f} of {cache.disk_bytes / MB:.0f} MB')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
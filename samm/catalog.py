@@ -0,0 +1,253 @@
+r'''
+catalog.py
+Python Version: 3.9
+Purpose: Indexes every TWIMExtract (MZ_/DT_) and Apex3D file under a data
+root by experiment, so scripts look files up by ID instead of building
+Windows paths by string concatenation and probing them with os.path.lexists.
+
+The index is saved as samm-catalog.json in the data root. refresh() only
+re-lists folders whose modification time changed since the last scan, so
+keeping the catalog current on a network share is cheap.
+
+    >>> from samm.catalog import Catalog
+    >>> cat = Catalog(r'D:\2-SAMM\...\2DExtract(3-57-2)').refresh()
+    >>> cat.lookup('57-158-BC4')['files']['Z1-DT']
+    'D:\\2-SAMM\\...\\Z1\\DT\\EJ3-57-158-BC4-Sampling-2\\DT_EJ3-57-158-BC4-Sampling-2_fn-1_#POMSolv-Z1-RuleFile.rul_raw.csv'
+
+File keys are '<selection>-<dimension>' for TWIMExtract exports (FR-MS,
+FR-DT, Z1-MS, ... ) and 'apex3d' for the Apex3D ion table.
+'''
+
+import argparse
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from samm import naming
+from samm.cache import cached_load
+
+CATALOG_NAME = 'samm-catalog.json'
+APEX_SUFFIX = '_Apex3DIons.csv'
+
+# TWIMExtract selections loaded by importSAMM2D, and the column names it uses
+SELECTIONS = ('FR', 'Z1', 'Z2')
+TWIM_2D_COLUMNS = ['m/z', 'Counts', 'Drift Time', 'Intensity']
+
+
+def classify(name):
+    '''
+    Experiment ID and file key of a data file name, or None for other files.
+    Ex: EJ3-57-158-BC4-Sampling-2_Apex3DIons.csv -> ('EJ3-57-158-BC4-Sampling-2', 'apex3d')
+    '''
+    if name.endswith(APEX_SUFFIX):
+        return naming.experiment_id(name), 'apex3d'
+    twim = naming.parse_twim_name(name)
+    if twim:
+        experiment, selection, dimension = twim
+        return experiment, f'{selection}-{dimension}'
+    return None
+
+
+class Catalog:
+    '''
+    Experiment -> data file index for one data root.
+
+    self.experiments: {experiment ID: {'series', 'sample', 'vial',
+    'replicate', 'files': {file key: path}}}. lookup() also accepts the
+    short IDs used in the figure scripts (ex: '57-158-BC4'); a short ID
+    shared by several replicates needs the replicate number.
+    '''
+
+    def __init__(self, root, catalog_path=None):
+        self.root = str(root)
+        self.catalog_path = str(catalog_path or Path(root) / CATALOG_NAME)
+        self.folders, self.changed = {}, False
+        if os.path.isfile(self.catalog_path):
+            with open(self.catalog_path) as f:
+                self.folders = json.load(f).get('folders', {})
+        self.build_index()
+
+    def scan(self, folder):
+        '''
+        Returns the cached listing of folder, re-listing it only if its
+        mtime changed: {'mtime', 'subfolders', 'files': {name: [experiment, key]}}.
+        '''
+        mtime = os.stat(folder).st_mtime
+        cached = self.folders.get(folder)
+        if cached and cached['mtime'] == mtime:
+            return cached
+        listing = {'mtime': mtime, 'subfolders': [], 'files': {}}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    listing['subfolders'].append(entry.path)
+                else:
+                    found = classify(entry.name)
+                    if found:
+                        listing['files'][entry.name] = list(found)
+        self.folders[folder] = listing
+        self.changed = True
+        return listing
+
+    def refresh(self):
+        ''' Brings the index up to date with the data root, saving it if anything changed. Returns self. '''
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f'Data path cannot be found: {self.root}')
+        seen, pending = set(), [self.root]
+        while pending:
+            folder = pending.pop()
+            try:
+                listing = self.scan(folder)
+            except OSError:
+                continue
+            seen.add(folder)
+            pending.extend(listing['subfolders'])
+        if set(self.folders) != seen:
+            self.folders = {folder: self.folders[folder] for folder in seen}
+            self.changed = True
+        if self.changed:
+            self.build_index()
+            self.save()
+            self.changed = False
+        return self
+
+    def build_index(self):
+        ''' Rebuilds the experiment and short-ID ({short ID: [experiment IDs]}) lookups from the folder listings. '''
+        self.experiments, self.aliases = {}, {}
+        for folder, listing in sorted(self.folders.items()):
+            for name, (experiment, key) in listing['files'].items():
+                entry = self.experiments.get(experiment)
+                if entry is None:
+                    entry = self.experiments[experiment] = dict(naming.parse_experiment(experiment),
+                                                                files={})
+                entry['files'][key] = os.path.join(folder, name)
+        for experiment, entry in sorted(self.experiments.items()):
+            if entry['sample'] is not None and entry['vial']:
+                # IDs as written (ex: EJ3-57-007-RA1) and without zero padding
+                end = experiment.find(f"-{entry['vial']}") + len(entry['vial']) + 1
+                for short in (experiment[:end], f"{entry['series']}-{entry['sample']}-{entry['vial']}"):
+                    for alias in (short, short.split('-', 1)[1]):
+                        matches = self.aliases.setdefault(alias, [])
+                        if experiment not in matches:
+                            matches.append(experiment)
+
+    def save(self):
+        ''' Writes the folder listings atomically (temporary file then rename). '''
+        tmp = f'{self.catalog_path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'root': self.root, 'folders': self.folders}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.catalog_path)
+
+    def resolve(self, key, replicate=None):
+        '''
+        Experiment ID of an experiment ID or short ID.
+        Ex: '57-158-BC4' with replicate=2 -> 'EJ3-57-158-BC4-Sampling-2'
+
+        Args:
+            key (str): experiment ID or short ID.
+            replicate (int): sampling replicate a short ID refers to
+                (experiments without a replicate number also match).
+
+        Raises:
+            KeyError: no files for this experiment under the data root, or
+                the short ID matches several replicates and none was given.
+        '''
+        if key in self.experiments:
+            return key
+        matches = [experiment for experiment in self.aliases.get(key, [])
+                   if replicate is None or self.experiments[experiment]['replicate'] in (None, replicate)]
+        if not matches:
+            replicate_text = '' if replicate is None else f' (replicate {replicate})'
+            raise KeyError(f'No data files for experiment {key}{replicate_text} under {self.root}')
+        if len(matches) > 1:
+            raise KeyError(f'{key} matches several experiments under {self.root} '
+                           f'({", ".join(matches)}); give the replicate or the full experiment ID')
+        return matches[0]
+
+    def lookup(self, key, replicate=None):
+        '''
+        Catalog entry for an experiment ID or short ID (see resolve()).
+        Ex: 'EJ3-57-158-BC4-Sampling-2', 'EJ3-57-158-BC4' or '57-158-BC4'
+        '''
+        return self.experiments[self.resolve(key, replicate)]
+
+    def to_frame(self):
+        ''' One row per experiment: series, sample, vial, replicate and a column per file key. '''
+        rows = [dict({k: v for k, v in entry.items() if k != 'files'}, experiment=experiment,
+                     **entry['files'])
+                for experiment, entry in self.experiments.items()]
+        return pd.DataFrame(rows).set_index('experiment').sort_index()
+
+
+_open_catalogs = {}
+_open_lock = threading.Lock()
+
+
+def open_catalog(root):
+    ''' Catalog for root, refreshed once per process. '''
+    with _open_lock:
+        if str(root) not in _open_catalogs:
+            _open_catalogs[str(root)] = Catalog(root).refresh()
+        return _open_catalogs[str(root)]
+
+
+def read_twim_pair(ms_path, dt_path):
+    '''
+    Side-by-side m/z and drift time TWIMExtract spectra, as importSAMM2D
+    returns them. Repeat reads of unchanged files come from the parse cache.
+    '''
+    def load():
+        scatter = pd.concat([pd.read_csv(ms_path, skiprows=1), pd.read_csv(dt_path, skiprows=1)],
+                            axis=1)
+        scatter.columns = TWIM_2D_COLUMNS
+        return scatter
+
+    st = os.stat(dt_path)
+    return cached_load(ms_path, 'twim_pair', load, dt_path=str(dt_path),
+                       dt_stat=[st.st_size, st.st_mtime_ns])
+
+
+def import_samm2d(root, key, selections=SELECTIONS, replicate=2):
+    '''
+    Loads the TWIMExtract m/z and drift time spectra of one experiment.
+
+    Args:
+        root (str): TWIMExtract data root (ex: the 2DExtract(3-57-2) folder).
+        key (str): experiment ID or short ID, ex: '57-158-BC4'.
+        selections (tuple): selections to load (default: FR, Z1, Z2).
+        replicate (int): sampling replicate of a short ID (default: 2, the
+            -Sampling-2 files importSAMM2D read).
+
+    Returns:
+        list: one DataFrame per selection with columns
+            'm/z', 'Counts', 'Drift Time', 'Intensity'.
+    '''
+    files = open_catalog(root).lookup(key, replicate)['files']
+    return [read_twim_pair(files[f'{s}-MS'], files[f'{s}-DT']) for s in selections]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Index TWIMExtract and Apex3D files by experiment.')
+    parser.add_argument('root', help='data root to scan')
+    parser.add_argument('--csv', help='also write the experiment table to this CSV')
+    args = parser.parse_args(argv)
+
+    try:
+        cat = Catalog(args.root).refresh()
+    except FileNotFoundError as e:
+        sys.exit(f'ERROR: {e}')
+    table = cat.to_frame() if cat.experiments else pd.DataFrame()
+    if args.csv:
+        table.to_csv(args.csv)
+    print(f'{len(cat.experiments)} experiments in {len(cat.folders)} folders ({cat.catalog_path})')
+    if len(table):
+        print(table.drop(columns=['series', 'sample', 'vial', 'replicate']).notna().sum().to_string())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
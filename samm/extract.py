@@ -0,0 +1,516 @@
+r'''
+extract.py
+Python Version: 3.9
+Purpose: Runs DriftScope Apex3D over Waters .raw acquisitions to produce
+m/z, mobility and area ion tables (*_Apex3DIons.csv).
+
+Extractions run in a bounded pool of worker threads. Each worker owns one
+Apex3D64.exe subprocess at a time, so a batch uses up to `workers` cores
+instead of one. extract_changed() consults the output folder's manifest
+(see manifest.py) and only runs Apex3D on new or changed acquisitions.
+
+Nothing here prompts for input, so a batch can be driven from a scheduler:
+    >>> from samm.extract import extract_directory
+    >>> jobs = extract_directory(r'D:\2-SAMM\Data\EJ3-60\Raw Data', workers=4)
+or from the command line:
+    python -m samm.extract "D:\2-SAMM\Data\EJ3-60\Raw Data" --workers 4
+'''
+
+import argparse
+import os
+import subprocess
+import sys
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from samm import iontable, manifest, runlog, schedule, staging, supervisor
+
+#   Define Driftscope paths for APEX subprocess:
+# NOTE Waters DriftScope software must be installed in the default directory.
+APEX_PATH = Path(r'C:\DriftScope\lib\Apex3D64.exe')
+APEX_LOG_PATH = Path(r'C:\DriftScope\log\_Apex3DLog.txt')
+
+# Apex3D peak-detection defaults (minimum detectable peak threshold, lock mass)
+LE_THRESHOLD, HE_THRESHOLD, LOCK_MASS = 10, 10, 556.2771
+
+# Extractor backends: DriftScope Apex3D, or the local stand-in (fakeapex.py)
+# that accepts the same flags, for testing and benchmarking without DriftScope
+BACKENDS = {
+    'apex3d': APEX_PATH,
+    'fake': (sys.executable, str(Path(__file__).with_name('fakeapex.py'))),
+}
+
+APEX_SUFFIX = '_Apex3DIons.csv'
+OUTPUT_FOLDER = '3D-data-extraction'
+WORK_FOLDER = '.apex3d-work'
+
+
+@dataclass
+class ApexJob:
+    '''
+    Status of a single Apex3D extraction.
+
+    status is one of 'queued', 'running', 'done', 'failed' or 'timeout'
+    (killed after exceeding its time limit). ions and
+    bytes_written describe the output CSV; stages holds stage timings
+    parsed from the run's Apex3D log. error explains failures that
+    happened outside Apex3D (staging or publishing the output).
+    '''
+    raw_path: Path
+    raw_size: int = None
+    status: str = 'queued'
+    returncode: int = None
+    start: float = None
+    end: float = None
+    attempts: int = 0
+    log_path: Path = None
+    ions: int = None
+    bytes_written: int = None
+    stages: dict = field(default_factory=dict)
+    error: str = None
+
+    @property
+    def wall_time(self):
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    def record(self):
+        ''' Run record as stored in the run history (apex3d-runs.jsonl). '''
+        return {
+            'raw_path': str(self.raw_path),
+            'raw_size': self.raw_size,
+            'status': self.status,
+            'returncode': self.returncode,
+            'start': self.start,
+            'end': self.end,
+            'wall_time': self.wall_time,
+            'attempts': self.attempts,
+            'ions': self.ions,
+            'bytes_written': self.bytes_written,
+            'stages': self.stages,
+            'log_path': str(self.log_path) if self.log_path else None,
+            'error': self.error,
+        }
+
+
+def apex_output_csv(raw_path, output_dir):
+    '''
+    Returns the path Apex3D writes the ion table for raw_path to.
+    Ex: EJ3-57-158-BC4-Sampling-2.raw -> EJ3-57-158-BC4-Sampling-2_Apex3DIons.csv
+    '''
+    return Path(output_dir) / (Path(raw_path).stem + APEX_SUFFIX)
+
+
+def check_apex(apex_path=APEX_PATH, log_path=APEX_LOG_PATH):
+    '''
+    Raises FileNotFoundError unless the DriftScope Apex3D executable (and
+    its log file, when given) are present.
+    '''
+    for path in (apex_path, log_path):
+        if path is not None and not os.path.isfile(path):
+            raise FileNotFoundError(
+                f'{path} not present. Check DriftScope installation is present at C:\\DriftScope.')
+
+
+def find_raw_dirs(data_dir):
+    ''' Returns the Waters .raw directories directly inside data_dir, sorted by name. '''
+    return [Path(data_dir) / name for name in sorted(os.listdir(data_dir))
+            if name.lower().endswith('.raw') and os.path.isdir(os.path.join(data_dir, name))]
+
+
+def apex_command(raw_path, output_dir, apex_path=APEX_PATH,
+                 le_threshold=LE_THRESHOLD, he_threshold=HE_THRESHOLD,
+                 lock_mass=LOCK_MASS):
+    '''
+    Builds the Apex3D argument list for one .raw directory.
+
+    Args:
+        raw_path (str): Waters .raw directory.
+        output_dir (str): folder receiving the Apex3D CSV output.
+        apex_path (str or tuple): Apex3D executable, or a command prefix
+            such as BACKENDS['fake'].
+        le_threshold, he_threshold (int): minimum detectable peak counts.
+        lock_mass (float): Z1 lock mass used for calibration.
+
+    Returns:
+        list: arguments for subprocess (no shell quoting required).
+    '''
+    prefix = [str(a) for a in apex_path] if isinstance(apex_path, (list, tuple)) else [str(apex_path)]
+    return prefix + [
+        '-pRawDirName', str(raw_path),
+        '-outputDirName', str(output_dir),
+        '-outputUserDirName', str(output_dir),
+        '-leThresholdCounts', str(le_threshold),
+        '-msOnly', '0',
+        '-heThresholdCounts', str(he_threshold),
+        '-lockMassZ1', str(lock_mass),
+        '-bCSVOutput', '1',
+    ]
+
+
+def apex_params(le_threshold=LE_THRESHOLD, he_threshold=HE_THRESHOLD,
+                lock_mass=LOCK_MASS, **_):
+    ''' Apex3D parameters that change the extracted ions, as recorded in the manifest. '''
+    return {
+        'leThresholdCounts': le_threshold,
+        'heThresholdCounts': he_threshold,
+        'lockMassZ1': lock_mass,
+    }
+
+
+def print_status(job, done, total):
+    ''' Default per-job status callback. '''
+    if job.wall_time is None:
+        print(f'[{done}/{total}] {job.status:<8} {job.raw_path}')
+    else:
+        print(f'[{done}/{total}] {job.status:<8} {job.raw_path} '
+              f'({job.wall_time:.1f} s, exit {job.returncode})')
+
+
+def run_job(job, output_dir, timeout=None, source=None, work_dir=None,
+            columnar=iontable.DEFAULT_FORMAT, **apex_kwargs):
+    '''
+    Runs Apex3D for a single job, blocking until the subprocess exits or is
+    killed after `timeout` seconds (status 'timeout').
+
+    Apex3D writes into a private folder under work_dir (default: a hidden
+    .apex3d-work folder in output_dir, shared by all jobs and left in
+    place) and the finished CSV is published into output_dir with an
+    atomic rename, so readers never see a partial file. stdout/stderr are streamed to the run's log file and the run
+    record (timing, exit code, ions and bytes written) is appended to the
+    run history in output_dir. Updates and returns the job.
+
+    Args:
+        source (str): .raw directory Apex3D reads, if not job.raw_path
+            (ex: a local scratch copy).
+        work_dir (str): folder for Apex3D's in-progress output.
+        columnar (str): also publish a typed columnar copy of the CSV
+            ('npz' or 'parquet', see iontable.py). None to skip.
+    '''
+    if job.raw_size is None:
+        job.raw_size = manifest.raw_fingerprint(source or job.raw_path)['size']
+    job.status, job.start, job.returncode = 'running', time.time(), None
+    job.ions = job.bytes_written = job.error = None
+    job.log_path = runlog.run_log_path(job.raw_path, output_dir)
+    private_dir = Path(work_dir or Path(output_dir) / WORK_FOLDER) / \
+        f'{job.raw_path.stem}-{uuid.uuid4().hex[:8]}'
+    try:
+        private_dir.mkdir(parents=True)
+    except OSError as e:
+        job.status, job.end = 'failed', time.time()
+        job.error = f'could not create {private_dir}: {e}'
+        runlog.append_run_record(Path(output_dir) / runlog.HISTORY_NAME, job.record())
+        return job
+    try:
+        job.returncode = runlog.stream_process(
+            apex_command(source or job.raw_path, private_dir, **apex_kwargs), job.log_path,
+            timeout=timeout)
+        job.status = 'done' if job.returncode == 0 else 'failed'
+    except subprocess.TimeoutExpired:
+        job.status = 'timeout'
+    except OSError as e:
+        job.status = 'failed'
+        with open(job.log_path, 'a') as log:
+            log.write(f'# failed to start Apex3D: {e}\n')
+
+    staged_csv = apex_output_csv(job.raw_path, private_dir)
+    output_csv = apex_output_csv(job.raw_path, output_dir)
+    try:
+        if job.status == 'done' and staged_csv.is_file():
+            job.bytes_written = staged_csv.stat().st_size
+            job.ions = runlog.count_csv_rows(staged_csv)
+            staged_table = None
+            if columnar:
+                try:
+                    staged_table = iontable.write_columnar(staged_csv, columnar)
+                except (ImportError, ValueError, OSError) as e:
+                    with open(job.log_path, 'a') as log:
+                        log.write(f'# could not write {columnar} ion table: {e}\n')
+            try:
+                staging.publish(staged_csv, output_csv)
+                if staged_table is not None:
+                    staging.publish(staged_table, Path(output_dir) / staged_table.name)
+            except OSError as e:
+                job.status = 'failed'
+                job.error = f'could not publish {output_csv.name}: {e}'
+                with open(job.log_path, 'a') as log:
+                    log.write(f'# {job.error}\n')
+        elif job.status == 'done':
+            job.status = 'failed'
+            with open(job.log_path, 'a') as log:
+                log.write(f'# Apex3D exited 0 but wrote no {staged_csv.name}\n')
+    finally:
+        # the shared work folder is kept: removing it could race another job's mkdir
+        shutil.rmtree(private_dir, ignore_errors=True)
+    job.end = time.time()
+
+    parsed = runlog.parse_apex_log(job.log_path)
+    job.stages = parsed['stages']
+    if job.ions is None:
+        job.ions = parsed['ions']
+    runlog.append_run_record(Path(output_dir) / runlog.HISTORY_NAME, job.record())
+    return job
+
+
+def extract_all(raw_paths, output_dir, workers=None, on_status=print_status,
+                timeout=None, retries=0, backoff=30, state=None, on_done=None,
+                scratch_dir=None, columnar=iontable.DEFAULT_FORMAT, **apex_kwargs):
+    '''
+    Extracts every .raw directory with at most `workers` concurrent Apex3D
+    processes. Jobs are started in input order.
+
+    Args:
+        raw_paths (list): Waters .raw directories.
+        output_dir (str): folder receiving the Apex3D CSV output.
+        workers (int): concurrent Apex3D processes (default: os.cpu_count()).
+        on_status (callable): called as on_status(job, n_finished, n_total)
+            whenever a job starts or finishes. None to silence.
+        timeout (float): seconds before a hung Apex3D process is killed.
+        retries (int): extra attempts for failed or timed-out jobs.
+        backoff (float): base delay between attempts, doubled each retry.
+        state (supervisor.JobState): persisted job state to keep updated.
+        on_done (callable): called as on_done(job) once a job's final
+            attempt ends (serialised across workers).
+        scratch_dir (str): fast local folder. If given, each .raw is copied
+            there first (the next jobs are prefetched while others extract)
+            and Apex3D reads and writes locally.
+        columnar (str): columnar ion-table format written beside each CSV
+            ('npz' or 'parquet'), None for CSV only.
+        **apex_kwargs: passed to apex_command (thresholds, lock mass, apex_path).
+
+    Returns:
+        list: ApexJob per input, in input order.
+    '''
+    workers = workers or os.cpu_count() or 1
+    jobs = [ApexJob(Path(p)) for p in raw_paths]
+    finished = [0]
+    lock = threading.Lock()
+
+    def report(job):
+        if on_status is not None:
+            with lock:
+                if job.status != 'running':
+                    finished[0] += 1
+                on_status(job, finished[0], len(jobs))
+
+    stager = None
+    if scratch_dir:
+        stager = staging.Stager(raw_paths, Path(scratch_dir) / 'raw', lookahead=workers + 1)
+        work_dir = Path(scratch_dir) / 'out'
+    else:
+        work_dir = None
+
+    def extract(job):
+        source = None
+        if stager is not None:
+            try:
+                source = stager.get(job.raw_path)
+            except OSError as e:
+                # recorded like a failed run, so status and history show it
+                job.start = job.end = time.time()
+                job.status, job.attempts = 'failed', 1
+                job.error = f'could not copy to scratch: {e}'
+                print(f'{job.raw_path.name}: {job.error}')
+                if state is not None:
+                    state.update(job.raw_path, status=job.status, attempts=job.attempts, error=job.error)
+                runlog.append_run_record(Path(output_dir) / runlog.HISTORY_NAME, job.record())
+                return
+        supervisor.run_with_retries(
+            lambda j: run_job(j, output_dir, timeout=timeout, source=source,
+                              work_dir=work_dir, columnar=columnar, **apex_kwargs),
+            job, retries=retries, backoff=backoff, state=state)
+
+    def work(job):
+        job.status = 'running'
+        report(job)
+        try:
+            extract(job)
+        finally:
+            if stager is not None:
+                stager.release(job.raw_path)
+        if on_done is not None:
+            with lock:
+                on_done(job)
+        report(job)
+        return job
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(work, jobs))
+    finally:
+        if stager is not None:
+            stager.close()
+    return jobs
+
+
+def summarize(jobs, wall_time=None):
+    '''
+    Prints wall time per .raw and the batch totals.
+
+    Args:
+        jobs (list): ApexJob list from extract_all.
+        wall_time (float): elapsed time of the whole batch, if measured.
+    '''
+    print('\n---===--- Apex3D extraction summary ---===---')
+    for job in sorted(jobs, key=lambda j: -(j.wall_time or 0)):
+        t = f'{job.wall_time:8.1f} s' if job.wall_time is not None else '       - '
+        ions = f'{job.ions:>9} ions' if job.ions is not None else ''
+        print(f'{t}  {job.status:<7} {job.raw_path.name} {ions}')
+    busy = sum(j.wall_time or 0 for j in jobs)
+    failed = sum(j.status in ('failed', 'timeout') for j in jobs)
+    print(f'{len(jobs)} jobs, {failed} failed, {busy:.1f} s of Apex3D time')
+    if wall_time:
+        print(f'Batch wall time {wall_time:.1f} s '
+              f'(x{busy / wall_time:.2f} parallel speedup)')
+
+
+def extract_changed(raw_paths, output_dir, workers=None, on_status=print_status,
+                    force=False, timeout=None, retries=0, backoff=30,
+                    longest_first=True, **apex_kwargs):
+    '''
+    Extracts only the .raw directories that are new, have changed, or were
+    last extracted with different Apex3D parameters.
+
+    The manifest and job state (apex3d-jobs.json) in output_dir are saved
+    as each job finishes, so an interrupted batch picks up from the first
+    unfinished .raw when run again. Jobs are dispatched longest-first by
+    estimated cost (see schedule.py); the predicted and actual makespan
+    are printed.
+
+    Args:
+        raw_paths (list): Waters .raw directories.
+        output_dir (str): folder receiving the Apex3D CSV output and manifest.
+        force (bool): re-extract everything, ignoring the manifest.
+        longest_first (bool): dispatch by estimated cost instead of input order.
+        workers, on_status, timeout, retries, backoff, **apex_kwargs: as extract_all.
+
+    Returns:
+        tuple: (jobs run, raw paths skipped as up to date)
+    '''
+    params = apex_params(**apex_kwargs)
+    manifest_path = Path(output_dir) / manifest.MANIFEST_NAME
+    entries = manifest.load_manifest(manifest_path)
+
+    todo, skipped, fingerprints = [], [], {}
+    for raw_path in raw_paths:
+        key = str(Path(raw_path))
+        fingerprints[key] = manifest.raw_fingerprint(raw_path)
+        if not force and manifest.is_current(entries.get(key), fingerprints[key], params):
+            skipped.append(raw_path)
+        else:
+            todo.append(raw_path)
+    print(f'{len(todo)} to extract, {len(skipped)} unchanged since last extraction')
+
+    workers = workers or os.cpu_count() or 1
+    history = runlog.load_run_history(Path(output_dir) / runlog.HISTORY_NAME)
+    costs = schedule.estimate_costs(
+        {raw: fingerprints[str(Path(raw))]['size'] for raw in todo}, history)
+    if longest_first:
+        todo = schedule.longest_first(costs)
+    predicted = schedule.predict_makespan([costs[raw] for raw in todo], workers)
+    if todo:
+        print(f'Predicted makespan {predicted:.1f} s on {workers} worker(s)')
+
+    state = supervisor.JobState(Path(output_dir) / supervisor.STATE_NAME)
+    interrupted = state.interrupted()
+    if interrupted:
+        print(f'Resuming: {len(interrupted)} extraction(s) were interrupted last run')
+
+    def on_done(job):
+        output_csv = apex_output_csv(job.raw_path, output_dir)
+        if job.status == 'done' and output_csv.is_file():
+            manifest.record(entries, job.raw_path, fingerprints[str(job.raw_path)],
+                            params, output_csv)
+            manifest.save_manifest(entries, manifest_path)
+
+    start = time.time()
+    jobs = extract_all(todo, output_dir, workers=workers, on_status=on_status,
+                       timeout=timeout, retries=retries, backoff=backoff,
+                       state=state, on_done=on_done, **apex_kwargs)
+    if todo:
+        print(f'Makespan {time.time() - start:.1f} s (predicted {predicted:.1f} s)')
+    return jobs, skipped
+
+
+def extract_directory(data_dir, output_dir=None, workers=None, force=False,
+                      on_status=print_status, **kwargs):
+    '''
+    Extracts every .raw directory in data_dir without any prompts.
+
+    Args:
+        data_dir (str): folder containing Waters .raw directories.
+        output_dir (str): Apex3D CSV output folder, created if missing
+            (default: <data_dir>/3D-data-extraction).
+        workers (int): concurrent Apex3D processes (default: os.cpu_count()).
+        force (bool): re-extract acquisitions the manifest marks up to date.
+        on_status (callable): per-job status callback, None to silence.
+        **kwargs: timeout, retries, backoff, scratch_dir and columnar (see extract_all), otherwise
+            passed to apex_command (thresholds, lock mass, apex_path).
+
+    Returns:
+        list: ApexJob for every extraction run (up-to-date files are skipped).
+    '''
+    if not os.path.isdir(data_dir):
+        raise FileNotFoundError(f'Data path cannot be found: {data_dir}')
+    output_dir = output_dir or os.path.join(data_dir, OUTPUT_FOLDER)
+    os.makedirs(output_dir, exist_ok=True)
+    jobs, _ = extract_changed(find_raw_dirs(data_dir), output_dir, workers=workers,
+                              on_status=on_status, force=force, **kwargs)
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Extract m/z, mobility and area from Waters .raw files with DriftScope Apex3D.')
+    parser.add_argument('data_dir', help='folder containing Waters .raw directories')
+    parser.add_argument('output_dir', nargs='?',
+                        help=f'Apex3D CSV output folder (default: <data_dir>/{OUTPUT_FOLDER})')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='concurrent Apex3D processes (default: one per CPU core)')
+    parser.add_argument('--le-threshold', type=int, default=LE_THRESHOLD)
+    parser.add_argument('--he-threshold', type=int, default=HE_THRESHOLD)
+    parser.add_argument('--lock-mass', type=float, default=LOCK_MASS)
+    parser.add_argument('--apex', default=None, help='path to Apex3D64.exe (default: DriftScope install)')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='apex3d',
+                        help="extractor to run; 'fake' is a local Apex3D stand-in")
+    parser.add_argument('--force', action='store_true',
+                        help='re-extract files the manifest marks up to date')
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='seconds before a hung Apex3D process is killed')
+    parser.add_argument('--retries', type=int, default=0,
+                        help='extra attempts for failed or timed-out extractions')
+    parser.add_argument('--backoff', type=float, default=30,
+                        help='seconds before the first retry (doubled each retry)')
+    parser.add_argument('--scratch', default=None,
+                        help='fast local folder to stage .raw copies and Apex3D output in')
+    parser.add_argument('--columnar', choices=sorted(iontable.FORMATS) + ['none'],
+                        default=iontable.DEFAULT_FORMAT,
+                        help='typed ion-table copy written beside each CSV (default: npz)')
+    args = parser.parse_args(argv)
+
+    apex_path = args.apex or BACKENDS[args.backend]
+    try:
+        if args.apex or args.backend == 'apex3d':
+            check_apex(apex_path, log_path=None)
+        start = time.time()
+        jobs = extract_directory(args.data_dir, args.output_dir, workers=args.workers,
+                                 force=args.force, apex_path=apex_path,
+                                 timeout=args.timeout, retries=args.retries,
+                                 backoff=args.backoff, scratch_dir=args.scratch,
+                                 columnar=None if args.columnar == 'none' else args.columnar,
+                                 le_threshold=args.le_threshold,
+                                 he_threshold=args.he_threshold, lock_mass=args.lock_mass)
+    except FileNotFoundError as e:
+        sys.exit(f'ERROR: {e}')
+    summarize(jobs, time.time() - start)
+    return 1 if any(job.status != 'done' for job in jobs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
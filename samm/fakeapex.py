@@ -0,0 +1,108 @@
+'''
+fakeapex.py
+Python Version: 3.9
+Purpose: Local stand-in for DriftScope's Apex3D64.exe so the extraction
+pipeline can be run, tested and benchmarked without DriftScope (e.g. on Linux).
+
+Accepts the same command-line flags as Apex3D, spends time proportional to
+the .raw directory size and writes a synthetic <name>_Apex3DIons.csv with
+the Apex3D ion-table column layout. The number of ions falls as the peak
+thresholds rise, as with the real peak picker.
+
+Environment settings:
+    FAKE_APEX_SECONDS_PER_MB   work per MB of .raw (default: 0.05)
+    FAKE_APEX_MODE             'sleep' (I/O-like wait, default) or 'cpu' (busy loop)
+    FAKE_APEX_IONS_PER_MB      ions written per MB at threshold 10 (default: 2000)
+
+Standalone (standard library only) so it can be launched as a subprocess:
+    python fakeapex.py -pRawDirName "X.raw" -outputDirName "out" ... -bCSVOutput 1
+'''
+
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+import zlib
+
+# Apex3D ion table layout (m/z in column 2 and mobility in column 8, as read by SAMMmonitor)
+APEX_COLUMNS = ['function', 'index', 'm_z', 'mzNoCal', 'rt', 'inten', 'area', 'counts',
+                'mobility', 'errMzPPM', 'errRt', 'errInten', 'errArea', 'errMobility']
+
+
+def raw_size(raw_path):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(raw_path) for name in names)
+
+
+def burn(seconds, mode):
+    ''' Spends `seconds` either sleeping or spinning the CPU. '''
+    if mode != 'cpu':
+        time.sleep(seconds)
+        return
+    end, x = time.perf_counter() + seconds, 0
+    while time.perf_counter() < end:
+        for i in range(10000):
+            x ^= i * i
+
+
+def write_ions(csv_path, n_ions, seed):
+    ''' Writes n_ions synthetic Apex3D rows (deterministic for a given seed). '''
+    rng = random.Random(seed)
+    tmp = csv_path + '.part'
+    with open(tmp, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(APEX_COLUMNS)
+        for i in range(n_ions):
+            mz = rng.uniform(150, 3000)
+            dt = 10 + 0.035 * mz + rng.gauss(0, 4)
+            area = int(rng.lognormvariate(5, 1.5)) + 1
+            writer.writerow([1, i, f'{mz:.4f}', f'{mz * (1 + rng.gauss(0, 2e-5)):.4f}',
+                             f'{rng.uniform(0, 2):.4f}', int(area * 0.6), area,
+                             int(area * 1.3), f'{max(dt, 1):.3f}',
+                             f'{abs(rng.gauss(0, 10)):.4f}', f'{abs(rng.gauss(0, 0.01)):.4f}',
+                             f'{abs(rng.gauss(0, 5)):.2f}', f'{abs(rng.gauss(0, 5)):.2f}',
+                             f'{abs(rng.gauss(0, 0.2)):.2f}'])
+    os.replace(tmp, csv_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apex3D stand-in')
+    parser.add_argument('-pRawDirName', required=True)
+    parser.add_argument('-outputDirName', required=True)
+    parser.add_argument('-outputUserDirName')
+    parser.add_argument('-leThresholdCounts', type=float, default=10)
+    parser.add_argument('-heThresholdCounts', type=float, default=10)
+    parser.add_argument('-lockMassZ1', type=float, default=556.2771)
+    parser.add_argument('-msOnly', default='0')
+    parser.add_argument('-bCSVOutput', default='1')
+    args = parser.parse_args(argv)
+
+    raw = args.pRawDirName.rstrip('/\\')
+    if not os.path.isdir(raw):
+        print(f'ERROR: raw directory not found: {raw}', file=sys.stderr)
+        return 2
+    mb = raw_size(raw) / 1e6
+    seconds = mb * float(os.environ.get('FAKE_APEX_SECONDS_PER_MB', 0.05))
+    ions_per_mb = float(os.environ.get('FAKE_APEX_IONS_PER_MB', 2000))
+    threshold = max((args.leThresholdCounts + args.heThresholdCounts) / 2, 1)
+    n_ions = int(mb * ions_per_mb * 10 / threshold)
+
+    print(f'Apex3D (fake) processing {raw}')
+    start = time.time()
+    burn(seconds, os.environ.get('FAKE_APEX_MODE', 'sleep'))
+    print(f'Peak detection took {time.time() - start:.2f} s')
+
+    name = os.path.splitext(os.path.basename(raw))[0]
+    csv_path = os.path.join(args.outputDirName, name + '_Apex3DIons.csv')
+    seed = zlib.crc32(f'{name}|{threshold}|{args.lockMassZ1}'.encode())
+    start = time.time()
+    write_ions(csv_path, n_ions, seed)
+    print(f'CSV output took {time.time() - start:.2f} s')
+    print(f'Number of ions found: {n_ions}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
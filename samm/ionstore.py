@@ -0,0 +1,267 @@
+r'''
+ionstore.py
+Python Version: 3.9
+Purpose: Consolidates the per-acquisition Apex3D ion tables of a campaign
+into one dataset partitioned by experiment series, so cross-run queries
+are one filtered scan instead of one file open per acquisition.
+
+Layout:
+    <store>\ion-store.json                 source files behind each partition
+    <store>\series=EJ3-57\ions.npz         all EJ3-57 ions, one array per column
+
+Each partition holds the Apex3D columns of all its acquisitions plus an
+'experiment' code column; queries return it as a categorical
+experiment-ID column. Partitions are sorted by m/z with per-row-group
+min/max statistics (iontable.save_npz), so range queries only read the
+row groups that can match. Rebuilding only touches series whose source files
+were added, changed or removed since the last build.
+
+    >>> from samm import ionstore
+    >>> ionstore.build_store('ion-store', [r'D:\2-SAMM\Data\EJ3-57\APEX Output'])
+    >>> hits = ionstore.query('ion-store', mz=(900, 920), experiment='BC[0-9]')
+'''
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from samm import iontable, naming
+
+INDEX_NAME = 'ion-store.json'
+PARTITION_NAME = 'ions.npz'
+APEX_GLOB = '*_Apex3DIons.csv'
+
+# Range filters accepted by query(), by Apex3D column
+FILTER_COLUMNS = {'mz': 'm_z', 'dt': 'mobility', 'area': 'area'}
+
+
+def partition_path(store_dir, series):
+    ''' Partition file of one experiment series. '''
+    return Path(store_dir) / f'series={series}' / PARTITION_NAME
+
+
+def load_index(store_dir):
+    ''' Returns {series: {experiment: source entry}}, empty for a new store. '''
+    path = Path(store_dir) / INDEX_NAME
+    if not path.is_file():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_index(index, store_dir):
+    ''' Writes the store index atomically (temporary file then rename). '''
+    path = Path(store_dir) / INDEX_NAME
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def source_entry(csv_path):
+    ''' Path and size/mtime of an Apex3D CSV, as recorded in the index. '''
+    st = os.stat(csv_path)
+    return {'csv': str(csv_path), 'size': st.st_size, 'mtime': round(st.st_mtime, 3)}
+
+
+def scan_sources(csv_dirs):
+    '''
+    Groups the Apex3D CSVs in csv_dirs by series.
+
+    Returns:
+        dict: {series: {experiment: source entry}}. Where an experiment
+            appears in several folders the last folder given wins.
+    '''
+    sources = {}
+    for csv_dir in csv_dirs:
+        for csv_path in sorted(Path(csv_dir).glob(APEX_GLOB)):
+            experiment = naming.experiment_id(csv_path)
+            sources.setdefault(naming.series_of(experiment), {})[experiment] = \
+                source_entry(csv_path)
+    return sources
+
+
+def write_partition(path, members):
+    '''
+    Concatenates the ion tables of one series into a partition file.
+
+    Args:
+        path (Path): partition file to write.
+        members (dict): {experiment: source entry}.
+
+    Returns:
+        int: rows written.
+    '''
+    experiments = sorted(members)
+    tables = [iontable.read_ions(members[e]['csv']) for e in experiments]
+    columns = {col: np.concatenate([t[col].to_numpy() for t in tables])
+               for col in tables[0].columns}
+    columns['experiment'] = np.repeat(np.arange(len(experiments), dtype='int32'),
+                                      [len(t) for t in tables])
+
+    names = np.array(experiments)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.{uuid.uuid4().hex[:8]}.part')
+    try:
+        iontable.save_npz(tmp, columns, extra={'experiment_names': names})
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return len(columns['experiment'])
+
+
+def build_store(store_dir, csv_dirs, series=None):
+    '''
+    Merges the Apex3D CSVs in csv_dirs into the store, rewriting only the
+    partitions whose member files changed.
+
+    Args:
+        store_dir (str): store folder, created if missing.
+        csv_dirs (list): folders of *_Apex3DIons.csv files (ex: APEX Output,
+            3D-data-extraction). Files from earlier builds stay in the store
+            while they still exist.
+        series (list): only consolidate these series (default: all found).
+
+    Returns:
+        dict: {series: rows} for every partition rewritten.
+    '''
+    Path(store_dir).mkdir(parents=True, exist_ok=True)
+    index = load_index(store_dir)
+    found = scan_sources(csv_dirs)
+    rebuilt = {}
+    for name in sorted(set(index) | set(found)):
+        if series and name not in series:
+            continue
+        members = {e: entry for e, entry in index.get(name, {}).items()
+                   if os.path.isfile(entry['csv'])}
+        for experiment, entry in found.get(name, {}).items():
+            members[experiment] = entry
+        members = {e: source_entry(entry['csv']) for e, entry in members.items()}
+        path = partition_path(store_dir, name)
+        if members == index.get(name) and path.is_file():
+            continue
+        if members:
+            start = time.time()
+            rebuilt[name] = write_partition(path, members)
+            print(f'{name}: {len(members)} acquisitions, {rebuilt[name]} ions '
+                  f'({time.time() - start:.1f} s)')
+            index[name] = members
+        else:
+            print(f'{name}: no acquisitions left, partition removed')
+            path.unlink(missing_ok=True)
+            if path.parent.is_dir():
+                path.parent.rmdir()
+            index.pop(name, None)
+            rebuilt[name] = 0
+        save_index(index, store_dir)
+    return rebuilt
+
+
+def load_partition(store_dir, series, columns=None, ranges=None):
+    '''
+    Loads one series as a DataFrame with a categorical 'experiment' column.
+
+    Args:
+        columns (list): Apex3D columns to load (default: all).
+        ranges (dict): {column: (low, high)} inclusive ranges to keep; row
+            groups outside them are not read (see iontable.scan_npz).
+    '''
+    path = partition_path(store_dir, series)
+    with np.load(path) as arrays:
+        names = list(arrays['experiment_names'])
+    wanted = None if columns is None else ['experiment'] + [c for c in columns if c != 'experiment']
+    table = iontable.scan_npz(path, wanted, ranges)
+    codes = table.pop('experiment').to_numpy()
+    table.insert(0, 'experiment', pd.Categorical.from_codes(codes, names))
+    return table
+
+
+def query(store_dir, series=None, experiment=None, mz=None, dt=None, area=None, columns=None):
+    '''
+    Ions across all acquisitions in the store matching every given filter.
+
+    Args:
+        store_dir (str): store folder.
+        series (list): series to scan (default: all).
+        experiment (str): regular expression searched in experiment IDs
+            (ex: 'BC[0-9]' for every BC-vial injection).
+        mz, dt, area (tuple): inclusive (low, high) ranges on m/z, drift
+            time (Apex3D mobility) and area; None leaves a column unfiltered.
+        columns (list): Apex3D columns to return (default: all).
+
+    Returns:
+        pd.DataFrame: matching ions with 'series' and categorical
+            'experiment' columns.
+    '''
+    ranges = {FILTER_COLUMNS[k]: r for k, r in (('mz', mz), ('dt', dt), ('area', area))
+              if r is not None}
+    load = None if columns is None else sorted(set(columns) | set(ranges))
+    pattern = re.compile(experiment) if experiment else None
+    index = load_index(store_dir)
+
+    hits = []
+    for name in sorted(series or index):
+        if name not in index:
+            continue
+        if pattern and not any(pattern.search(e) for e in index[name]):
+            continue
+        table = load_partition(store_dir, name, load, ranges)
+        if pattern:
+            keep = [bool(pattern.search(e)) for e in table['experiment'].cat.categories]
+            table = table[np.asarray(keep)[table['experiment'].cat.codes.to_numpy()]]
+        if columns is not None:
+            table = table[['experiment'] + list(columns)]
+        hits.append(table.assign(series=name))
+    if not hits:
+        return pd.DataFrame(columns=['series', 'experiment'] + list(columns or []))
+    # Union the experiment categories so the merged column stays categorical
+    merged = pd.concat(hits, ignore_index=True)
+    merged['experiment'] = merged['experiment'].astype('category')
+    return merged[['series'] + [c for c in merged.columns if c != 'series']]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Campaign-wide Apex3D ion store.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='merge Apex3D CSV folders into the store')
+    build.add_argument('store_dir')
+    build.add_argument('csv_dirs', nargs='+', help='folders of *_Apex3DIons.csv files')
+    find = sub.add_parser('query', help='write ions matching filters to CSV')
+    find.add_argument('store_dir')
+    find.add_argument('--series', nargs='+')
+    find.add_argument('--experiment', help='regex on experiment IDs, ex: "BC[0-9]"')
+    find.add_argument('--mz', type=float, nargs=2, metavar=('LOW', 'HIGH'))
+    find.add_argument('--dt', type=float, nargs=2, metavar=('LOW', 'HIGH'))
+    find.add_argument('--area', type=float, nargs=2, metavar=('LOW', 'HIGH'))
+    find.add_argument('--output', help='CSV to write (default: print a summary)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        missing = [d for d in args.csv_dirs if not os.path.isdir(d)]
+        if missing:
+            sys.exit(f'ERROR: Folder cannot be found: {missing[0]}')
+        build_store(args.store_dir, args.csv_dirs)
+        return 0
+
+    hits = query(args.store_dir, series=args.series, experiment=args.experiment,
+                 mz=args.mz, dt=args.dt, area=args.area)
+    if args.output:
+        hits.to_csv(args.output, index=False)
+    print(f'{len(hits)} ions in {hits["experiment"].nunique()} acquisitions')
+    if len(hits):
+        print(hits.groupby('experiment', observed=True)['area'].agg(['count', 'sum']).to_string())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
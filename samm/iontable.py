@@ -0,0 +1,415 @@
+r'''
+iontable.py
+Python Version: 3.9
+Purpose: Typed columnar copies of Apex3D ion tables, so consumers load
+numeric arrays instead of re-parsing the text CSV.
+
+After extraction each <name>_Apex3DIons.csv gets a sibling
+<name>_Apex3DIons.npz (or .parquet when pyarrow is installed and asked
+for) holding one array per column. m/z keeps float64 precision; drift
+time, retention time and error columns are stored as float32 and the
+intensity, area and count columns as int32 when every value is a whole
+number that fits (float64 otherwise). The .npz arrays are stored uncompressed:
+zlib decompression costs more load time than it saves on disk, while
+the binary dtypes alone make the file smaller than the CSV. The Parquet
+copy is zstd-compressed.
+
+Columnar copies are sorted by m/z and split into row groups of
+ROW_GROUP_ROWS ions, with min/max statistics of m/z, drift time and area
+per group (Parquet keeps its own). Range queries read only the row groups
+whose statistics overlap the ranges:
+
+    >>> ions = iontable.read_ions(csv_path, ranges={'m_z': (780, 1100), 'area': (2, None)})
+
+    >>> from samm import iontable
+    >>> iontable.write_columnar('EJ3-57-158-BC4-Sampling-2_Apex3DIons.csv')
+    >>> ions = iontable.read_ions('EJ3-57-158-BC4-Sampling-2_Apex3DIons.csv')
+
+read_ions() uses the columnar copy when it is at least as new as the CSV
+and falls back to parsing the CSV otherwise. To add columnar copies to
+CSVs extracted before this existed:
+    python -m samm.iontable "D:\2-SAMM\Data\EJ3-60\Raw Data\3D-data-extraction"
+'''
+
+import argparse
+import os
+import struct
+import sys
+import uuid
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from samm.cache import cached_load
+
+# Parse dtype per Apex3D column (unknown columns are stored as float64)
+APEX_DTYPES = {
+    'function': 'int16',
+    'index': 'int32',
+    'm_z': 'float64',
+    'mzNoCal': 'float64',
+    'rt': 'float32',
+    'inten': 'float64',
+    'area': 'float64',
+    'counts': 'float64',
+    'mobility': 'float32',
+    'errMzPPM': 'float32',
+    'errRt': 'float32',
+    'errInten': 'float32',
+    'errArea': 'float32',
+    'errMobility': 'float32',
+}
+
+# Names used for the Apex3D columns in the SAMM monitoring and plotting scripts
+SAMM_COLUMNS = {
+    'm_z': 'm/z',
+    'mobility': 'DT',
+    'area': 'Area',
+    'errMzPPM': 'm/z Error',
+    'errMobility': 'DT Error',
+    'errArea': 'Area Error',
+}
+
+FORMATS = {'npz': '.npz', 'parquet': '.parquet'}
+DEFAULT_FORMAT = 'npz'
+
+# Columnar copies are sorted by SORT_COLUMN and keep min/max statistics of
+# STATS_COLUMNS for every ROW_GROUP_ROWS ions
+ROW_GROUP_ROWS = 16384
+SORT_COLUMN = 'm_z'
+STATS_COLUMNS = ('m_z', 'mobility', 'area')
+
+
+def columnar_path(csv_path, fmt=DEFAULT_FORMAT):
+    '''
+    Returns the columnar copy's path for an Apex3D CSV.
+    Ex: EJ3-57-158-BC4-Sampling-2_Apex3DIons.csv -> EJ3-57-158-BC4-Sampling-2_Apex3DIons.npz
+    '''
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown columnar format {fmt!r} (expected one of {sorted(FORMATS)})')
+    return Path(csv_path).with_suffix(FORMATS[fmt])
+
+
+# Columns parsed as float64 (exports may write 1.5e+06 or fractional values)
+# and stored as int32 when every value is a whole number that fits
+INTEGRAL_COLUMNS = ['inten', 'area', 'counts']
+
+
+def downcast_integral(table):
+    ''' Converts the INTEGRAL_COLUMNS of a parsed table to int32 where that is lossless. '''
+    info = np.iinfo('int32')
+    for col in INTEGRAL_COLUMNS:
+        if col in table:
+            values = table[col].to_numpy()
+            if (np.isfinite(values).all() and (values == np.round(values)).all() and
+                    (not len(values) or info.min <= values.min() and values.max() <= info.max)):
+                table[col] = values.astype('int32')
+    return table
+
+
+def read_csv_typed(csv_path, columns=None):
+    ''' Parses an Apex3D CSV into the storage dtypes. '''
+    return downcast_integral(pd.read_csv(csv_path, usecols=columns, dtype=APEX_DTYPES, engine='c'))
+
+
+def write_columnar(csv_path, fmt=DEFAULT_FORMAT, dest=None):
+    '''
+    Writes the typed columnar copy of an Apex3D CSV. The file is written
+    under a temporary name and renamed, so readers never see it half-written.
+
+    Args:
+        csv_path (str): Apex3D _Apex3DIons.csv.
+        fmt (str): 'npz' (NumPy arrays) or 'parquet' (needs pyarrow).
+        dest (str): output path (default: columnar_path(csv_path, fmt)).
+
+    Returns:
+        Path: the columnar file written.
+    '''
+    dest = Path(dest) if dest else columnar_path(csv_path, fmt)
+    table = read_csv_typed(csv_path)
+    if fmt == 'parquet':
+        table = table.sort_values(SORT_COLUMN, kind='stable', ignore_index=True)
+    tmp = dest.with_name(f'.{dest.name}.{uuid.uuid4().hex[:8]}.part')
+    try:
+        if fmt == 'parquet':
+            table.to_parquet(tmp, index=False, compression='zstd', row_group_size=ROW_GROUP_ROWS)
+        else:
+            save_npz(tmp, {col: table[col].to_numpy() for col in table.columns})
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return dest
+
+
+def save_npz(path, columns, extra=None):
+    '''
+    Writes equal-length column arrays to an uncompressed .npz, sorted by
+    SORT_COLUMN, with row-group statistics ('_stats_<column>': one
+    (min, max) row per group) for the STATS_COLUMNS present.
+
+    Args:
+        path (str): file to write.
+        columns (dict): {column: 1-D array}, all the same length.
+        extra (dict): other arrays stored as they are (ex: lookup tables).
+    '''
+    if SORT_COLUMN in columns:
+        order = np.argsort(columns[SORT_COLUMN], kind='stable')
+        columns = {col: values[order] for col, values in columns.items()}
+    arrays = dict(columns)
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    starts = np.arange(0, n_rows, ROW_GROUP_ROWS)
+    for col in STATS_COLUMNS:
+        if col in columns and n_rows:
+            values = columns[col]
+            arrays[f'_stats_{col}'] = np.column_stack([np.minimum.reduceat(values, starts),
+                                                       np.maximum.reduceat(values, starts)])
+    arrays['_row_group_rows'] = np.array(ROW_GROUP_ROWS)
+    arrays.update(extra or {})
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+
+
+def npz_members(path):
+    '''
+    Locates each array stored in an uncompressed .npz, so slices can be
+    read without loading whole columns.
+
+    Returns:
+        dict: {name: (dtype, shape, byte offset of the data)}, or None if
+            the file is compressed or holds arrays that cannot be sliced.
+    '''
+    headers = {(1, 0): np.lib.format.read_array_header_1_0,
+               (2, 0): np.lib.format.read_array_header_2_0}
+    members = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                return None
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            if version not in headers:
+                return None
+            shape, fortran, dtype = headers[version](f)
+            if fortran or dtype.hasobject:
+                return None
+            members[info.filename[:-len('.npy')]] = (dtype, shape, f.tell())
+    return members
+
+
+def select_row_groups(stats, n_rows, group_rows, ranges):
+    '''
+    Row spans [(start, stop), ...] whose statistics overlap every range;
+    adjacent row groups are merged into one span.
+    '''
+    keep = np.ones(-(-n_rows // group_rows), dtype=bool)
+    for col, bounds in ranges.items():
+        if bounds is None or col not in stats:
+            continue
+        low, high = bounds
+        if low is not None:
+            keep &= stats[col][:, 1] >= low
+        if high is not None:
+            keep &= stats[col][:, 0] <= high
+    spans = []
+    for group in np.flatnonzero(keep):
+        start, stop = group * group_rows, min((group + 1) * group_rows, n_rows)
+        if spans and spans[-1][1] == start:
+            spans[-1] = (spans[-1][0], stop)
+        else:
+            spans.append((start, stop))
+    return spans
+
+
+def scan_npz(path, columns=None, ranges=None):
+    '''
+    Loads the rows of a .npz ion table inside every range, reading from
+    disk only the row groups whose statistics overlap the ranges.
+
+    Args:
+        path (str): .npz written by save_npz (older copies without
+            statistics are read whole, then filtered).
+        columns (list): columns to return (default: all row columns).
+        ranges (dict): {column: (low, high)} inclusive; None for an open bound.
+
+    Returns:
+        pd.DataFrame: matching rows. attrs['row_groups'] holds
+            (row groups read, row groups in the file).
+    '''
+    ranges = {col: r for col, r in (ranges or {}).items() if r is not None}
+    members = npz_members(path)
+    if members is None:
+        with np.load(path) as arrays:
+            names = columns or [n for n in arrays.files if not n.startswith('_')]
+            table = pd.DataFrame({col: arrays[col] for col in dict.fromkeys(list(names) + list(ranges))})
+        table = table[range_mask(table, ranges)].reset_index(drop=True)[list(names)]
+        table.attrs['row_groups'] = (1, 1)
+        return table
+
+    names = list(columns or [n for n in members if not n.startswith('_') and
+                             len(members[n][1]) == 1 and n != 'experiment_names'])
+    needed = list(dict.fromkeys(names + list(ranges)))
+    n_rows = members[needed[0]][1][0] if needed else 0
+    with open(path, 'rb') as f:
+        def read(name, start=0, stop=None):
+            dtype, shape, offset = members[name]
+            count = int(np.prod(shape)) if stop is None else stop - start
+            f.seek(offset + start * dtype.itemsize)
+            values = np.fromfile(f, dtype=dtype, count=count)
+            return values.reshape(shape) if stop is None else values
+
+        stats = {col: read(f'_stats_{col}') for col in ranges if f'_stats_{col}' in members}
+        group_rows = int(read('_row_group_rows')) if '_row_group_rows' in members else max(n_rows, 1)
+        spans = select_row_groups(stats, n_rows, group_rows, ranges)
+        data = {col: np.concatenate([read(col, a, b) for a, b in spans] or
+                                    [np.empty(0, members[col][0])])
+                for col in needed}
+    table = pd.DataFrame(data)
+    if ranges:
+        table = table[range_mask(table, ranges)].reset_index(drop=True)
+    table = table[names]
+    table.attrs['row_groups'] = (int(sum(-(-(b - a) // group_rows) for a, b in spans)),
+                                 int(-(-n_rows // group_rows)))
+    return table
+
+
+def load_columnar(path, columns=None, ranges=None):
+    '''
+    Loads a .npz or .parquet ion table, optionally only some columns and
+    only the rows inside inclusive {column: (low, high)} ranges. Row groups
+    entirely outside the ranges are not read.
+    '''
+    path = Path(path)
+    ranges = {col: r for col, r in (ranges or {}).items() if r is not None}
+    if path.suffix != FORMATS['parquet']:
+        return scan_npz(path, columns, ranges)
+    filters = [(col, op, bound) for col, (low, high) in ranges.items()
+               for op, bound in (('>=', low), ('<=', high)) if bound is not None]
+    load = None if columns is None else list(dict.fromkeys(list(columns) + list(ranges)))
+    table = pd.read_parquet(path, columns=load, filters=filters or None)
+    return table[list(columns)] if columns is not None else table
+
+
+def find_columnar(csv_path):
+    '''
+    Returns the columnar copy of csv_path that is at least as new as the
+    CSV (None if there is none, or the CSV was re-extracted since).
+    '''
+    csv_path = Path(csv_path)
+    csv_mtime = csv_path.stat().st_mtime if csv_path.is_file() else None
+    for fmt in ('parquet', 'npz'):
+        path = columnar_path(csv_path, fmt)
+        if path.is_file() and (csv_mtime is None or path.stat().st_mtime >= csv_mtime):
+            return path
+    return None
+
+
+def read_ions(csv_path, columns=None, ranges=None):
+    '''
+    Loads an Apex3D ion table, preferring its columnar copy over the CSV.
+
+    Args:
+        csv_path (str): Apex3D _Apex3DIons.csv (need not exist if a
+            columnar copy does).
+        columns (list): Apex3D column names to load (default: all).
+        ranges (dict): {column: (low, high)} inclusive ranges to keep,
+            ex: {'m_z': (780, 1100), 'area': (2, None)}. With a columnar
+            copy, row groups outside the ranges are skipped.
+
+    Returns:
+        pd.DataFrame: ion table with the Apex3D column names and storage
+            dtypes (sorted by m/z when read from a columnar copy).
+    '''
+    path = find_columnar(csv_path)
+    if path is not None:
+        return load_columnar(path, columns, ranges)
+    if not os.path.isfile(csv_path):
+        raise FileNotFoundError(f'Apex3D ion table not found: {csv_path}')
+    ranges = {col: r for col, r in (ranges or {}).items() if r is not None}
+    if not ranges:
+        return read_csv_typed(csv_path, columns)
+    load = None if columns is None else list(dict.fromkeys(list(columns) + list(ranges)))
+    table = read_csv_typed(csv_path, load)
+    table = table[range_mask(table, ranges)].reset_index(drop=True)
+    return table if columns is None else table[list(columns)]
+
+
+def range_mask(table, ranges):
+    '''
+    Boolean mask of the rows inside every inclusive (low, high) range.
+
+    Args:
+        table (pd.DataFrame): ion table.
+        ranges (dict): {column: (low, high)}; None ranges and None
+            bounds are ignored.
+    '''
+    mask = np.ones(len(table), dtype=bool)
+    for col, bounds in ranges.items():
+        if bounds is None:
+            continue
+        values = table[col].to_numpy()
+        if bounds[0] is not None:
+            mask &= values >= bounds[0]
+        if bounds[1] is not None:
+            mask &= values <= bounds[1]
+    return mask
+
+
+def import_apex3d(csv_path, columns=None, mz=None, dt=None, area=None, cache=True):
+    '''
+    Loads m/z, mobility and area data from an Apex3D ion table, with the
+    column names used by the SAMM scripts. Only the columns needed are
+    parsed (or loaded from the columnar copy), straight into typed arrays.
+
+    Args:
+        csv_path (str): Apex3D _Apex3DIons.csv.
+        columns (list): SAMM column names to return (default: all of
+            'm/z', 'DT', 'Area', 'm/z Error', 'DT Error', 'Area Error').
+        mz, dt, area (tuple): inclusive (low, high) ranges to keep on m/z,
+            drift time (Apex3D mobility) and area (None for an open bound).
+            Row groups of the columnar copy outside the ranges are skipped.
+        cache (bool): serve repeat reads of an unchanged file from the
+            shared parse cache (see cache.py).
+
+    Returns:
+        pd.DataFrame: Ex:
+                    m/z      DT  Area  m/z Error  DT Error  Area Error
+        0      1273.1662  49.099    68    13.4383      0.31        3.18
+        1       540.1503  26.155   677     8.2872      0.15        5.21
+    '''
+    source = csv_path if os.path.isfile(csv_path) else find_columnar(csv_path)
+    if cache and source is not None:
+        return cached_load(
+            source, 'import_apex3d',
+            lambda: import_apex3d(csv_path, columns, mz, dt, area, cache=False),
+            columns=columns, mz=mz, dt=dt, area=area)
+    apex_names = {name: col for col, name in SAMM_COLUMNS.items()}
+    wanted = [apex_names[name] for name in (columns or SAMM_COLUMNS.values())]
+    ranges = {'m_z': mz, 'mobility': dt, 'area': area}
+    return read_ions(csv_path, columns=wanted, ranges=ranges).rename(columns=SAMM_COLUMNS)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Write columnar copies of the Apex3D CSVs in a folder.')
+    parser.add_argument('folder', help='folder containing *_Apex3DIons.csv files')
+    parser.add_argument('--format', choices=sorted(FORMATS), default=DEFAULT_FORMAT)
+    parser.add_argument('--force', action='store_true',
+                        help='rewrite columnar copies that are already up to date')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        sys.exit(f'ERROR: Folder cannot be found: {args.folder}')
+    for csv_path in sorted(Path(args.folder).glob('*_Apex3DIons.csv')):
+        if not args.force and find_columnar(csv_path) is not None:
+            continue
+        print(f'{csv_path.name} -> {write_columnar(csv_path, args.format).name}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+'''
+manifest.py
+Python Version: 3.9
+Purpose: Records which .raw acquisitions have already been extracted, with
+which Apex3D parameters, so re-runs only extract new or changed files.
+
+The manifest is a JSON file in the output folder. Each entry is keyed by
+.raw directory and holds a size/mtime fingerprint of the .raw, the Apex3D
+parameters used and the CSV produced. An entry's 'key' is a hash of
+fingerprint + parameters; a .raw needs extracting when its current key
+differs or its CSV is missing. Parameter values are stored as floats, so
+a threshold of 10 and 10.0 is the same extraction.
+'''
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+MANIFEST_NAME = 'apex3d-manifest.json'
+
+
+def raw_fingerprint(raw_path):
+    '''
+    Fingerprints a .raw directory from the sizes and mtimes of its files.
+
+    Args:
+        raw_path (str): Waters .raw directory.
+
+    Returns:
+        dict: {'size': total bytes, 'mtime': newest mtime, 'files': count}
+    '''
+    size, mtime, files = 0, 0.0, 0
+    for root, _, names in os.walk(raw_path):
+        for name in names:
+            st = os.stat(os.path.join(root, name))
+            size += st.st_size
+            mtime = max(mtime, st.st_mtime)
+            files += 1
+    return {'size': size, 'mtime': round(mtime, 3), 'files': files}
+
+
+def normalise_params(params):
+    ''' Apex3D parameters with float values (10 and 10.0 compare and hash the same). '''
+    return {name: float(value) for name, value in params.items()}
+
+
+def entry_key(fingerprint, params):
+    ''' Content key for one .raw fingerprint extracted with the given parameters. '''
+    blob = json.dumps([fingerprint, normalise_params(params)], sort_keys=True).encode()
+    return hashlib.sha1(blob).hexdigest()
+
+
+def load_manifest(manifest_path):
+    ''' Returns manifest entries ({raw path: entry}), empty if none exists yet. '''
+    if not os.path.isfile(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def save_manifest(entries, manifest_path):
+    ''' Writes the manifest atomically (temporary file then rename). '''
+    tmp = f'{manifest_path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(entries, f, indent=1, sort_keys=True)
+    os.replace(tmp, manifest_path)
+
+
+def is_current(entry, fingerprint, params):
+    '''
+    True if entry was extracted from this exact .raw content with these
+    parameters and its output CSV still exists.
+    '''
+    if not entry:
+        return False
+    key = entry.get('key')
+    if key != entry_key(fingerprint, params):
+        # entries recorded before parameters were normalised hashed them as given
+        old = entry.get('params', {})
+        legacy = hashlib.sha1(json.dumps([fingerprint, old], sort_keys=True).encode()).hexdigest()
+        if key != legacy or normalise_params(old) != normalise_params(params):
+            return False
+    return os.path.isfile(entry.get('output_csv', ''))
+
+
+def record(entries, raw_path, fingerprint, params, output_csv):
+    ''' Adds or replaces the manifest entry for raw_path. '''
+    output_csv = Path(output_csv)
+    entries[str(raw_path)] = {
+        'key': entry_key(fingerprint, params),
+        'fingerprint': fingerprint,
+        'params': normalise_params(params),
+        'output_csv': str(output_csv),
+        'output_size': output_csv.stat().st_size,
+        'extracted': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    return entries
@@ -0,0 +1,132 @@
+'''
+metadata.py
+Python Version: 3.9
+Purpose: Annotates tables of experiment IDs with the conditions encoded in
+them: vial row/column position (RA ... GD) -> solvent, and the vial number
+-> condition number. Ex: EJ3-57-158-BC4-Sampling-2 -> D2O_10, condition 4.
+
+Positions are mapped through a CSV with a Position column and one column
+per annotation (vial-solvents.csv next to this module by default; extra
+columns such as an additive or template are carried over). IDs are decoded
+a whole column at a time and the decoded table is kept per series, so
+re-annotating a campaign only decodes IDs not seen before.
+
+    >>> from samm import metadata
+    >>> data = metadata.annotate(data, id_column='ID')      # adds Solvent, Condition
+'''
+
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from samm import naming
+
+DEFAULT_MAPPING = Path(__file__).with_name('vial-solvents.csv')
+
+# Vial position and condition number within an experiment ID, ex: -BC4-
+VIAL_PATTERN = r'-(?P<Position>[A-Z]{2})(?P<Condition>\d+)(?:-|$)'
+SERIES_PATTERN = naming.SERIES_RE.pattern
+
+_decoded = {}  # (mapping file, mtime, series) -> metadata table indexed by ID
+_lock = threading.Lock()
+
+
+def load_mapping(path=None):
+    '''
+    Reads a position mapping file.
+
+    Args:
+        path (str): CSV with a Position column (RA, RB, ... GD) and one
+            column per annotation (default: DEFAULT_MAPPING).
+
+    Returns:
+        pd.DataFrame: annotations indexed by position.
+    '''
+    path = Path(path or DEFAULT_MAPPING)
+    if not path.is_file():
+        raise FileNotFoundError(f'Vial mapping file not found: {path}')
+    mapping = pd.read_csv(path, dtype=str).set_index('Position')
+    if mapping.index.has_duplicates:
+        raise ValueError(f'Vial positions listed more than once in {path}: '
+                         f'{sorted(set(mapping.index[mapping.index.duplicated()]))}')
+    return mapping
+
+
+def decode_ids(ids, mapping):
+    '''
+    Decodes experiment IDs into series, position, condition number and the
+    mapped annotations, without a Python loop over the IDs.
+
+    Args:
+        ids (array-like): experiment IDs.
+        mapping (pd.DataFrame): from load_mapping().
+
+    Returns:
+        pd.DataFrame: one row per ID (same order). Annotation columns are
+            categorical; IDs without a vial position, or with a position
+            missing from the mapping, get NaN.
+    '''
+    ids = pd.Series(ids, dtype='string').reset_index(drop=True)
+    decoded = ids.str.extract(VIAL_PATTERN)
+    decoded.insert(0, 'Series', ids.str.extract(SERIES_PATTERN, expand=False).fillna('other'))
+    decoded['Condition'] = pd.to_numeric(decoded['Condition']).astype('Int64')
+    codes = mapping.index.get_indexer(decoded['Position'].fillna(''))
+    for col in mapping.columns:
+        values = pd.Categorical(mapping[col].to_numpy(dtype=object))
+        decoded[col] = pd.Categorical.from_codes(
+            np.where(codes >= 0, values.codes[codes], -1), values.categories)
+    decoded['Position'] = pd.Categorical(decoded['Position'], categories=mapping.index)
+    decoded.index = pd.Index(ids.to_numpy(dtype=object), name='ID')
+    return decoded
+
+
+def series_metadata(ids, series, mapping_path=None):
+    '''
+    Decoded metadata for the IDs of one series, from the per-series cache.
+    IDs not decoded before are decoded and added to it.
+    '''
+    path = Path(mapping_path or DEFAULT_MAPPING)
+    key = (str(path.resolve()), os.stat(path).st_mtime_ns, series)
+    with _lock:
+        known = _decoded.get(key)
+    new = pd.Index(ids).unique()
+    if known is not None:
+        new = new.difference(known.index)
+    if len(new):
+        decoded = decode_ids(new, load_mapping(path))
+        known = decoded if known is None else pd.concat([known, decoded])
+        with _lock:
+            _decoded[key] = known
+    return known
+
+
+def annotate(table, id_column='ID', mapping_path=None):
+    '''
+    Adds the mapped annotations (ex: Solvent) and Condition columns to a
+    table of experiments, as getSolventsFromID() did in the Figure 4 scripts.
+
+    Args:
+        table (pd.DataFrame): one row per experiment or injection.
+        id_column (str): column holding experiment IDs.
+        mapping_path (str): position mapping file (default: DEFAULT_MAPPING).
+
+    Returns:
+        pd.DataFrame: copy of table with the annotation columns added.
+    '''
+    out = table.copy()
+    codes, uniques = pd.factorize(table[id_column].astype(str))
+    series = pd.Series(uniques).str.extract(SERIES_PATTERN, expand=False).fillna('other')
+    parts = [series_metadata(uniques[(series == name).to_numpy()], name, mapping_path)
+             for name in series.unique()]
+    if not parts:
+        decoded = decode_ids([], load_mapping(mapping_path))
+    else:
+        decoded = pd.concat(parts) if len(parts) > 1 else parts[0]
+        decoded = decoded.loc[uniques].take(codes)
+    annotations = [col for col in decoded.columns if col not in ('Series', 'Position', 'Condition')]
+    for col in annotations + ['Condition']:
+        out[col] = decoded[col].array
+    return out
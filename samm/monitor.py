@@ -0,0 +1,302 @@
+r'''
+monitor.py
+Python Version: 3.9
+Purpose: Batch SAMMmonitor run. Screens every target against every Apex3D
+ion table of a folder and reduces the hits to one ion x injection matrix
+of summed areas, written once.
+
+Each ion table is read exactly once (only the m_z, mobility and area
+columns, and only the rows inside the m/z span of the target list), by a
+pool of worker processes. All targets are screened against it in one pass
+through a spatial.IonGrid, with the monitor tolerances: m/z within
++/- mz_tolerance (absolute, or a fraction of the target m/z when mz_units
+is not 'abs') and mobility within +/- mob_tolerance x the target mobility.
+
+    >>> from samm import monitor, screen
+    >>> targets = screen.load_targets('experimental-target-list.csv', monitor.TARGET_COLUMNS)
+    >>> areas = monitor.area_matrix(monitor.find_ion_tables(r'D:\2-SAMM\Data\APEX Output'), targets, 1.0, 0.05)
+    >>> monitor.write_matrix(areas, 'SAMMmonitor-areas.csv')
+
+Incremental mode (update) keeps its state in an output folder, so a long
+campaign can be refreshed many times a day at the cost of the new files:
+    monitor-state.json          fingerprint of the target list and tolerances,
+                                size/mtime of every ion table screened
+    SAMMmonitor-results.csv     cumulative long table: injection, target, area
+Only files that are new or changed since the last run are screened and
+their rows appended (a changed file's newer rows supersede its old ones).
+If the targets or tolerances change, everything is screened again into a
+fresh table.
+
+Command line:
+    python -m samm.monitor "D:\2-SAMM\Data\APEX Output" targets.csv --output areas.csv
+    python -m samm.monitor "D:\2-SAMM\Data\APEX Output" targets.csv --incremental
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from samm import ionstore, iontable, naming, screen, sinks, spatial
+
+APEX_SUFFIX = '_Apex3DIons.csv'
+AREA_COLUMNS = ['m_z', 'mobility', 'area']
+STATE_NAME = 'monitor-state.json'
+RESULTS_NAME = 'SAMMmonitor-results.csv'
+RESULT_COLUMNS = ['injection', 'target', 'area']
+# name, m/z and mobility columns of experimental-target-list.csv (as SAMMmonitor.py reads it)
+TARGET_COLUMNS = (0, 2, 3)
+
+
+def find_ion_tables(data_dir):
+    ''' Apex3D ion tables of a folder, sorted by name (logs, manifests and columnar copies are skipped). '''
+    return sorted(str(p) for p in Path(data_dir).iterdir() if p.name.endswith(APEX_SUFFIX))
+
+
+def target_windows(targets, mz_tolerance, mob_tolerance, mz_units='abs'):
+    ''' mz_low, mz_high, dt_low, dt_high arrays of the monitor windows of a target table. '''
+    low, high = screen.mz_windows(targets, mz_tolerance, mz_units)
+    mobility = targets['mobility'].to_numpy(dtype='float64')
+    window = mobility * mob_tolerance  # bounds as check_hit computes them
+    return low, high, mobility - window, mobility + window
+
+
+def file_areas(csv_path, targets, mz_tolerance, mob_tolerance, mz_units='abs'):
+    '''
+    Summed area of the ions inside each target's window, for one ion table.
+    The hits are the ones screen.screen_file finds: candidates come from
+    grid boxes widened by a float32 step in mobility, then the mobility
+    window is re-checked with screen.in_mobility_window.
+
+    Returns:
+        np.ndarray: one value per target (0 for targets without hits).
+    '''
+    targets = screen.as_targets(targets)
+    low, high, dt_low, dt_high = target_windows(targets, mz_tolerance, mob_tolerance, mz_units)
+    span = (low.min(), high.max()) if len(targets) else (1, 0)
+    ions = iontable.read_ions(csv_path, columns=AREA_COLUMNS, ranges={'m_z': span})
+    grid = spatial.IonGrid(ions['m_z'], ions['mobility'])
+    box, ion = grid.query_boxes(low, high, dt_low - screen.float32_step(dt_low),
+                                dt_high + screen.float32_step(dt_high))
+    keep = screen.in_mobility_window(ions['mobility'].to_numpy()[ion],
+                                     targets['mobility'].to_numpy(dtype='float64')[box], mob_tolerance)
+    area = ions['area'].to_numpy(dtype='float64')
+    return np.bincount(box[keep], weights=area[ion[keep]], minlength=len(targets))
+
+
+def area_matrix(csv_files, targets, mz_tolerance, mob_tolerance, mz_units='abs', workers=None):
+    '''
+    Screens every ion table once against all targets.
+
+    Args:
+        csv_files (list): Apex3D ion tables (see find_ion_tables).
+        targets: screen.load_targets() frame or fetch_target_data() dict.
+        mz_tolerance, mob_tolerance, mz_units: as screen.screen_ions().
+        workers (int): worker processes (default: os.cpu_count(); 1 reads
+            the files in this process).
+
+    Returns:
+        pd.DataFrame: summed hit area, one row per target and one column
+            per injection (experiment ID). Files that could not be read
+            get a column of NaN and are listed in attrs['failed'].
+    '''
+    targets = screen.as_targets(targets)
+    csv_files = [str(p) for p in csv_files]
+    args = (targets, mz_tolerance, mob_tolerance, mz_units)
+    workers = min(workers or os.cpu_count() or 1, max(len(csv_files), 1))
+
+    columns, failed = [], []
+    if workers == 1:
+        results = []
+        for path in csv_files:
+            try:
+                results.append(file_areas(path, *args))
+            except Exception as e:
+                results.append(e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(file_areas, path, *args) for path in csv_files]
+            results = [f.exception() or f.result() for f in futures]
+    for path, result in zip(csv_files, results):
+        if isinstance(result, BaseException):
+            print(f'Skipped {Path(path).name}: {result}')
+            failed.append(path)
+            result = np.full(len(targets), np.nan)
+        columns.append(result)
+
+    matrix = pd.DataFrame(np.column_stack(columns) if columns else np.empty((len(targets), 0)),
+                          index=pd.Index(targets['target'], name='target'),
+                          columns=pd.Index([naming.experiment_id(p) for p in csv_files], name='injection'))
+    matrix.attrs['failed'] = failed
+    return matrix
+
+
+def write_matrix(matrix, output_csv):
+    ''' Writes the area matrix atomically (temporary file then rename). '''
+    output_csv = Path(output_csv)
+    tmp = output_csv.with_name(f'.{output_csv.name}.{uuid.uuid4().hex[:8]}.part')
+    try:
+        matrix.to_csv(tmp)
+        os.replace(tmp, output_csv)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return output_csv
+
+
+def screening_key(targets, mz_tolerance, mob_tolerance, mz_units='abs'):
+    ''' Hash of the target list and tolerances; stored results are only reused while it matches. '''
+    targets = screen.as_targets(targets)
+    blob = json.dumps([targets.to_numpy().tolist(), mz_tolerance, mob_tolerance, mz_units]).encode()
+    return hashlib.sha1(blob).hexdigest()
+
+
+def load_state(out_dir):
+    ''' Returns the incremental state ({'key': ..., 'files': {injection: source entry}}), empty if none. '''
+    path = Path(out_dir) / STATE_NAME
+    if not path.is_file():
+        return {'key': None, 'files': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, out_dir):
+    ''' Writes the incremental state atomically (temporary file then rename). '''
+    path = Path(out_dir) / STATE_NAME
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def load_results(out_dir, injections=None):
+    '''
+    Cumulative results of an incremental run as an ion x injection matrix.
+
+    Args:
+        out_dir (str): output folder of update().
+        injections (list): only these injections (default: all files
+            still recorded in the state).
+
+    Returns:
+        pd.DataFrame: summed areas, as area_matrix().
+    '''
+    path = Path(out_dir) / RESULTS_NAME
+    if injections is None:
+        injections = sorted(load_state(out_dir)['files'])
+    if not path.is_file():
+        return pd.DataFrame(index=pd.Index([], name='target'), columns=pd.Index(injections, name='injection'))
+    results = pd.read_csv(path, dtype={'injection': str, 'target': str, 'area': 'float64'})
+    results = results[results['injection'].isin(injections)]
+    # Rows appended for a re-screened file supersede the earlier ones
+    results = results.drop_duplicates(['injection', 'target'], keep='last')
+    matrix = results.pivot(index='target', columns='injection', values='area')
+    targets = pd.unique(results['target'])
+    return matrix.reindex(index=pd.Index(targets, name='target'),
+                          columns=pd.Index([i for i in injections if i in matrix.columns], name='injection'))
+
+
+def update(data_dir, targets, mz_tolerance, mob_tolerance, out_dir=None, mz_units='abs', workers=None):
+    '''
+    Incremental monitor run: screens only the ion tables that are new or
+    changed since the last run (all of them if the targets or tolerances
+    changed) and appends their areas to the cumulative results table.
+
+    Args:
+        data_dir (str): folder of *_Apex3DIons.csv files.
+        targets: screen.load_targets() frame or fetch_target_data() dict.
+        mz_tolerance, mob_tolerance, mz_units, workers: as area_matrix().
+        out_dir (str): state and results folder (default:
+            'SAMMmonitor Output' in data_dir), created if missing.
+
+    Returns:
+        dict: injections 'screened', 'unchanged', 'removed' and 'failed'
+            in this run, and whether the stored results were 'reset'.
+    '''
+    out_dir = Path(out_dir or Path(data_dir) / 'SAMMmonitor Output')
+    out_dir.mkdir(parents=True, exist_ok=True)
+    targets = screen.as_targets(targets)
+    key = screening_key(targets, mz_tolerance, mob_tolerance, mz_units)
+    state = load_state(out_dir)
+    reset = state['key'] != key
+    if reset:
+        state = {'key': key, 'files': {}}
+
+    found = {naming.experiment_id(p): ionstore.source_entry(p) for p in find_ion_tables(data_dir)}
+    todo = [e for e, entry in found.items() if state['files'].get(e) != entry]
+    removed = sorted(set(state['files']) - set(found))
+    for injection in removed:
+        del state['files'][injection]
+
+    areas = area_matrix([found[e]['csv'] for e in todo], targets, mz_tolerance, mob_tolerance,
+                        mz_units, workers)
+    failed = [naming.experiment_id(p) for p in areas.attrs['failed']]
+    areas = areas.drop(columns=failed)
+    rows = areas.reset_index().melt(id_vars='target', var_name='injection', value_name='area')
+    with sinks.open_sink(out_dir / RESULTS_NAME, RESULT_COLUMNS, append=not reset) as sink:
+        sink.write_frame(rows)
+    for injection in areas.columns:
+        state['files'][injection] = found[injection]
+    save_state(state, out_dir)
+
+    return {'screened': list(areas.columns), 'unchanged': sorted(set(found) - set(todo)),
+            'removed': removed, 'failed': failed, 'reset': reset}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Screen a folder of Apex3D ion tables for target ions (ion x injection area matrix).')
+    parser.add_argument('data_dir', help='folder containing *_Apex3DIons.csv files')
+    parser.add_argument('targets', help='target list CSV with a header row')
+    parser.add_argument('--target-columns', default=','.join(map(str, TARGET_COLUMNS)),
+                        help='name, m/z and mobility column positions in the target list (default: %(default)s)')
+    parser.add_argument('--mz-tolerance', type=float, default=1.0)
+    parser.add_argument('--mob-tolerance', type=float, default=0.05, help='fraction of the target mobility')
+    parser.add_argument('--mz-units', default='abs', help="'abs' or a relative m/z tolerance")
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU core)')
+    parser.add_argument('--output', help='matrix CSV (default: SAMMmonitor-areas.csv in data_dir, '
+                                         'or in the state folder with --incremental)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only screen files new or changed since the last incremental run')
+    parser.add_argument('--state-dir', help='incremental state and results folder '
+                                            '(default: "SAMMmonitor Output" in data_dir)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.data_dir):
+        sys.exit(f'ERROR: Folder cannot be found: {args.data_dir}')
+    try:
+        target_columns = tuple(int(col) for col in args.target_columns.split(','))
+        if len(target_columns) != 3:
+            raise ValueError(f'--target-columns needs 3 positions, got {args.target_columns}')
+        targets = screen.load_targets(args.targets, target_columns)
+        csv_files = find_ion_tables(args.data_dir)
+        start = time.perf_counter()
+        if args.incremental:
+            state_dir = Path(args.state_dir or Path(args.data_dir) / 'SAMMmonitor Output')
+            run = update(args.data_dir, targets, args.mz_tolerance, args.mob_tolerance,
+                         state_dir, args.mz_units, args.workers)
+            print(f"{len(run['screened'])} injections screened, {len(run['unchanged'])} unchanged, "
+                  f"{len(run['removed'])} removed" + (' (targets or tolerances changed)' if run['reset'] else ''))
+            matrix = load_results(state_dir)
+            args.output = args.output or state_dir / 'SAMMmonitor-areas.csv'
+        else:
+            matrix = area_matrix(csv_files, targets, args.mz_tolerance, args.mob_tolerance,
+                                 args.mz_units, args.workers)
+    except (OSError, ValueError) as e:
+        sys.exit(f'ERROR: {e}')
+    output = write_matrix(matrix, args.output or Path(args.data_dir) / 'SAMMmonitor-areas.csv')
+    print(f'{len(matrix)} targets x {len(matrix.columns)} injections in '
+          f'{time.perf_counter() - start:.1f} s -> {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+'''
+naming.py
+Python Version: 3.9
+Purpose: Experiment IDs and series from SAMM acquisition and output file names.
+
+    EJ3-57-158-BC4-Sampling-2_Apex3DIons.csv -> experiment 'EJ3-57-158-BC4-Sampling-2', series 'EJ3-57'
+    EJ3-57-158-BC4-Sampling-2 -> sample 158, vial 'BC4', replicate 2
+    MZ_EJ3-57-158-BC4-Sampling-2_fn-1_#POMSolv-Z1-RuleFile.rul_raw.csv -> TWIMExtract Z1 m/z spectrum
+'''
+
+import re
+from pathlib import Path
+
+# Suffixes added to the acquisition name by Apex3D and the iontable copies
+OUTPUT_SUFFIXES = ('_Apex3DIons.csv', '_Apex3DIons.npz', '_Apex3DIons.parquet', '.raw')
+
+# Notebook ID and experiment number, ex: EJ3-57
+SERIES_RE = re.compile(r'^([A-Za-z]+\d+-\d+)')
+
+# Autosampler vial position, ex: BC4 (rows RA...GD)
+VIAL_RE = re.compile(r'^[A-Z]{2}\d+$')
+
+# TWIMExtract exports: <MZ|DT>_<experiment>_fn-<function>_#<range or rule file>_raw.csv
+TWIM_RE = re.compile(r'^(?P<dimension>MZ|DT)_(?P<experiment>.+?)_fn-\d+_(?P<selection_file>.*)_raw\.csv$')
+TWIM_DIMENSIONS = {'MZ': 'MS', 'DT': 'DT'}
+
+
+def experiment_id(path):
+    '''
+    Acquisition name of a .raw directory or one of its output files.
+    Ex: EJ3-57-158-BC4-Sampling-2_Apex3DIons.csv -> EJ3-57-158-BC4-Sampling-2
+    '''
+    name = Path(path).name
+    for suffix in OUTPUT_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return Path(name).stem
+
+
+def series_of(experiment):
+    '''
+    Experiment series (notebook ID and experiment number) of an experiment ID.
+    Ex: EJ3-57-158-BC4-Sampling-2 -> EJ3-57 (IDs that do not match -> 'other')
+    '''
+    match = SERIES_RE.match(experiment)
+    return match.group(1) if match else 'other'
+
+
+def parse_experiment(experiment):
+    '''
+    Splits an experiment ID into its fields (None where absent).
+    Ex: EJ3-57-158-BC4-Sampling-2 -> {'series': 'EJ3-57', 'sample': 158, 'vial': 'BC4', 'replicate': 2}
+    '''
+    series = series_of(experiment)
+    tokens = experiment[len(series):].strip('-').split('-') if series != 'other' else []
+    fields = {'series': series, 'sample': None, 'vial': None, 'replicate': None}
+    for i, token in enumerate(tokens):
+        if token.isdigit() and fields['sample'] is None and fields['vial'] is None:
+            fields['sample'] = int(token)
+        elif VIAL_RE.match(token) and fields['vial'] is None:
+            fields['vial'] = token
+        elif token.startswith('Sampl') and i + 1 < len(tokens) and tokens[i + 1].isdigit():
+            fields['replicate'] = int(tokens[i + 1])
+    return fields
+
+
+def parse_twim_name(name):
+    '''
+    Experiment, selection ('FR', 'Z1', 'Z2', ...) and dimension ('MS' or 'DT')
+    of a TWIMExtract export file name, or None if it is not one.
+    Ex: DT_EJ3-57-158-BC4-Sampling-2_fn-1_#FullRange-POMSolv-Rangefile.txt_raw.csv
+        -> ('EJ3-57-158-BC4-Sampling-2', 'FR', 'DT')
+    '''
+    match = TWIM_RE.match(name)
+    if not match:
+        return None
+    selection_file = match.group('selection_file')
+    charge = re.search(r'(?<![A-Za-z0-9])Z(\d+)(?![0-9])', selection_file)
+    if charge:
+        selection = f'Z{charge.group(1)}'
+    elif 'fullrange' in selection_file.lower().replace(' ', ''):
+        selection = 'FR'
+    else:
+        selection = selection_file.lstrip('#')
+    return match.group('experiment'), selection, TWIM_DIMENSIONS[match.group('dimension')]
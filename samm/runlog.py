@@ -0,0 +1,159 @@
+'''
+runlog.py
+Python Version: 3.9
+Purpose: Captures Apex3D console output into per-run log files, parses
+Apex3D logs for ion counts and stage timings, and keeps a run history
+(one JSON record per extraction) so slow or failed acquisitions can be found.
+
+Run history: <output folder>/apex3d-runs.jsonl
+Per-run logs: <output folder>/apex3d-logs/<acquisition>.log
+
+Usage: python -m samm.runlog <output folder> [n]   (lists the n slowest runs)
+'''
+
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+HISTORY_NAME = 'apex3d-runs.jsonl'
+LOG_FOLDER = 'apex3d-logs'
+
+# Apex3D / DriftScope log lines of interest, ex:
+#   "Number of ions found: 104523"      "Peak detection took 12.3 s"
+#   "Total ions = 88213"                "Deisotoping time: 4.51 seconds"
+ION_COUNT_RE = re.compile(r'\bions\b[^0-9\n]*[:=]\s*(\d+)|(\d+)\s+ions\b', re.I)
+STAGE_TIME_RE = re.compile(
+    r'^\s*(?P<stage>[A-Za-z][\w /-]*?)\s*(?:took|time|elapsed|duration)\s*[:=]?\s*'
+    r'(?P<seconds>\d+(?:\.\d+)?)\s*(?:s|sec|secs|seconds)\b', re.I)
+
+_history_lock = threading.Lock()
+
+
+def run_log_path(raw_path, output_dir):
+    ''' Per-run log file for one acquisition. '''
+    return Path(output_dir) / LOG_FOLDER / (Path(raw_path).stem + '.log')
+
+
+def stream_process(args, log_path, timeout=None):
+    '''
+    Runs a subprocess, writing its stdout and stderr to log_path line by
+    line as they are produced (stderr lines are prefixed "[stderr]").
+
+    Args:
+        args (list): subprocess argument list.
+        log_path (str): log file, overwritten.
+        timeout (float): seconds before the process is killed (default: no limit).
+
+    Returns:
+        int: process exit code.
+
+    Raises:
+        subprocess.TimeoutExpired: the process ran longer than timeout and was killed.
+    '''
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    lock = threading.Lock()
+    with open(log_path, 'w', encoding='utf-8', errors='replace') as log:
+        log.write(f'# {time.strftime("%Y-%m-%d %H:%M:%S")} {" ".join(args)}\n')
+        proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True, errors='replace', bufsize=1)
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            proc.kill()
+
+        killer = threading.Timer(timeout, kill) if timeout else None
+        if killer:
+            killer.start()
+
+        def pump(stream, prefix):
+            for line in stream:
+                with lock:
+                    log.write(prefix + line)
+                    log.flush()
+
+        err_thread = threading.Thread(target=pump, args=(proc.stderr, '[stderr] '))
+        err_thread.start()
+        pump(proc.stdout, '')
+        err_thread.join()
+        returncode = proc.wait()
+        if killer:
+            killer.cancel()
+        if timed_out.is_set():
+            log.write(f'# killed after {timeout} s timeout\n')
+            raise subprocess.TimeoutExpired(args, timeout)
+        log.write(f'# exit {returncode}\n')
+    return returncode
+
+
+def parse_apex_log(log_path):
+    '''
+    Extracts ion counts and stage durations from an Apex3D log, either a
+    per-run capture or DriftScope's C:\\DriftScope\\log\\_Apex3DLog.txt.
+
+    Returns:
+        dict: {'ions': last ion count reported (or None),
+               'stages': {stage name: seconds}}
+    '''
+    ions, stages = None, {}
+    if not os.path.isfile(log_path):
+        return {'ions': ions, 'stages': stages}
+    with open(log_path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            stage = STAGE_TIME_RE.search(line)
+            if stage:
+                name = stage.group('stage').strip()
+                stages[name] = stages.get(name, 0.0) + float(stage.group('seconds'))
+                continue
+            count = ION_COUNT_RE.search(line)
+            if count:
+                ions = int(count.group(1) or count.group(2))
+    return {'ions': ions, 'stages': stages}
+
+
+def count_csv_rows(csv_path):
+    ''' Number of data rows (excluding the header) in a CSV file. '''
+    with open(csv_path, 'rb') as f:
+        lines = sum(1 for _ in f)
+    return max(lines - 1, 0)
+
+
+def append_run_record(history_path, record):
+    ''' Appends one run record to the JSON-lines run history (thread-safe). '''
+    with _history_lock:
+        with open(history_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+
+def load_run_history(history_path):
+    ''' Returns all run records, oldest first (empty if no history yet). '''
+    if not os.path.isfile(history_path):
+        return []
+    with open(history_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def slowest_runs(history_path, n=10):
+    ''' The n run records with the longest wall time. '''
+    records = [r for r in load_run_history(history_path) if r.get('wall_time')]
+    return sorted(records, key=lambda r: -r['wall_time'])[:n]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        sys.exit('Usage: python -m samm.runlog <output folder> [n]')
+    n = int(argv[1]) if len(argv) > 1 else 10
+    for r in slowest_runs(Path(argv[0]) / HISTORY_NAME, n):
+        ions = r['ions'] if r['ions'] is not None else '-'
+        print(f"{r['wall_time']:8.1f} s  {r['status']:<7} {ions:>9} ions  "
+              f"{r['bytes_written'] or 0:>12} B  {Path(r['raw_path']).name}")
+
+
+if __name__ == '__main__':
+    main()
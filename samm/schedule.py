@@ -0,0 +1,72 @@
+'''
+schedule.py
+Python Version: 3.9
+Purpose: Orders Apex3D jobs longest-first so one large acquisition started
+last does not dominate the batch wall time (makespan).
+
+Job cost is estimated from past runtimes of the same .raw in the run
+history (apex3d-runs.jsonl) when available, otherwise from .raw directory
+size times the seconds-per-byte rate observed in the history (or
+DEFAULT_SECONDS_PER_GB when there is no history yet).
+'''
+
+import heapq
+import os
+from pathlib import Path
+from statistics import median
+
+# Rough Apex3D throughput used before any run history exists
+DEFAULT_SECONDS_PER_GB = 120.0
+
+
+def history_rate(history):
+    '''
+    Seconds of Apex3D time per byte of .raw, from successful runs in the
+    run history (None if no usable runs).
+    '''
+    runs = [r for r in history
+            if r.get('status') == 'done' and r.get('wall_time') and r.get('raw_size')]
+    size = sum(r['raw_size'] for r in runs)
+    return sum(r['wall_time'] for r in runs) / size if size else None
+
+
+def estimate_costs(raw_sizes, history=()):
+    '''
+    Estimates Apex3D seconds per job.
+
+    Args:
+        raw_sizes (dict): {raw path: .raw directory size in bytes}.
+        history (list): run records from runlog.load_run_history.
+
+    Returns:
+        dict: {raw path: estimated seconds}
+    '''
+    past = {}
+    for r in history:
+        if r.get('status') == 'done' and r.get('wall_time'):
+            past.setdefault(str(Path(r['raw_path'])), []).append(r['wall_time'])
+    rate = history_rate(history) or DEFAULT_SECONDS_PER_GB / 1e9
+    return {raw: median(past[str(Path(raw))]) if str(Path(raw)) in past else size * rate
+            for raw, size in raw_sizes.items()}
+
+
+def longest_first(costs):
+    ''' Raw paths ordered by estimated cost, longest first. '''
+    return sorted(costs, key=lambda raw: -costs[raw])
+
+
+def predict_makespan(ordered_costs, workers):
+    '''
+    Simulates list scheduling: each job goes to the first free worker.
+
+    Args:
+        ordered_costs (list): job costs in dispatch order.
+        workers (int): concurrent Apex3D processes.
+
+    Returns:
+        float: predicted wall time of the batch.
+    '''
+    finish = [0.0] * max(1, min(workers or os.cpu_count() or 1, len(ordered_costs) or 1))
+    for cost in ordered_costs:
+        heapq.heappush(finish, heapq.heappop(finish) + cost)
+    return max(finish)
@@ -0,0 +1,185 @@
+'''
+screen.py
+Python Version: 3.9
+Purpose: Screens Apex3D ion tables for a list of target ions (m/z and
+mobility) all targets at once, replacing the target x ion Python loops of
+screen_hits_for_single_csv/check_hit in the SAMMmonitor scripts.
+
+Ions are sorted by m/z once; each target's m/z window is then a slice found
+by binary search (np.searchsorted), and the mobility window is checked on
+all candidate ions of all targets in one vectorized pass. The tolerances
+mean what they did in check_hit: m/z within +/- mz_tolerance (absolute, or
+a fraction of the target m/z when mz_units is not 'abs') and mobility
+within +/- mob_tolerance x the target mobility, both ends inclusive.
+
+    >>> from samm import screen
+    >>> targets = screen.load_targets('TargetList-SAMMmonitor-testing.csv')
+    >>> hits = screen.screen_file('EJ3-72-5-RA1-Sampling-2_Apex3DIons.csv', targets, 1, 0.05)
+'''
+
+import numpy as np
+import pandas as pd
+
+from samm import iontable
+
+# Apex3D columns reported for each hit (the data[1:9] slice of the old scripts)
+HIT_COLUMNS = ['index', 'm_z', 'mzNoCal', 'rt', 'inten', 'area', 'counts', 'mobility']
+
+
+def load_targets(target_csv, columns=(0, 1, 2)):
+    '''
+    Reads a SAMMmonitor target list with a header row.
+
+    Args:
+        target_csv (str): target list CSV.
+        columns (tuple): positions of the name, expected m/z and mobility
+            columns (default: the first three).
+
+    Returns:
+        pd.DataFrame: columns 'target', 'mz', 'mobility'.
+    '''
+    columns = list(columns)
+    targets = pd.read_csv(target_csv, usecols=columns, dtype={columns[0]: str})
+    targets = targets.iloc[:, [sorted(columns).index(col) for col in columns]]  # usecols keeps file order
+    targets.columns = ['target', 'mz', 'mobility']
+    return targets.astype({'mz': 'float64', 'mobility': 'float64'})
+
+
+def as_targets(targets):
+    '''
+    Target table from a load_targets() frame or a fetch_target_data() dict
+    ({name: {'mz': ..., 'mobility': ...}}).
+    '''
+    if isinstance(targets, pd.DataFrame):
+        return targets[['target', 'mz', 'mobility']].reset_index(drop=True)
+    return pd.DataFrame([(name, float(t['mz']), float(t['mobility'])) for name, t in targets.items()],
+                        columns=['target', 'mz', 'mobility'])
+
+
+def mz_windows(targets, mz_tolerance, mz_units='abs'):
+    ''' (low, high) m/z bounds of every target, as arrays. '''
+    mz = targets['mz'].to_numpy(dtype='float64')
+    if mz_units == 'abs':
+        tolerance = np.full(len(mz), float(mz_tolerance))
+    else:
+        if not 0 <= mz_tolerance < 1:
+            raise ValueError(f'm/z tolerance {mz_tolerance} must be a decimal fraction when '
+                             f'mz_units is {mz_units!r} (use mz_units="abs" for an absolute tolerance)')
+        tolerance = mz_tolerance * mz
+    return mz - tolerance, mz + tolerance
+
+
+def screen_ions(ions, targets, mz_tolerance, mob_tolerance, mz_units='abs', grid=None):
+    '''
+    Finds every ion inside every target's m/z and mobility windows.
+
+    Args:
+        ions (pd.DataFrame): Apex3D ion table (needs m_z and mobility).
+        targets: load_targets() frame or fetch_target_data() dict.
+        mz_tolerance (float): absolute m/z tolerance, or a fraction of the
+            target m/z when mz_units is not 'abs'.
+        mob_tolerance (float): mobility tolerance as a fraction of the
+            target mobility.
+        grid (spatial.IonGrid): index built on this ion table, to reuse
+            across calls instead of sorting m/z each time.
+
+    Returns:
+        pd.DataFrame: one row per (target, ion) hit: 'target' followed by
+            the ion's columns, in target-list order then file order.
+    '''
+    targets = as_targets(targets)
+    low, high = mz_windows(targets, mz_tolerance, mz_units)
+    mobility = ions['mobility'].to_numpy()
+    if grid is not None:
+        t_mob = targets['mobility'].to_numpy(dtype='float64')
+        # boxes widened by a float32 step, then re-checked exactly by in_mobility_window
+        dt_low, dt_high = t_mob - t_mob * mob_tolerance, t_mob + t_mob * mob_tolerance
+        target_idx, rows = grid.query_boxes(low, high, dt_low - float32_step(dt_low),
+                                            dt_high + float32_step(dt_high))
+        keep = in_mobility_window(mobility[rows], t_mob[target_idx], mob_tolerance)
+        target_idx, rows = target_idx[keep], rows[keep]
+        sort = np.argsort(target_idx.astype('int64') * len(grid) + rows)
+        return _hits(ions, targets, target_idx[sort], rows[sort])
+
+    mz = ions['m_z'].to_numpy()
+    order = None
+    if len(mz) > 1 and not (mz[1:] >= mz[:-1]).all():  # columnar copies are already sorted
+        order = np.argsort(mz)
+        mz = mz[order]
+    start = np.searchsorted(mz, low, side='left')
+    stop = np.searchsorted(mz, high, side='right')
+
+    # Expand each target's slice into (target, ion position) candidate pairs
+    counts = np.maximum(stop - start, 0)
+    target_idx = np.repeat(np.arange(len(targets)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    position = np.repeat(start, counts) + offsets
+    rows = position if order is None else order[position]
+
+    keep = in_mobility_window(mobility[rows], targets['mobility'].to_numpy(dtype='float64')[target_idx],
+                               mob_tolerance)
+    target_idx, rows = target_idx[keep], rows[keep]
+
+    if order is not None:
+        # Candidates are grouped by target already; restore file order within each target
+        sort = np.argsort(target_idx.astype('int64') * len(mz) + rows)
+        target_idx, rows = target_idx[sort], rows[sort]
+    return _hits(ions, targets, target_idx, rows)
+
+
+def float32_step(values):
+    ''' Spacing of float32 values near each value, as float64. '''
+    return np.spacing(np.abs(values).astype('float32')).astype('float64')
+
+
+def in_mobility_window(mob, t_mob, mob_tolerance):
+    '''
+    Mobility test of check_hit, in float64. Mobility stored as float32
+    (typed ion tables) is not the float64 value the text CSV parses to, so
+    ions within one float32 step of a window edge are re-checked using
+    the decimal value they were read from (the float32's shortest repr).
+    '''
+    window = t_mob * mob_tolerance
+    low, high = t_mob - window, t_mob + window
+    values = mob.astype('float64')
+    if mob.dtype == np.float32:
+        step = float32_step(values)
+        edge = (np.abs(values - low) <= step) | (np.abs(values - high) <= step)
+        values[edge] = mob[edge].astype(str).astype('float64')
+    return (values >= low) & (values <= high)
+
+
+def _hits(ions, targets, target_idx, rows):
+    hits = ions.iloc[rows].reset_index(drop=True)
+    hits.insert(0, 'target', targets['target'].to_numpy()[target_idx])
+    return hits
+
+
+def screen_file(csv_path, targets, mz_tolerance, mob_tolerance, mz_units='abs', columns=HIT_COLUMNS):
+    '''
+    Screens one Apex3D ion table (or its columnar copy). Only ions inside
+    the overall m/z span of the targets are read.
+
+    Returns:
+        pd.DataFrame: hits, as screen_ions().
+    '''
+    targets = as_targets(targets)
+    low, high = mz_windows(targets, mz_tolerance, mz_units)
+    span = (low.min(), high.max()) if len(targets) else (1, 0)
+    ions = iontable.read_ions(csv_path, columns=list(dict.fromkeys(list(columns) + ['m_z', 'mobility'])),
+                              ranges={'m_z': span})
+    return screen_ions(ions, targets, mz_tolerance, mob_tolerance, mz_units)[['target'] + list(columns)]
+
+
+def hits_dict(hits, targets, columns=HIT_COLUMNS):
+    '''
+    Hits in the {target: [[index, m/z, ...], ...]} form returned by the old
+    screen_hits_for_single_csv (every target present, possibly empty).
+    '''
+    values = {col: (hits[col].to_numpy().astype(str).tolist() if hits[col].dtype == 'float32'
+                    else hits[col].tolist()) for col in columns}
+    rows = [list(row) for row in zip(*(values[col] for col in columns))]
+    found = {}
+    for target, row in zip(hits['target'], rows):
+        found.setdefault(target, []).append(row)
+    return {name: found.get(name, []) for name in as_targets(targets)['target']}
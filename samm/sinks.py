@@ -0,0 +1,213 @@
+'''
+sinks.py
+Python Version: 3.9
+Purpose: Buffered output sinks for screening hits and other row tables.
+Rows are collected in memory and written in bulk, so exporting the hits of
+a large target list costs one file open and a few large writes instead of
+one append (open, write, close) per hit as append_output_csv did.
+
+Backends, picked from the output file suffix (or format=):
+    .csv                CsvSink      header once, rows written per buffer
+    .parquet            ParquetSink  whole table written on close (needs pyarrow)
+    .sqlite / .db       SqliteSink   rows inserted per buffer, one transaction each
+
+    >>> from samm import sinks
+    >>> with sinks.open_sink('EJ3-72-5-RA1-hits.csv', ['Target Formula', 'Index', 'Observed m/z']) as sink:
+    ...     sink.write_frame(hits)          # or sink.write(rows) / sink.write_row(row)
+'''
+
+import csv
+import os
+import sqlite3
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import pandas as pd
+
+# Rows held in memory before a CSV or SQLite sink writes them out
+BUFFER_ROWS = 50000
+
+
+class Sink(ABC):
+    '''
+    Base class: collects rows and hands them to write_rows() in batches.
+
+    Args:
+        path (str): output file.
+        columns (list): column names (header).
+        buffer_rows (int): rows to collect before writing.
+    '''
+
+    def __init__(self, path, columns, buffer_rows=BUFFER_ROWS):
+        self.path = Path(path)
+        self.columns = list(columns)
+        self.buffer_rows = buffer_rows
+        self.rows = []
+        self.written = 0
+
+    def write_row(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    def write(self, rows):
+        ''' Adds many rows (sequences in column order). '''
+        self.rows.extend(rows)
+        if len(self.rows) >= self.buffer_rows:
+            self.flush()
+
+    def write_frame(self, frame):
+        ''' Adds the rows of a DataFrame (by column name when it has the sink columns, else in order). '''
+        self.write(self.select(frame).itertuples(index=False, name=None))
+
+    def select(self, frame):
+        return frame[self.columns] if set(self.columns) <= set(frame.columns) else frame
+
+    def flush(self):
+        if self.rows:
+            self.write_rows(self.rows)
+            self.written += len(self.rows)
+            self.rows = []
+
+    @abstractmethod
+    def write_rows(self, rows):
+        ''' Writes one batch of rows out. '''
+
+    def close(self):
+        self.flush()
+
+    def discard(self):
+        ''' Called instead of close() when the with block raised; by default keeps what was written. '''
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class CsvSink(Sink):
+    ''' CSV file, opened once; the header is written on open (existing files are replaced unless append=True). '''
+
+    def __init__(self, path, columns, buffer_rows=BUFFER_ROWS, delimiter=',', append=False):
+        super().__init__(path, columns, buffer_rows)
+        new = not (append and self.path.is_file() and self.path.stat().st_size)
+        self.file = open(self.path, 'a' if append else 'w', newline='')
+        self.writer = csv.writer(self.file, delimiter=delimiter, lineterminator='\n')
+        if new:
+            self.writer.writerow(self.columns)
+
+    def write_frame(self, frame):
+        # pandas formats float32 columns at their own precision (as in the Apex3D file)
+        self.flush()
+        self.select(frame).to_csv(self.file, header=False, index=False,
+                                  sep=self.writer.dialect.delimiter, lineterminator='\n')
+        self.written += len(frame)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class ParquetSink(Sink):
+    '''
+    Parquet file, written once on close under a temporary name then renamed
+    (Parquet files cannot be appended to). Needs pyarrow. Nothing is
+    written if the with block raised, so a partial table never replaces
+    an existing file.
+    '''
+
+    def __init__(self, path, columns, buffer_rows=BUFFER_ROWS):
+        super().__init__(path, columns, buffer_rows)
+        self.frames = []
+
+    def write_frame(self, frame):
+        self.flush()
+        self.frames.append(self.select(frame).reset_index(drop=True))
+        self.written += len(frame)
+
+    def write_rows(self, rows):
+        self.frames.append(pd.DataFrame(rows, columns=self.columns))
+
+    def close(self):
+        self.flush()
+        if self.frames is None:
+            return
+        table = pd.concat(self.frames, ignore_index=True) if self.frames else pd.DataFrame(columns=self.columns)
+        table.columns = self.columns
+        self.frames = None
+        tmp = self.path.with_name(f'.{self.path.name}.{uuid.uuid4().hex[:8]}.part')
+        try:
+            table.to_parquet(tmp, index=False)
+            os.replace(tmp, self.path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def discard(self):
+        self.rows, self.frames = [], None
+
+
+class SqliteSink(Sink):
+    '''
+    Table in a SQLite database (created if needed); each buffer is inserted
+    with one executemany in one transaction.
+
+    Args:
+        table (str): table name (default: 'hits').
+        replace (bool): drop an existing table of that name first.
+    '''
+
+    def __init__(self, path, columns, buffer_rows=BUFFER_ROWS, table='hits', replace=False):
+        super().__init__(path, columns, buffer_rows)
+        self.table = table
+        self.connection = sqlite3.connect(self.path)
+        names = ', '.join(f'"{col}"' for col in self.columns)
+        with self.connection:
+            if replace:
+                self.connection.execute(f'DROP TABLE IF EXISTS "{table}"')
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({names})')
+        self.insert = f'INSERT INTO "{table}" ({names}) VALUES ({", ".join("?" * len(self.columns))})'
+
+    def write_rows(self, rows):
+        with self.connection:
+            self.connection.executemany(self.insert, rows)
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+
+SINKS = {'csv': CsvSink, 'parquet': ParquetSink, 'sqlite': SqliteSink}
+SUFFIXES = {'.csv': 'csv', '.parquet': 'parquet', '.sqlite': 'sqlite', '.db': 'sqlite'}
+
+
+def open_sink(path, columns, format=None, **options):
+    '''
+    Opens the sink for an output file.
+
+    Args:
+        path (str): output file.
+        columns (list): column names.
+        format (str): 'csv', 'parquet' or 'sqlite' (default: from the suffix).
+        **options: passed to the sink (ex: buffer_rows, append, table).
+
+    Returns:
+        Sink: use as a context manager, or close() when done.
+    '''
+    format = format or SUFFIXES.get(Path(path).suffix.lower())
+    if format not in SINKS:
+        raise ValueError(f'Unknown output format for {path} (expected one of {sorted(SINKS)} '
+                         f'or a suffix in {sorted(SUFFIXES)})')
+    return SINKS[format](path, columns, **options)
@@ -0,0 +1,232 @@
+'''
+spatial.py
+Python Version: 3.9
+Purpose: Grid index over the (m/z, drift time) plane of an ion table,
+built once per file and reused for any number of window queries:
+monitor target windows, selection-rule (.rul) regions and nearest-ion
+look-ups from interactive plots.
+
+Ions are bucketed into cells of mz_cell x dt_cell and stored cell by
+cell, so a rectangle query only visits the cells it overlaps instead of
+building a boolean mask over the whole table. Queries are batched: many
+rectangles (or points) are answered in one vectorized call.
+
+    >>> from samm import iontable, spatial
+    >>> ions = iontable.read_ions(csv_path, columns=['m_z', 'mobility', 'area'])
+    >>> grid = spatial.IonGrid(ions['m_z'], ions['mobility'])
+    >>> box, ion = grid.query_boxes(*spatial.target_boxes([911.2, 1222.4], [34.0, 50.8], 1.0, 0.05))
+    >>> areas = grid.sum_boxes(ions['area'], *spatial.target_boxes([911.2, 1222.4], [34.0, 50.8], 1.0, 0.05))
+'''
+
+import numpy as np
+import pandas as pd
+
+# Cells per ion above which the grid is refused (cell sizes far too small)
+MAX_CELLS_PER_ION = 16
+
+
+def expand_spans(starts, counts):
+    '''
+    Flattens the ranges [start, start + count) into one index array.
+
+    Returns:
+        tuple: (range number of every index, the indices).
+    '''
+    counts = np.maximum(counts, 0)
+    group = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return group, np.repeat(starts, counts) + offsets
+
+
+def target_boxes(mz, mobility, mz_tol, mob_tol):
+    '''
+    Monitor tolerance windows as rectangles: m/z +/- mz_tol (absolute) and
+    mobility +/- mob_tol x mobility (fractional), with the bounds computed
+    as check_hit does (t - t * tol, t + t * tol). Mobility stored as
+    float32 can fall on the other side of an edge than the CSV value did;
+    screen.screen_ions and monitor.file_areas widen these boxes and
+    re-check the mobility with screen.in_mobility_window.
+
+    Returns:
+        tuple: mz_low, mz_high, dt_low, dt_high arrays.
+    '''
+    mz = np.asarray(mz, dtype='float64')
+    mobility = np.asarray(mobility, dtype='float64')
+    window = mobility * mob_tol
+    return mz - mz_tol, mz + mz_tol, mobility - window, mobility + window
+
+
+def read_rule_file(rule_path):
+    '''
+    Reads a DriftScope selection rule (.rul): for each drift time bin, the
+    m/z range kept. Bins set to -1 (nothing selected) are dropped.
+
+    Returns:
+        pd.DataFrame: columns 'bin', 'mz_low', 'mz_high'.
+    '''
+    with open(rule_path) as f:
+        lines = [line for line in f if line.strip() and not line.startswith((';', '['))]
+    rows = [line.split('\t')[:3] for line in lines]
+    rule = pd.DataFrame(rows, columns=['bin', 'mz_low', 'mz_high']).astype(
+        {'bin': 'int32', 'mz_low': 'float64', 'mz_high': 'float64'})
+    return rule[(rule['mz_low'] >= 0) & (rule['mz_high'] >= rule['mz_low'])].reset_index(drop=True)
+
+
+def rule_boxes(rule, bin_width=1.0):
+    '''
+    Rectangles of a selection rule: drift time bin b covers mobility
+    [b - bin_width / 2, b + bin_width / 2] over its m/z range.
+
+    Returns:
+        tuple: mz_low, mz_high, dt_low, dt_high arrays.
+    '''
+    centre = rule['bin'].to_numpy(dtype='float64')
+    return (rule['mz_low'].to_numpy(), rule['mz_high'].to_numpy(),
+            centre - bin_width / 2, centre + bin_width / 2)
+
+
+class IonGrid:
+    '''
+    Uniform grid index on (m/z, drift time).
+
+    Args:
+        mz, dt (array): ion coordinates (Apex3D m_z and mobility).
+        mz_cell, dt_cell (float): cell size; about the usual query
+            window size works best (default: 1 m/z x 1 drift bin).
+
+    Query results give ion positions in the arrays passed in, so they can
+    index the source table directly (ions.iloc[ion]).
+    '''
+
+    def __init__(self, mz, dt, mz_cell=1.0, dt_cell=1.0):
+        self.mz = np.asarray(mz, dtype='float64')
+        self.dt = np.asarray(dt, dtype='float64')
+        if self.mz.shape != self.dt.shape:
+            raise ValueError('mz and dt must have the same length')
+        self.mz_cell, self.dt_cell = float(mz_cell), float(dt_cell)
+        if len(self.mz):
+            self.mz0, self.dt0 = self.mz.min(), self.dt.min()
+            self.n_mz = int((self.mz.max() - self.mz0) // self.mz_cell) + 1
+            self.n_dt = int((self.dt.max() - self.dt0) // self.dt_cell) + 1
+        else:
+            self.mz0 = self.dt0 = 0.0
+            self.n_mz = self.n_dt = 1
+        n_cells = self.n_mz * self.n_dt
+        if n_cells > MAX_CELLS_PER_ION * len(self.mz) + 1000000:
+            raise ValueError(f'{n_cells} grid cells for {len(self.mz)} ions: '
+                             f'use larger mz_cell/dt_cell')
+        cell = self.cell_rows(self.mz) * self.n_dt + self.cell_cols(self.dt)
+        self.order = np.argsort(cell, kind='stable')
+        self.starts = np.searchsorted(cell[self.order], np.arange(n_cells + 1))
+        # Coordinates stored cell by cell, so candidates are read from contiguous runs
+        self.mz_by_cell = self.mz[self.order]
+        self.dt_by_cell = self.dt[self.order]
+
+    def __len__(self):
+        return len(self.mz)
+
+    def cell_rows(self, mz):
+        return np.clip(np.floor((np.asarray(mz, dtype='float64') - self.mz0) / self.mz_cell),
+                       0, self.n_mz - 1).astype('int64')
+
+    def cell_cols(self, dt):
+        return np.clip(np.floor((np.asarray(dt, dtype='float64') - self.dt0) / self.dt_cell),
+                       0, self.n_dt - 1).astype('int64')
+
+    def query_boxes(self, mz_low, mz_high, dt_low, dt_high):
+        '''
+        Ions inside each of a batch of rectangles (bounds inclusive).
+
+        Args:
+            mz_low, mz_high, dt_low, dt_high (array): one value per
+                rectangle (scalars are broadcast).
+
+        Returns:
+            tuple: (box, ion) arrays, one entry per ion found in a box,
+                grouped by box. An ion inside several boxes appears once
+                for each.
+        '''
+        mz_low, mz_high, dt_low, dt_high = (np.atleast_1d(np.asarray(b, dtype='float64'))
+                                            for b in np.broadcast_arrays(mz_low, mz_high,
+                                                                         dt_low, dt_high))
+        row0, row1 = self.cell_rows(mz_low), self.cell_rows(mz_high)
+        col0, col1 = self.cell_cols(dt_low), self.cell_cols(dt_high)
+        rows = np.where((mz_high >= mz_low) & (dt_high >= dt_low), row1 - row0 + 1, 0)
+
+        # One contiguous run of cells per (box, m/z row): columns col0..col1
+        box, row = expand_spans(row0, rows)
+        first = self.starts[row * self.n_dt + col0[box]]
+        last = self.starts[row * self.n_dt + col1[box] + 1]
+        run, pos = expand_spans(first, last - first)
+        box = box[run]
+
+        m, d = self.mz_by_cell[pos], self.dt_by_cell[pos]
+        keep = (m >= mz_low[box]) & (m <= mz_high[box]) & (d >= dt_low[box]) & (d <= dt_high[box])
+        return box[keep], self.order[pos[keep]]
+
+    def count_boxes(self, mz_low, mz_high, dt_low, dt_high):
+        ''' Number of ions inside each rectangle. '''
+        box, _ = self.query_boxes(mz_low, mz_high, dt_low, dt_high)
+        return np.bincount(box, minlength=np.broadcast(mz_low, mz_high, dt_low, dt_high).size)
+
+    def sum_boxes(self, weights, mz_low, mz_high, dt_low, dt_high):
+        ''' Sum of weights (ex: Apex3D area) of the ions inside each rectangle. '''
+        box, ion = self.query_boxes(mz_low, mz_high, dt_low, dt_high)
+        weights = np.asarray(weights, dtype='float64')
+        return np.bincount(box, weights=weights[ion],
+                           minlength=np.broadcast(mz_low, mz_high, dt_low, dt_high).size)
+
+    def select_rule(self, rule, bin_width=1.0):
+        ''' Sorted positions of the ions inside a selection rule (see read_rule_file). '''
+        _, ion = self.query_boxes(*rule_boxes(rule, bin_width))
+        return np.unique(ion)
+
+    def nearest(self, mz, dt, mz_scale=None, dt_scale=None, max_distance=np.inf):
+        '''
+        Nearest ion to each of a batch of points.
+
+        Distances are measured in scaled units, ((delta m/z / mz_scale)^2 +
+        (delta dt / dt_scale)^2) ** 0.5, since m/z and drift time are not
+        comparable (default scales: the cell sizes).
+
+        Returns:
+            tuple: (ion, distance) arrays; ion is -1 where no ion lies
+                within max_distance.
+        '''
+        mz = np.atleast_1d(np.asarray(mz, dtype='float64'))
+        dt = np.atleast_1d(np.asarray(dt, dtype='float64'))
+        mz_scale = mz_scale or self.mz_cell
+        dt_scale = dt_scale or self.dt_cell
+        best = np.full(len(mz), np.inf)
+        best_ion = np.full(len(mz), -1, dtype='int64')
+        if not len(self):
+            return best_ion, best
+
+        # Search boxes of radius 0, 1, 2, 4 ... cells around each point. Any ion
+        # outside a box of radius r is at least r cells away, so a point is
+        # settled once its best distance is within that.
+        cell = min(self.mz_cell / mz_scale, self.dt_cell / dt_scale)
+        pending, radius = np.arange(len(mz)), 0
+        while len(pending):
+            rows, cols = self.cell_rows(mz[pending]), self.cell_cols(dt[pending])
+            box, ion = self.query_boxes(self.mz0 + (rows - radius) * self.mz_cell,
+                                        self.mz0 + (rows + radius + 1) * self.mz_cell,
+                                        self.dt0 + (cols - radius) * self.dt_cell,
+                                        self.dt0 + (cols + radius + 1) * self.dt_cell)
+            distance = np.hypot((self.mz[ion] - mz[pending][box]) / mz_scale,
+                                (self.dt[ion] - dt[pending][box]) / dt_scale)
+            if len(box):
+                ranked = np.lexsort((distance, box))
+                first = ranked[np.r_[True, box[ranked][1:] != box[ranked][:-1]]]
+                closer = distance[first] < best[pending[box[first]]]
+                best[pending[box[first][closer]]] = distance[first][closer]
+                best_ion[pending[box[first][closer]]] = ion[first][closer]
+            covers_all = ((rows - radius <= 0) & (rows + radius >= self.n_mz - 1) &
+                          (cols - radius <= 0) & (cols + radius >= self.n_dt - 1))
+            settled = (best[pending] <= radius * cell) | (radius * cell >= max_distance) | covers_all
+            pending = pending[~settled]
+            radius = max(1, radius * 2)
+
+        too_far = best > max_distance
+        best_ion[too_far], best[too_far] = -1, np.inf
+        return best_ion, best
@@ -0,0 +1,108 @@
+'''
+staging.py
+Python Version: 3.9
+Purpose: Keeps Apex3D off the network during extraction and keeps
+half-written CSVs out of the output folder.
+
+- Stager copies each .raw to fast local scratch, prefetching the next
+  jobs while the current ones extract, so Apex3D reads local disk
+  instead of paths like D:\\2-SAMM\\... on a share.
+- publish() moves a finished CSV into the output folder with an atomic
+  rename, so readers (e.g. SAMMmonitor) only ever see complete files.
+'''
+
+import errno
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import Future
+from pathlib import Path
+
+
+def publish(src, dest):
+    '''
+    Moves src to dest atomically. Across file systems (scratch -> share)
+    the file is first copied to a hidden temporary name beside dest; any
+    other error (permissions, missing folder, full disk) is raised.
+    '''
+    dest = Path(dest)
+    try:
+        os.replace(src, dest)
+        return dest
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    tmp = dest.with_name(f'.{dest.name}.{uuid.uuid4().hex[:8]}.part')
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    os.remove(src)
+    return dest
+
+
+def copy_raw(raw_path, scratch_dir):
+    ''' Copies a .raw directory into scratch_dir (via a temporary name) and returns the copy. '''
+    raw_path = Path(raw_path)
+    dest = Path(scratch_dir) / raw_path.name
+    if dest.exists():
+        shutil.rmtree(dest)
+    tmp = Path(scratch_dir) / f'.{raw_path.name}.{uuid.uuid4().hex[:8]}.part'
+    shutil.copytree(raw_path, tmp)
+    os.replace(tmp, dest)
+    return dest
+
+
+class Stager:
+    '''
+    Copies .raw directories to scratch in dispatch order on a background
+    thread, keeping at most `lookahead` local copies at a time (copies in
+    use by workers plus ones prefetched for the next jobs).
+
+    Usage:
+        stager = Stager(raw_paths, r'C:\\scratch', lookahead=workers + 1)
+        local = stager.get(raw)     # waits for the copy
+        ...                         # run Apex3D on local
+        stager.release(raw)         # deletes the copy, frees a slot
+        stager.close()
+    '''
+
+    def __init__(self, raw_paths, scratch_dir, lookahead=2):
+        self.scratch_dir = Path(scratch_dir)
+        self.scratch_dir.mkdir(parents=True, exist_ok=True)
+        self.order = [Path(p) for p in raw_paths]
+        self.ready = {str(p): Future() for p in self.order}
+        self.slots = threading.Semaphore(max(1, lookahead))
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.copy_all, daemon=True)
+        self.thread.start()
+
+    def copy_all(self):
+        for raw in self.order:
+            self.slots.acquire()
+            if self.closed.is_set():
+                break
+            future = self.ready[str(raw)]
+            try:
+                future.set_result(copy_raw(raw, self.scratch_dir))
+            except Exception as e:
+                future.set_exception(e)
+
+    def get(self, raw_path):
+        ''' Local copy of raw_path, waiting for the copy to finish. '''
+        return self.ready[str(Path(raw_path))].result()
+
+    def release(self, raw_path):
+        ''' Deletes the local copy of raw_path and lets the next prefetch start. '''
+        future = self.ready[str(Path(raw_path))]
+        if future.done() and future.exception() is None:
+            shutil.rmtree(future.result(), ignore_errors=True)
+        self.slots.release()
+
+    def close(self):
+        self.closed.set()
+        self.slots.release()
+        self.thread.join()
@@ -0,0 +1,111 @@
+'''
+stream.py
+Python Version: 3.9
+Purpose: Reads oversized Apex3D and TWIMExtract CSVs in fixed-size typed
+chunks, so screening and binning run in bounded memory whatever the file
+size (ex: Apex3D-highdatadensity.py output).
+
+Chunks are NumPy record arrays with the Apex3D column names (m_z,
+mobility, area, ...) or, for TWIMExtract, two named columns. Range filters
+are applied inside the reader, so callers only see matching rows:
+
+    >>> from samm import stream
+    >>> for ions in stream.iter_apex3d_chunks(csv_path, mz=(780, 1100), columns=['m_z', 'mobility', 'area']):
+    ...     print(len(ions), ions['area'].sum())
+'''
+
+import numpy as np
+import pandas as pd
+
+from samm import iontable
+
+CHUNK_ROWS = 100000
+
+# Column names for the two-column TWIMExtract exports, by file name prefix
+TWIM_COLUMNS = {
+    'MZ': ('m_z', 'counts'),
+    'DT': ('drift_time', 'intensity'),
+}
+
+
+def iter_csv_chunks(csv_path, chunk_rows=CHUNK_ROWS, ranges=None, **read_kwargs):
+    '''
+    Yields filtered chunks of a CSV as record arrays (empty chunks are skipped).
+
+    Args:
+        csv_path (str): CSV file.
+        chunk_rows (int): rows parsed per chunk (bounds memory use).
+        ranges (dict): {column: (low, high)} inclusive filters.
+        **read_kwargs: passed to pd.read_csv (usecols, dtype, names, ...).
+    '''
+    with pd.read_csv(csv_path, chunksize=chunk_rows, engine='c', **read_kwargs) as reader:
+        for chunk in reader:
+            if ranges:
+                chunk = chunk[iontable.range_mask(chunk, ranges)]
+            if len(chunk):
+                yield chunk.to_records(index=False)
+
+
+def iter_apex3d_chunks(csv_path, chunk_rows=CHUNK_ROWS, columns=None, mz=None, dt=None, area=None):
+    '''
+    Streams an Apex3D ion table in typed chunks.
+
+    Args:
+        csv_path (str): Apex3D _Apex3DIons.csv.
+        chunk_rows (int): rows parsed per chunk.
+        columns (list): Apex3D columns to return (default: all).
+        mz, dt, area (tuple): inclusive (low, high) ranges on m_z,
+            mobility and area.
+
+    Yields:
+        np.recarray: matching ions, at most chunk_rows per chunk.
+    '''
+    ranges = {col: r for col, r in (('m_z', mz), ('mobility', dt), ('area', area)) if r is not None}
+    usecols = None if columns is None else list(dict.fromkeys(list(columns) + list(ranges)))
+    for chunk in iter_csv_chunks(csv_path, chunk_rows, ranges, usecols=usecols,
+                                 dtype=iontable.APEX_DTYPES):
+        yield chunk if columns is None else chunk[list(columns)]
+
+
+def iter_twim_chunks(csv_path, chunk_rows=CHUNK_ROWS, names=None, x_range=None):
+    '''
+    Streams a two-column TWIMExtract export (MZ_... or DT_..._raw.csv).
+
+    Args:
+        csv_path (str): TWIMExtract CSV; its first line (range/rule file)
+            and header row are skipped.
+        names (tuple): names of the two columns (default: from the file
+            name prefix, see TWIM_COLUMNS).
+        x_range (tuple): inclusive (low, high) range on the first column.
+
+    Yields:
+        np.recarray: float64 x values and float32 y values.
+    '''
+    if names is None:
+        prefix = str(csv_path).replace('\\', '/').rsplit('/', 1)[-1][:2].upper()
+        names = TWIM_COLUMNS.get(prefix, ('x', 'y'))
+    x, y = names
+    ranges = {x: x_range} if x_range is not None else None
+    yield from iter_csv_chunks(csv_path, chunk_rows, ranges, skiprows=2, header=None,
+                               usecols=[0, 1], names=[x, y],
+                               dtype={x: 'float64', y: 'float32'})
+
+
+def bin_ions(chunks, mz_edges, dt_edges, weight='area'):
+    '''
+    Accumulates a 2D m/z x drift time histogram over streamed chunks.
+
+    Args:
+        chunks (iterable): record arrays from iter_apex3d_chunks.
+        mz_edges, dt_edges (array): bin edges.
+        weight (str): column summed per bin (None to count ions).
+
+    Returns:
+        np.ndarray: (len(mz_edges) - 1, len(dt_edges) - 1) float64 totals.
+    '''
+    total = np.zeros((len(mz_edges) - 1, len(dt_edges) - 1))
+    for ions in chunks:
+        counts, _, _ = np.histogram2d(ions['m_z'], ions['mobility'], bins=(mz_edges, dt_edges),
+                                      weights=None if weight is None else ions[weight])
+        total += counts
+    return total
@@ -0,0 +1,87 @@
+'''
+supervisor.py
+Python Version: 3.9
+Purpose: Keeps long Apex3D batches running unattended. Failed or hung
+extractions (killed after a timeout) are retried with exponential backoff,
+and every job's state is persisted so an interrupted batch resumes from the
+first unfinished .raw instead of starting over.
+
+Job state: <output folder>/apex3d-jobs.json
+    {raw path: {'status', 'attempts', 'returncode', 'updated'}}
+'''
+
+import json
+import os
+import threading
+import time
+
+STATE_NAME = 'apex3d-jobs.json'
+
+
+class JobState:
+    '''
+    Per-.raw job status persisted to a JSON file after every change.
+    Safe to update from several worker threads.
+    '''
+
+    def __init__(self, state_path):
+        self.state_path = str(state_path)
+        self.lock = threading.Lock()
+        self.jobs = {}
+        if os.path.isfile(self.state_path):
+            with open(self.state_path) as f:
+                self.jobs = json.load(f)
+
+    def get(self, raw_path):
+        return self.jobs.get(str(raw_path), {})
+
+    def update(self, raw_path, **fields):
+        ''' Merges fields into the job's state and saves the file atomically. '''
+        with self.lock:
+            entry = self.jobs.setdefault(str(raw_path), {})
+            entry.update(fields, updated=time.strftime('%Y-%m-%d %H:%M:%S'))
+            tmp = f'{self.state_path}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.jobs, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.state_path)
+
+    def interrupted(self):
+        ''' Raw paths left 'running' by a batch that did not finish. '''
+        return [raw for raw, entry in self.jobs.items() if entry.get('status') == 'running']
+
+
+def backoff_delay(attempt, backoff):
+    ''' Seconds to wait after a failed attempt (1-based): backoff, 2*backoff, 4*backoff... '''
+    return backoff * 2 ** (attempt - 1)
+
+
+def run_with_retries(run, job, retries=0, backoff=30, state=None, sleep=time.sleep):
+    '''
+    Calls run(job) until the job succeeds or retries are exhausted.
+
+    Args:
+        run (callable): runs one attempt, setting job.status to 'done',
+            'failed' or 'timeout'.
+        job (ApexJob): job to run; job.attempts is updated.
+        retries (int): extra attempts after the first failure.
+        backoff (float): base delay in seconds between attempts (doubled each time).
+        state (JobState): persisted job state to update, if any.
+
+    Returns:
+        ApexJob: the job after its final attempt.
+    '''
+    for attempt in range(1, retries + 2):
+        job.attempts = attempt
+        if state is not None:
+            state.update(job.raw_path, status='running', attempts=attempt)
+        run(job)
+        if state is not None:
+            state.update(job.raw_path, status=job.status, attempts=attempt,
+                         returncode=job.returncode, error=job.error)
+        if job.status == 'done' or attempt > retries:
+            break
+        delay = backoff_delay(attempt, backoff)
+        print(f'{job.raw_path.name}: {job.status} (attempt {attempt}/{retries + 1}), '
+              f'retrying in {delay:.0f} s')
+        sleep(delay)
+    return job
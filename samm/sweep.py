@@ -0,0 +1,218 @@
+r'''
+sweep.py
+Python Version: 3.9
+Purpose: Runs Apex3D over a grid of peak thresholds and lock masses, so
+thresholds can be chosen from ion counts and areas instead of by
+hand-editing the Apex3D command and re-running everything.
+
+Every setting extracts into its own folder named by a hash of its
+parameters, with the setting's parameters in sweep-params.json:
+
+    <sweep folder>\<parameter hash>\<acquisition>_Apex3DIons.csv
+
+Each setting folder keeps its own manifest, so settings (and
+acquisitions) already extracted by an earlier sweep are never re-run.
+All (setting, acquisition) jobs share one pool of Apex3D workers,
+longest first. sweep-summary.csv lists ions and total area for each
+setting and acquisition.
+
+Usage:
+    python -m samm.sweep "D:\2-SAMM\Data\EJ3-60\Raw Data" --le 5 10 20 --he 5 10 20 --workers 4
+'''
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from samm import iontable, manifest, runlog, schedule, supervisor
+from samm.extract import (BACKENDS, HE_THRESHOLD, LE_THRESHOLD, LOCK_MASS, ApexJob,
+                          apex_output_csv, apex_params, check_apex, find_raw_dirs,
+                          print_status, run_job)
+
+SWEEP_FOLDER = 'apex3d-sweep'
+PARAMS_NAME = 'sweep-params.json'
+SUMMARY_NAME = 'sweep-summary.csv'
+
+
+def sweep_grid(le_thresholds=(LE_THRESHOLD,), he_thresholds=(HE_THRESHOLD,),
+               lock_masses=(LOCK_MASS,)):
+    '''
+    Every combination of the given settings.
+
+    Returns:
+        list: dicts of apex_command keyword arguments
+            ({'le_threshold', 'he_threshold', 'lock_mass'}).
+    '''
+    return [{'le_threshold': le, 'he_threshold': he, 'lock_mass': lm}
+            for le, he, lm in itertools.product(le_thresholds, he_thresholds, lock_masses)]
+
+
+def param_key(setting):
+    '''
+    Short hash of a setting's Apex3D parameters; 10 and 10.0 hash the same.
+    Ex: {'le_threshold': 10, 'he_threshold': 10, 'lock_mass': 556.2771} -> '3f0c2a9b1e'
+    '''
+    params = manifest.normalise_params(apex_params(**setting))
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:10]
+
+
+def setting_dir(sweep_dir, setting):
+    ''' Output folder for one setting, created with its sweep-params.json. '''
+    path = Path(sweep_dir) / param_key(setting)
+    path.mkdir(parents=True, exist_ok=True)
+    params_path = path / PARAMS_NAME
+    if not params_path.is_file():
+        with open(params_path, 'w') as f:
+            json.dump(apex_params(**setting), f, indent=1, sort_keys=True)
+    return path
+
+
+def run_sweep(raw_paths, sweep_dir, grid, workers=None, on_status=print_status,
+              timeout=None, retries=0, backoff=30, **apex_kwargs):
+    '''
+    Extracts every .raw with every setting in grid, skipping pairs already
+    extracted with the same .raw content and parameters.
+
+    Args:
+        raw_paths (list): Waters .raw directories.
+        sweep_dir (str): folder receiving one sub-folder per setting.
+        grid (list): settings from sweep_grid.
+        workers (int): concurrent Apex3D processes (default: os.cpu_count()).
+        on_status, timeout, retries, backoff: as extract.extract_all.
+        **apex_kwargs: passed to run_job (apex_path, columnar).
+
+    Returns:
+        tuple: (jobs run as (setting, ApexJob) pairs, number of pairs skipped)
+    '''
+    fingerprints = {str(Path(raw)): manifest.raw_fingerprint(raw) for raw in raw_paths}
+    todo, skipped, books = [], 0, {}
+    for setting in grid:
+        out = setting_dir(sweep_dir, setting)
+        params = apex_params(**setting)
+        entries = manifest.load_manifest(out / manifest.MANIFEST_NAME)
+        books[str(out)] = (entries, threading.Lock(),
+                           supervisor.JobState(out / supervisor.STATE_NAME))
+        costs = schedule.estimate_costs(
+            {raw: fingerprints[str(Path(raw))]['size'] for raw in raw_paths},
+            runlog.load_run_history(out / runlog.HISTORY_NAME))
+        for raw in raw_paths:
+            if manifest.is_current(entries.get(str(Path(raw))), fingerprints[str(Path(raw))], params):
+                skipped += 1
+            else:
+                todo.append((costs[raw], setting, out, Path(raw)))
+    todo.sort(key=lambda t: -t[0])
+    print(f'{len(grid)} settings x {len(raw_paths)} acquisitions: '
+          f'{len(todo)} to extract, {skipped} already extracted')
+
+    workers = workers or os.cpu_count() or 1
+    finished = [0]
+    lock = threading.Lock()
+
+    def work(item):
+        _, setting, out, raw = item
+        job = ApexJob(raw)
+        entries, book_lock, state = books[str(out)]
+        supervisor.run_with_retries(
+            lambda j: run_job(j, out, timeout=timeout, **setting, **apex_kwargs),
+            job, retries=retries, backoff=backoff, state=state)
+        output_csv = apex_output_csv(raw, out)
+        if job.status == 'done' and output_csv.is_file():
+            with book_lock:
+                manifest.record(entries, raw, fingerprints[str(raw)],
+                                apex_params(**setting), output_csv)
+                manifest.save_manifest(entries, out / manifest.MANIFEST_NAME)
+        if on_status is not None:
+            with lock:
+                finished[0] += 1
+                on_status(job, finished[0], len(todo))
+        return setting, job
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = list(pool.map(work, todo))
+    return jobs, skipped
+
+
+def summarize_sweep(raw_paths, sweep_dir, grid):
+    '''
+    Ion count and total area of every (setting, acquisition) output.
+
+    Returns:
+        pd.DataFrame: one row per setting and acquisition with columns
+            key, le_threshold, he_threshold, lock_mass, acquisition, ions,
+            total_area (NaN where extraction failed).
+    '''
+    rows = []
+    for setting in grid:
+        out = Path(sweep_dir) / param_key(setting)
+        for raw in raw_paths:
+            csv_path = apex_output_csv(raw, out)
+            ions = total_area = float('nan')
+            if csv_path.is_file():
+                area = iontable.read_ions(csv_path, columns=['area'])['area']
+                ions, total_area = len(area), float(area.to_numpy().sum(dtype='float64'))
+            rows.append(dict(key=param_key(setting), **setting,
+                             acquisition=Path(raw).stem, ions=ions, total_area=total_area))
+    return pd.DataFrame(rows)
+
+
+def print_summary(summary):
+    ''' Prints totals per setting, most ions first. '''
+    per_setting = (summary.groupby(['le_threshold', 'he_threshold', 'lock_mass', 'key'])
+                   [['ions', 'total_area']].sum(min_count=1)
+                   .sort_values('ions', ascending=False))
+    print('\n---===--- Apex3D parameter sweep ---===---')
+    print(per_setting.to_string())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Extract .raw files with a grid of Apex3D thresholds and lock masses.')
+    parser.add_argument('data_dir', help='folder containing Waters .raw directories')
+    parser.add_argument('sweep_dir', nargs='?',
+                        help=f'sweep output folder (default: <data_dir>/{SWEEP_FOLDER})')
+    parser.add_argument('--le', type=int, nargs='+', default=[LE_THRESHOLD],
+                        help='low-energy threshold counts to try')
+    parser.add_argument('--he', type=int, nargs='+', default=[HE_THRESHOLD],
+                        help='high-energy threshold counts to try')
+    parser.add_argument('--lock-mass', type=float, nargs='+', default=[LOCK_MASS])
+    parser.add_argument('--workers', type=int, default=None,
+                        help='concurrent Apex3D processes (default: one per CPU core)')
+    parser.add_argument('--apex', default=None, help='path to Apex3D64.exe (default: DriftScope install)')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='apex3d')
+    parser.add_argument('--timeout', type=float, default=None)
+    parser.add_argument('--retries', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.data_dir):
+        sys.exit(f'ERROR: Data path cannot be found: {args.data_dir}')
+    apex_path = args.apex or BACKENDS[args.backend]
+    try:
+        if args.apex or args.backend == 'apex3d':
+            check_apex(apex_path, log_path=None)
+    except FileNotFoundError as e:
+        sys.exit(f'ERROR: {e}')
+    sweep_dir = args.sweep_dir or os.path.join(args.data_dir, SWEEP_FOLDER)
+    raw_paths = find_raw_dirs(args.data_dir)
+    grid = sweep_grid(args.le, args.he, args.lock_mass)
+
+    start = time.time()
+    jobs, _ = run_sweep(raw_paths, sweep_dir, grid, workers=args.workers,
+                        timeout=args.timeout, retries=args.retries, apex_path=apex_path)
+    print(f'Sweep wall time {time.time() - start:.1f} s')
+    summary = summarize_sweep(raw_paths, sweep_dir, grid)
+    summary.to_csv(Path(sweep_dir) / SUMMARY_NAME, index=False)
+    print_summary(summary)
+    return 1 if any(job.status != 'done' for _, job in jobs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+r'''
+twim.py
+Python Version: 3.9
+Purpose: Loads the TWIMExtract 2D spectra (FR, Z1, Z2 x m/z, drift time)
+of many experiments at once. Files are read concurrently by a thread pool,
+since reading from the network share is I/O bound, and returned as a
+single tidy table.
+
+    >>> from samm import twim
+    >>> spectra = twim.load_2d_batch(r'D:\2-SAMM\...\2DExtract(3-57-2)', ['57-158-BC4', '57-26-RA4'])
+    >>> spectra.loc[('EJ3-57-158-BC4-Sampling-2', 'Z1', 'DT')]     # drift time spectrum, x and y
+'''
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from samm.cache import cached_load
+from samm.catalog import SELECTIONS, open_catalog
+
+DIMENSIONS = ('MS', 'DT')
+INDEX_NAMES = ['experiment', 'selection', 'dimension', 'point']
+
+
+def read_twim_file(path, cache=True):
+    '''
+    One TWIMExtract export as a two-column frame: x (m/z or drift time)
+    and y (counts or intensity). The range/rule file line and header row
+    are skipped.
+    '''
+    def load():
+        return pd.read_csv(path, skiprows=2, header=None, usecols=[0, 1], names=['x', 'y'],
+                           dtype={'x': 'float64', 'y': 'float32'}, engine='c')
+    return cached_load(path, 'twim_file', load) if cache else load()
+
+
+def load_2d_batch(root, keys, selections=SELECTIONS, dimensions=DIMENSIONS, workers=8,
+                  cache=True, replicate=2):
+    '''
+    Loads the 2D spectra of many experiments with a pool of reader threads.
+
+    Args:
+        root (str): TWIMExtract data root, indexed with catalog.py.
+        keys (list): experiment IDs or short IDs (ex: '57-158-BC4').
+        selections (tuple): selections to load (default: FR, Z1, Z2).
+        dimensions (tuple): 'MS' and/or 'DT'.
+        workers (int): concurrent file reads.
+        cache (bool): use the shared parse cache (see cache.py).
+        replicate (int): sampling replicate of short IDs (default: 2, as
+            catalog.import_samm2d).
+
+    Returns:
+        pd.DataFrame: columns x, y indexed by (experiment, selection,
+            dimension, point). Files missing from the catalog (including
+            every file of a key the catalog cannot resolve) are left out
+            and listed in the frame's attrs['missing'].
+    '''
+    cat = open_catalog(root)
+    wanted, missing = [], []
+    for key in keys:
+        try:
+            experiment = cat.resolve(key, replicate)
+        except KeyError as e:
+            print(e.args[0])
+            missing.extend((key, s, d) for s in selections for d in dimensions)
+            continue
+        entry = cat.experiments[experiment]
+        for selection in selections:
+            for dimension in dimensions:
+                path = entry['files'].get(f'{selection}-{dimension}')
+                if path is None:
+                    missing.append((experiment, selection, dimension))
+                else:
+                    wanted.append(((experiment, selection, dimension), path))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(wanted) or 1))) as pool:
+        frames = list(pool.map(lambda item: read_twim_file(item[1], cache), wanted))
+
+    # Assemble the index from codes; pd.concat(keys=...) on thousands of
+    # small frames costs more than reading them
+    lengths = np.array([len(f) for f in frames], dtype='int64')
+    experiments = list(dict.fromkeys(k[0] for k, _ in wanted))
+    level_values = [experiments, list(selections), list(dimensions)]
+    positions = [{value: i for i, value in enumerate(level)} for level in level_values]
+    codes = [np.repeat([pos[k[i]] for k, _ in wanted], lengths).astype('int32')
+             for i, pos in enumerate(positions)]
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    point = np.arange(lengths.sum(), dtype='int64') - starts
+    index = pd.MultiIndex(levels=level_values + [np.arange(lengths.max(initial=0))],
+                          codes=codes + [point], names=INDEX_NAMES, verify_integrity=False)
+    spectra = pd.DataFrame({
+        'x': np.concatenate([f['x'].to_numpy() for f in frames] or [np.empty(0, 'float64')]),
+        'y': np.concatenate([f['y'].to_numpy() for f in frames] or [np.empty(0, 'float32')]),
+    }, index=index)
+    spectra.attrs['missing'] = missing
+    if missing:
+        print(f'{len(missing)} 2D files not found under {os.path.basename(str(root))}')
+    return spectra
@@ -0,0 +1,171 @@
+'''
+watch.py
+Python Version: 3.9
+Purpose: Watches an acquisition folder and extracts each new Waters .raw
+directory with Apex3D as soon as the instrument has finished writing it.
+
+A .raw counts as finished once its fingerprint (file count, size, newest
+mtime) is unchanged between two polls and nothing in it has been written
+for `quiet_seconds`. Finished acquisitions are queued into the extraction
+pool and recorded in the output folder's manifest, so restarting the
+watcher never re-extracts completed files. Acquisitions whose extraction
+failed after all retries are recorded in the job state (apex3d-jobs.json)
+with their fingerprint and are not resubmitted until the .raw changes.
+
+Usage: python -m samm.watch "D:\\2-SAMM\\Data\\EJ3-60\\Raw Data" --quiet 120
+'''
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from samm import manifest, supervisor
+from samm.extract import (BACKENDS, HE_THRESHOLD, LE_THRESHOLD, LOCK_MASS, ApexJob,
+                          apex_output_csv, apex_params, check_apex, find_raw_dirs,
+                          print_status, run_job)
+
+
+def is_quiescent(fingerprint, previous, quiet_seconds, now=None):
+    '''
+    True if a .raw has not changed since the previous poll and its newest
+    file is at least quiet_seconds old. A .raw with no data yet (just
+    created by the instrument) is never quiescent.
+    '''
+    now = time.time() if now is None else now
+    if not fingerprint['files'] or not fingerprint['size']:
+        return False
+    return fingerprint == previous and now - fingerprint['mtime'] >= quiet_seconds
+
+
+def gave_up(entry, fingerprint):
+    ''' True if the job state shows this exact .raw content already failed its final attempt. '''
+    return entry.get('status') in ('failed', 'timeout') and entry.get('fingerprint') == fingerprint
+
+
+def watch(data_dir, output_dir, quiet_seconds=60, poll_interval=10, workers=None,
+          on_status=print_status, max_polls=None, timeout=None, retries=0, backoff=30,
+          **apex_kwargs):
+    '''
+    Polls data_dir and extracts finished acquisitions into output_dir until
+    interrupted (Ctrl+C) or max_polls polls have run.
+
+    Args:
+        data_dir (str): folder the instrument writes .raw directories to.
+        output_dir (str): folder receiving the Apex3D CSV output and manifest.
+        quiet_seconds (float): time without writes before a .raw is extracted.
+        poll_interval (float): seconds between folder scans.
+        workers (int): concurrent Apex3D processes (default: os.cpu_count()).
+        on_status (callable): as extract_all; n_total is the number queued so far.
+        max_polls (int): stop after this many polls (default: run forever).
+        timeout (float): seconds before a hung Apex3D process is killed.
+        retries (int): extra attempts for failed or timed-out jobs.
+        backoff (float): base delay between attempts, doubled each retry.
+        **apex_kwargs: passed to apex_command (thresholds, lock mass, apex_path).
+
+    Returns:
+        list: ApexJob for every extraction started.
+    '''
+    os.makedirs(output_dir, exist_ok=True)
+    params = apex_params(**apex_kwargs)
+    manifest_path = Path(output_dir) / manifest.MANIFEST_NAME
+    entries = manifest.load_manifest(manifest_path)
+    state = supervisor.JobState(Path(output_dir) / supervisor.STATE_NAME)
+    seen, in_flight, jobs = {}, {}, []
+
+    def extract(job):
+        return supervisor.run_with_retries(
+            lambda j: run_job(j, output_dir, timeout=timeout, **apex_kwargs),
+            job, retries=retries, backoff=backoff, state=state)
+
+    def collect():
+        # record finished extractions in the manifest (main thread only)
+        for raw_path, (future, fingerprint) in list(in_flight.items()):
+            if not future.done():
+                continue
+            job = future.result()
+            del in_flight[raw_path]
+            output_csv = apex_output_csv(raw_path, output_dir)
+            if job.status == 'done' and output_csv.is_file():
+                manifest.record(entries, raw_path, fingerprint, params, output_csv)
+                manifest.save_manifest(entries, manifest_path)
+            else:
+                # not resubmitted until the .raw changes (see gave_up)
+                state.update(raw_path, status='failed' if job.status == 'done' else job.status,
+                             fingerprint=fingerprint)
+            if on_status is not None:
+                on_status(job, len(jobs) - len(in_flight), len(jobs))
+
+    print(f'Watching {data_dir} (quiet period {quiet_seconds} s). Ctrl+C to stop.')
+    polls = 0
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        try:
+            while max_polls is None or polls < max_polls:
+                for raw_path in find_raw_dirs(data_dir):
+                    key = str(raw_path)
+                    if key in in_flight:
+                        continue
+                    fingerprint = manifest.raw_fingerprint(raw_path)
+                    if (not manifest.is_current(entries.get(key), fingerprint, params)
+                            and not gave_up(state.get(key), fingerprint)
+                            and is_quiescent(fingerprint, seen.get(key), quiet_seconds)):
+                        job = ApexJob(raw_path)
+                        jobs.append(job)
+                        future = pool.submit(extract, job)
+                        in_flight[key] = (future, fingerprint)
+                        if on_status is not None:
+                            on_status(job, len(jobs) - len(in_flight), len(jobs))
+                    seen[key] = fingerprint
+                collect()
+                polls += 1
+                if max_polls is None or polls < max_polls:
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            print('Stopping watcher; waiting for running extractions to finish...')
+    collect()
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract .raw acquisitions with Apex3D as they finish.')
+    parser.add_argument('data_dir', help='folder the instrument writes .raw directories to')
+    parser.add_argument('output_dir', nargs='?',
+                        help='Apex3D CSV output folder (default: <data_dir>/3D-data-extraction)')
+    parser.add_argument('--quiet', type=float, default=60, help='seconds without writes before extraction')
+    parser.add_argument('--poll', type=float, default=10, help='seconds between folder scans')
+    parser.add_argument('--workers', type=int, default=None, help='concurrent Apex3D processes')
+    parser.add_argument('--le-threshold', type=int, default=LE_THRESHOLD)
+    parser.add_argument('--he-threshold', type=int, default=HE_THRESHOLD)
+    parser.add_argument('--lock-mass', type=float, default=LOCK_MASS)
+    parser.add_argument('--apex', default=None, help='path to Apex3D64.exe (default: DriftScope install)')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='apex3d',
+                        help="extractor to run; 'fake' is a local Apex3D stand-in")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help='seconds before a hung Apex3D process is killed')
+    parser.add_argument('--retries', type=int, default=0,
+                        help='extra attempts for failed or timed-out extractions')
+    parser.add_argument('--backoff', type=float, default=30,
+                        help='seconds before the first retry (doubled each retry)')
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.data_dir):
+        sys.exit(f'ERROR: Data path cannot be found: {args.data_dir}')
+    apex_path = args.apex or BACKENDS[args.backend]
+    try:
+        if args.apex or args.backend == 'apex3d':
+            check_apex(apex_path, log_path=None)
+    except FileNotFoundError as e:
+        sys.exit(f'ERROR: {e}')
+    output_dir = args.output_dir or os.path.join(args.data_dir, '3D-data-extraction')
+    jobs = watch(args.data_dir, output_dir, quiet_seconds=args.quiet,
+                 poll_interval=args.poll, workers=args.workers, apex_path=apex_path,
+                 timeout=args.timeout, retries=args.retries, backoff=args.backoff,
+                 le_threshold=args.le_threshold, he_threshold=args.he_threshold,
+                 lock_mass=args.lock_mass)
+    return 1 if any(job.status != 'done' for job in jobs) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
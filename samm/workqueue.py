@@ -0,0 +1,451 @@
+r'''
+workqueue.py
+Python Version: 3.9
+Purpose: Distributes Apex3D extractions over several acquisition PCs through
+a queue folder on a shared drive. Any number of workers (one per PC, or
+several processes on one PC) pull .raw jobs, extract them and publish the
+CSV into the output folder.
+
+Queue folder layout:
+    jobs/<id>.json        job to run (raw path, output folder, Apex3D parameters)
+    claims/<id>.claim     created exclusively (O_EXCL) by the worker that owns the job
+    claims/<id>.<owner>-<time>.break  created exclusively by the one worker
+                          allowed to break that particular stale claim
+    heartbeats/<worker>   touched every few seconds while a worker is alive
+    done/<id>.json        run record of a finished job
+    failed/<id>.json      run record of a job that failed all its attempts
+
+A claim whose worker has not sent a heartbeat for `claim_ttl` seconds is
+expired and the job becomes available again. A worker that cannot write
+its heartbeat stops claiming new jobs until it can. Outputs are written to
+a private folder first and renamed into place (see extract.run_job), so
+readers never see a half-written CSV, and finished jobs are recorded in
+the output folder's manifest (under a lock file), so a later
+extract_directory run skips them. Re-enqueuing a failed job queues it again.
+Paths in jobs must be valid on every node (UNC paths,
+or the same drive mapping everywhere).
+
+Usage:
+    python -m samm.workqueue enqueue \\server\SAMM\queue "\\server\SAMM\Raw Data"
+    python -m samm.workqueue work \\server\SAMM\queue --workers 2
+    python -m samm.workqueue status \\server\SAMM\queue
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from samm import extract, manifest, staging, supervisor
+
+FOLDERS = ('jobs', 'claims', 'heartbeats', 'done', 'failed')
+
+# A lock file older than this is assumed left by a crashed worker
+LOCK_STALE_SECONDS = 120
+
+
+def job_id(raw_path):
+    ''' Stable queue id for a .raw path, ex: EJ3-57-158-BC4-Sampling-2-1a2b3c4d '''
+    digest = hashlib.sha1(str(raw_path).encode()).hexdigest()[:8]
+    return f'{Path(raw_path).stem}-{digest}'
+
+
+def write_json_atomic(path, data):
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def file_lock(lock_path, poll=0.2, stale_after=LOCK_STALE_SECONDS):
+    '''
+    Holds an exclusive lock file (created with O_EXCL) for the duration of
+    the block; waits while another process holds it.
+    '''
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            time.sleep(poll)
+    try:
+        os.write(fd, f'{socket.gethostname()}-{os.getpid()}'.encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def record_output(raw_path, output_dir, fingerprint, params):
+    ''' Adds a finished extraction to the output folder's manifest, serialised across workers. '''
+    manifest_path = Path(output_dir) / manifest.MANIFEST_NAME
+    with file_lock(f'{manifest_path}.lock'):
+        entries = manifest.load_manifest(manifest_path)
+        manifest.record(entries, raw_path, fingerprint, params,
+                        extract.apex_output_csv(raw_path, output_dir))
+        manifest.save_manifest(entries, manifest_path)
+
+
+def init_queue(queue_dir):
+    for folder in FOLDERS:
+        os.makedirs(os.path.join(queue_dir, folder), exist_ok=True)
+
+
+def enqueue(queue_dir, raw_paths, output_dir, **apex_params):
+    '''
+    Adds .raw jobs to the queue. Jobs already queued or finished are left
+    alone; jobs that failed are queued again (their failed record is removed).
+
+    Args:
+        queue_dir (str): shared queue folder.
+        raw_paths (list): Waters .raw directories (paths valid on every node).
+        output_dir (str): shared folder receiving the Apex3D CSV output.
+        **apex_params: le_threshold, he_threshold, lock_mass.
+
+    Returns:
+        list: ids of newly queued (or re-queued) jobs.
+    '''
+    init_queue(queue_dir)
+    added = []
+    for raw_path in raw_paths:
+        jid = job_id(raw_path)
+        failed = os.path.join(queue_dir, 'failed', f'{jid}.json')
+        if os.path.exists(os.path.join(queue_dir, 'done', f'{jid}.json')):
+            continue
+        if os.path.exists(os.path.join(queue_dir, 'jobs', f'{jid}.json')) and not os.path.exists(failed):
+            continue
+        try:
+            os.remove(failed)  # next_job skips jobs with a failed record
+        except FileNotFoundError:
+            pass
+        write_json_atomic(os.path.join(queue_dir, 'jobs', f'{jid}.json'), {
+            'id': jid, 'raw_path': str(raw_path), 'output_dir': str(output_dir),
+            'params': apex_params, 'queued': time.time(),
+        })
+        added.append(jid)
+    return added
+
+
+def queue_status(queue_dir):
+    ''' Counts of queued, claimed, done and failed jobs, and live workers. '''
+    def count(folder, suffix):
+        path = os.path.join(queue_dir, folder)
+        return sum(name.endswith(suffix) for name in os.listdir(path)) if os.path.isdir(path) else 0
+    return {'queued': count('jobs', '.json'), 'claimed': count('claims', '.claim'),
+            'done': count('done', '.json'), 'failed': count('failed', '.json'),
+            'workers': len(live_workers(queue_dir))}
+
+
+def live_workers(queue_dir, claim_ttl=60):
+    ''' Worker ids with a heartbeat newer than claim_ttl seconds. '''
+    folder = os.path.join(queue_dir, 'heartbeats')
+    if not os.path.isdir(folder):
+        return []
+    now = time.time()
+    return [name for name in os.listdir(folder)
+            if now - os.path.getmtime(os.path.join(folder, name)) < claim_ttl]
+
+
+class Worker:
+    '''
+    Pulls jobs from a shared queue and extracts them one at a time.
+
+    Args:
+        queue_dir (str): shared queue folder.
+        worker_id (str): unique name (default: <host>-<pid>-<random>).
+        claim_ttl (float): seconds without heartbeat before this worker's
+            claims may be taken over by others.
+        heartbeat_interval (float): seconds between heartbeats.
+        retries, backoff, timeout: as extract.extract_all.
+        scratch_dir (str): local folder to copy each .raw to before extraction.
+        **apex_kwargs: apex_path / backend command used on this node.
+    '''
+
+    def __init__(self, queue_dir, worker_id=None, claim_ttl=60, heartbeat_interval=10,
+                 retries=0, backoff=30, timeout=None, scratch_dir=None, **apex_kwargs):
+        self.queue_dir = str(queue_dir)
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self.claim_ttl, self.heartbeat_interval = claim_ttl, heartbeat_interval
+        self.retries, self.backoff, self.timeout = retries, backoff, timeout
+        self.scratch_dir = scratch_dir
+        self.apex_kwargs = apex_kwargs
+        self.heartbeat_path = os.path.join(self.queue_dir, 'heartbeats', self.worker_id)
+        self.last_beat = 0.0
+        self.stopping = threading.Event()
+        init_queue(self.queue_dir)
+
+    def path(self, folder, jid, suffix='.json'):
+        return os.path.join(self.queue_dir, folder, jid + suffix)
+
+    def heartbeat(self):
+        with open(self.heartbeat_path, 'w') as f:
+            f.write(str(time.time()))
+        self.last_beat = time.time()
+
+    def heartbeat_loop(self):
+        delay = self.heartbeat_interval
+        while not self.stopping.wait(delay):
+            try:
+                self.heartbeat()
+                delay = self.heartbeat_interval
+            except OSError as e:
+                # retry sooner; run() stops claiming jobs while beats are failing
+                print(f'{self.worker_id}: heartbeat failed ({e}), retrying')
+                delay = min(self.heartbeat_interval, 1)
+
+    def healthy(self):
+        ''' True while heartbeats are recent enough that other workers will not break our claims. '''
+        return time.time() - self.last_beat < self.claim_ttl / 2
+
+    @staticmethod
+    def claim_info(claim_path):
+        try:
+            with open(claim_path) as f:
+                info = json.load(f)
+            return info['worker'], info['claimed']
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @classmethod
+    def claim_owner(cls, claim_path):
+        info = cls.claim_info(claim_path)
+        return info and info[0]
+
+    def claim_expired(self, claim_path):
+        '''
+        Returns the owner of claim_path if it has stopped sending heartbeats,
+        otherwise None.
+        '''
+        owner = self.claim_owner(claim_path)
+        if owner is None:  # being written, or already gone
+            return None
+        beat = os.path.join(self.queue_dir, 'heartbeats', owner)
+        try:
+            last = os.path.getmtime(beat) if os.path.exists(beat) else os.path.getmtime(claim_path)
+        except OSError:
+            return None
+        return owner if time.time() - last > self.claim_ttl else None
+
+    def break_claim(self, jid, claim_path):
+        '''
+        Removes a stale claim. Only the worker that creates the break token
+        for this particular claim (owner + claim time) may remove it, and it
+        checks the claim is still that one afterwards, so a claim re-taken by
+        another worker is never broken.
+        '''
+        info = self.claim_info(claim_path)
+        if info is None:
+            return False
+        token = self.path('claims', f'{jid}.{info[0]}-{info[1]}', '.break')
+        try:
+            os.close(os.open(token, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            # another worker is breaking it; a token left by a crash is cleared for the next poll
+            try:
+                if time.time() - os.path.getmtime(token) > self.claim_ttl:
+                    os.remove(token)
+            except OSError:
+                pass
+            return False
+        try:
+            if self.claim_info(claim_path) != info:
+                return False
+            os.remove(claim_path)
+            print(f'{self.worker_id}: expired stale claim of {info[0]} on {jid}')
+            return True
+        except OSError:
+            return False
+        finally:
+            os.remove(token)
+
+    def try_claim(self, jid):
+        ''' Atomically claims a job, expiring a dead worker's claim if needed. '''
+        claim_path = self.path('claims', jid, '.claim')
+        if os.path.exists(claim_path):
+            if not self.claim_expired(claim_path) or not self.break_claim(jid, claim_path):
+                return False
+        try:
+            fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'worker': self.worker_id, 'claimed': time.time()}, f)
+        return True
+
+    def next_job(self):
+        ''' Claims and returns the next available job, or None. '''
+        jobs_dir = os.path.join(self.queue_dir, 'jobs')
+        for name in sorted(os.listdir(jobs_dir)):
+            if not name.endswith('.json'):
+                continue
+            jid = name[:-5]
+            if os.path.exists(self.path('done', jid)) or os.path.exists(self.path('failed', jid)):
+                continue
+            if self.try_claim(jid):
+                try:
+                    with open(self.path('jobs', jid)) as f:
+                        return json.load(f)
+                except OSError:  # finished and removed by another worker meanwhile
+                    os.remove(self.path('claims', jid, '.claim'))
+        return None
+
+    def process(self, spec):
+        '''
+        Extracts one job. run_job publishes the CSV into the output folder
+        with an atomic rename; with scratch_dir the .raw is copied to local
+        disk first.
+        '''
+        jid, output_dir = spec['id'], spec['output_dir']
+        job = extract.ApexJob(Path(spec['raw_path']))
+        kwargs = dict(self.apex_kwargs, **spec.get('params', {}))
+        source = work_dir = None
+        try:
+            fingerprint = manifest.raw_fingerprint(job.raw_path)
+            if self.scratch_dir:
+                source = staging.copy_raw(job.raw_path, Path(self.scratch_dir) / 'raw')
+                work_dir = Path(self.scratch_dir) / 'out'
+            supervisor.run_with_retries(
+                lambda j: extract.run_job(j, output_dir, timeout=self.timeout, source=source,
+                                          work_dir=work_dir, **kwargs),
+                job, retries=self.retries, backoff=self.backoff)
+        except OSError as e:
+            job.status, job.error = 'failed', f'could not stage: {e}'
+            print(f'{self.worker_id}: could not stage {job.raw_path} ({e})')
+        finally:
+            if source is not None:
+                shutil.rmtree(source, ignore_errors=True)
+
+        if job.status == 'done' and extract.apex_output_csv(job.raw_path, output_dir).is_file():
+            record_output(job.raw_path, output_dir, fingerprint, extract.apex_params(**kwargs))
+        if self.claim_owner(self.path('claims', jid, '.claim')) != self.worker_id:
+            # our claim expired and another worker took the job: the queue files are its to finish
+            print(f'{self.worker_id}: lost the claim on {jid}, leaving it to its new owner')
+            return job
+        record = dict(job.record(), worker=self.worker_id, id=jid)
+        write_json_atomic(self.path('done' if job.status == 'done' else 'failed', jid), record)
+        for path in (self.path('jobs', jid), self.path('claims', jid, '.claim')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return job
+
+    def run(self, wait=False, poll_interval=5, max_jobs=None):
+        '''
+        Processes jobs until the queue is empty (or forever if wait=True).
+
+        Returns:
+            list: ApexJob for every job this worker ran.
+        '''
+        self.heartbeat()
+        beat = threading.Thread(target=self.heartbeat_loop, daemon=True)
+        beat.start()
+        jobs = []
+        try:
+            while max_jobs is None or len(jobs) < max_jobs:
+                if not self.healthy():
+                    print(f'{self.worker_id}: heartbeats failing, not claiming new jobs')
+                    if not wait:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                spec = self.next_job()
+                if spec is None:
+                    if not wait:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+                job = self.process(spec)
+                print(f'{self.worker_id}: {job.status:<7} {job.raw_path.name} '
+                      f'({job.wall_time or 0:.1f} s)')
+                jobs.append(job)
+        finally:
+            self.stopping.set()
+            beat.join()
+            try:
+                os.remove(self.heartbeat_path)
+            except OSError:
+                pass
+        return jobs
+
+
+def run_workers(queue_dir, workers=1, wait=False, **worker_kwargs):
+    ''' Runs several Worker instances in this process (one per thread). '''
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda _: Worker(queue_dir, **worker_kwargs).run(wait=wait),
+                                range(workers)))
+    return [job for jobs in results for job in jobs]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Shared-folder Apex3D work queue.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    add = sub.add_parser('enqueue', help='queue every .raw in a data folder')
+    add.add_argument('queue_dir')
+    add.add_argument('data_dir')
+    add.add_argument('output_dir', nargs='?')
+    add.add_argument('--le-threshold', type=int, default=extract.LE_THRESHOLD)
+    add.add_argument('--he-threshold', type=int, default=extract.HE_THRESHOLD)
+    add.add_argument('--lock-mass', type=float, default=extract.LOCK_MASS)
+
+    work = sub.add_parser('work', help='pull and extract jobs')
+    work.add_argument('queue_dir')
+    work.add_argument('--workers', type=int, default=1, help='worker threads on this node')
+    work.add_argument('--wait', action='store_true', help='keep polling for new jobs')
+    work.add_argument('--backend', choices=sorted(extract.BACKENDS), default='apex3d')
+    work.add_argument('--apex', default=None, help='path to Apex3D64.exe on this node')
+    work.add_argument('--claim-ttl', type=float, default=60)
+    work.add_argument('--timeout', type=float, default=None)
+    work.add_argument('--retries', type=int, default=0)
+    work.add_argument('--backoff', type=float, default=30,
+                      help='seconds before the first retry (doubled each retry)')
+    work.add_argument('--scratch', default=None, help='local folder to stage .raw copies in')
+
+    stat = sub.add_parser('status', help='show queue counts')
+    stat.add_argument('queue_dir')
+    args = parser.parse_args(argv)
+
+    if args.command == 'enqueue':
+        output_dir = args.output_dir or os.path.join(args.data_dir, extract.OUTPUT_FOLDER)
+        os.makedirs(output_dir, exist_ok=True)
+        added = enqueue(args.queue_dir, extract.find_raw_dirs(args.data_dir), output_dir,
+                        le_threshold=args.le_threshold, he_threshold=args.he_threshold,
+                        lock_mass=args.lock_mass)
+        print(f'{len(added)} job(s) queued')
+    elif args.command == 'work':
+        apex_path = args.apex or extract.BACKENDS[args.backend]
+        if args.workers == 1:
+            Worker(args.queue_dir, claim_ttl=args.claim_ttl, timeout=args.timeout,
+                   retries=args.retries, backoff=args.backoff, scratch_dir=args.scratch,
+                   apex_path=apex_path).run(wait=args.wait)
+        else:
+            run_workers(args.queue_dir, args.workers, wait=args.wait, claim_ttl=args.claim_ttl,
+                        timeout=args.timeout, retries=args.retries, backoff=args.backoff,
+                        scratch_dir=args.scratch, apex_path=apex_path)
+    else:
+        print(queue_status(args.queue_dir))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
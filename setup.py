@@ -7,5 +7,6 @@ setup(name="ims-ms-analyse",
       platforms=["linux"],
       url="https://github.com/janusson/",
       packages=find_packages(),
+      package_data={"samm": ["*.csv"]},
       )
       
\ No newline at end of file
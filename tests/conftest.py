@@ -0,0 +1,15 @@
+'''
+conftest.py
+Python Version: 3.9
+Purpose: Keeps the parse cache of the test run out of ~/.samm-cache.
+'''
+
+import os
+
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def cache_dir(tmp_path_factory):
+    os.environ['SAMM_CACHE_DIR'] = str(tmp_path_factory.mktemp('samm-cache'))
+    yield
@@ -0,0 +1,48 @@
+'''
+test_catalog.py
+Python Version: 3.9
+Purpose: Short experiment IDs resolve to the requested sampling replicate.
+'''
+
+import pytest
+
+from samm import catalog
+
+SELECTION_FILES = {'FR': ('Full Range', '#FullRange-POMSolv-Rangefile.txt'),
+                   'Z1': ('Z1', '#POMSolv-Z1-RuleFile.rul'),
+                   'Z2': ('Z2', '#POMSolv-Z2-RuleFile.rul')}
+
+
+def write_exports(root, experiment, value):
+    ''' FR/Z1/Z2 x MS/DT TWIMExtract exports of one experiment, every y equal to value. '''
+    for folder, selfile in SELECTION_FILES.values():
+        for prefix, dimension in (('MZ', 'MS'), ('DT', 'DT')):
+            out = root / folder / dimension / experiment
+            out.mkdir(parents=True)
+            (out / f'{prefix}_{experiment}_fn-1_{selfile}_raw.csv').write_text(
+                f'#{selfile}\nx,y\n1.0,{value}\n2.0,{value}\n')
+
+
+@pytest.fixture
+def two_replicates(tmp_path):
+    write_exports(tmp_path, 'EJ3-57-158-BC4-Sampling-1', 1)
+    write_exports(tmp_path, 'EJ3-57-158-BC4-Sampling-2', 2)
+    return tmp_path
+
+
+def test_short_id_needs_a_replicate(two_replicates):
+    cat = catalog.Catalog(two_replicates).refresh()
+    with pytest.raises(KeyError, match='several experiments'):
+        cat.lookup('57-158-BC4')
+    assert cat.resolve('57-158-BC4', replicate=1) == 'EJ3-57-158-BC4-Sampling-1'
+    assert cat.resolve('EJ3-57-158-BC4', replicate=2) == 'EJ3-57-158-BC4-Sampling-2'
+    assert cat.resolve('EJ3-57-158-BC4-Sampling-1') == 'EJ3-57-158-BC4-Sampling-1'
+    with pytest.raises(KeyError):
+        cat.lookup('57-158-BC4', replicate=3)
+
+
+def test_import_samm2d_reads_sampling_2(two_replicates):
+    fr, z1, z2 = catalog.import_samm2d(two_replicates, '57-158-BC4')
+    assert (fr['Counts'] == 2).all() and (z2['Intensity'] == 2).all()
+    fr = catalog.import_samm2d(two_replicates, '57-158-BC4', selections=['FR'], replicate=1)[0]
+    assert (fr['Counts'] == 1).all()
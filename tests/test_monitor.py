@@ -0,0 +1,63 @@
+'''
+test_monitor.py
+Python Version: 3.9
+Purpose: monitor.area_matrix and screen.screen_file agree with check_hit
+for ions placed on the mobility window edges.
+'''
+
+import csv
+
+import numpy as np
+import pandas as pd
+
+from samm import fakeapex, monitor, screen
+
+MZ_TOL, MOB_TOL = 1.0, 0.05
+
+
+def write_edge_ions(csv_path, n_targets=300, seed=0):
+    '''
+    Writes an Apex3D table with 3-decimal mobilities on (and just around)
+    each target's mobility window edges, and returns the target table.
+    '''
+    rng = np.random.default_rng(seed)
+    targets = pd.DataFrame({'target': [f'T{i:03d}' for i in range(n_targets)],
+                            'mz': 200.0 + 5 * np.arange(n_targets),
+                            'mobility': np.round(rng.uniform(10, 200, n_targets), 3)})
+    rows = []
+    for t in targets.itertuples():
+        for edge in (t.mobility - t.mobility * MOB_TOL, t.mobility + t.mobility * MOB_TOL):
+            for shift in (-0.001, 0, 0.001):
+                rows.append((t.mz, f'{edge + shift:.3f}'))
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(fakeapex.APEX_COLUMNS)
+        for i, (mz, mobility) in enumerate(rows):
+            writer.writerow([1, i, f'{mz:.4f}', f'{mz:.4f}', '1.0', 10, i + 1, 10, mobility,
+                             0, 0, 0, 0, 0])
+    return targets
+
+
+def check_hit_areas(csv_path, targets):
+    ''' Summed area per target with the check_hit comparisons on the text values. '''
+    with open(csv_path) as f:
+        rows = list(csv.reader(f))[1:]
+    areas = []
+    for t in targets.itertuples():
+        areas.append(sum(float(row[6]) for row in rows
+                         if t.mz - MZ_TOL <= float(row[2]) <= t.mz + MZ_TOL and
+                         t.mobility - t.mobility * MOB_TOL <= float(row[8]) <= t.mobility + t.mobility * MOB_TOL))
+    return np.array(areas)
+
+
+def test_edge_ions_match_check_hit(tmp_path):
+    csv_path = tmp_path / 'EJ3-99-001-RA1-Sampling-2_Apex3DIons.csv'
+    targets = write_edge_ions(str(csv_path))
+    expected = check_hit_areas(csv_path, targets)
+
+    hits = screen.screen_file(csv_path, targets, MZ_TOL, MOB_TOL)
+    screened = hits.groupby('target')['area'].sum().reindex(targets['target'], fill_value=0)
+    matrix = monitor.area_matrix([csv_path], targets, MZ_TOL, MOB_TOL, workers=1)
+
+    np.testing.assert_array_equal(screened.to_numpy(), expected)
+    np.testing.assert_array_equal(matrix.iloc[:, 0].to_numpy(), expected)
@@ -0,0 +1,16 @@
+'''
+test_twim.py
+Python Version: 3.9
+Purpose: load_2d_batch reports experiments it cannot find instead of failing.
+'''
+
+from samm import twim
+from test_catalog import write_exports
+
+
+def test_unknown_key_is_reported_missing(tmp_path):
+    write_exports(tmp_path, 'EJ3-57-158-BC4-Sampling-2', 2)
+    spectra = twim.load_2d_batch(tmp_path, ['57-158-BC4', '57-999-RA1'], workers=2, cache=False)
+    assert set(spectra.index.unique('experiment')) == {'EJ3-57-158-BC4-Sampling-2'}
+    assert len(spectra) == 3 * 2 * 2
+    assert spectra.attrs['missing'] == [('57-999-RA1', s, d) for s in twim.SELECTIONS for d in twim.DIMENSIONS]
@@ -0,0 +1,19 @@
+'''
+test_watch.py
+Python Version: 3.9
+Purpose: The watcher waits for an acquisition to hold data and stop changing.
+'''
+
+from samm import manifest, watch
+
+
+def test_empty_raw_is_not_quiescent(tmp_path):
+    raw = tmp_path / 'EJ3-99-001-RA1-Sampling-2.raw'
+    raw.mkdir()
+    empty = manifest.raw_fingerprint(raw)
+    assert not watch.is_quiescent(empty, dict(empty), 60, now=1e10)
+
+    (raw / '_FUNC001.DAT').write_bytes(b'\0' * 64)
+    written = manifest.raw_fingerprint(raw)
+    assert not watch.is_quiescent(written, empty, 60, now=1e10)
+    assert watch.is_quiescent(written, dict(written), 60, now=written['mtime'] + 60)
@@ -0,0 +1,38 @@
+'''
+test_workqueue.py
+Python Version: 3.9
+Purpose: A worker whose claim was taken over leaves the new owner's queue files alone.
+'''
+
+import json
+import sys
+
+from samm import extract, workqueue
+
+
+def test_lost_claim_is_left_to_new_owner(tmp_path):
+    raw = tmp_path / 'data' / 'EJ3-99-001-RA1-Sampling-2.raw'
+    raw.mkdir(parents=True)
+    (raw / '_FUNC001.DAT').write_bytes(b'\0' * 64)
+    out, queue = tmp_path / 'out', tmp_path / 'queue'
+    out.mkdir()
+    jid, = workqueue.enqueue(queue, [raw], out)
+
+    worker = workqueue.Worker(queue, worker_id='node-a', apex_path=(sys.executable, '-c', ''))
+    assert worker.try_claim(jid)
+    spec = json.loads((queue / 'jobs' / f'{jid}.json').read_text())
+    # node-b breaks the claim as stale and takes the job while node-a is still running it
+    claim = queue / 'claims' / f'{jid}.claim'
+    claim.write_text(json.dumps({'worker': 'node-b', 'claimed': 1.0}))
+
+    worker.process(spec)
+    assert workqueue.Worker.claim_owner(claim) == 'node-b'
+    assert (queue / 'jobs' / f'{jid}.json').exists()
+    assert not (queue / 'failed' / f'{jid}.json').exists()
+
+    claim.unlink()
+    assert worker.try_claim(jid)
+    job = worker.process(spec)
+    assert job.status == 'failed'  # the stand-in writes no CSV
+    assert not claim.exists() and (queue / 'failed' / f'{jid}.json').exists()
+    assert not extract.apex_output_csv(raw, out).exists()